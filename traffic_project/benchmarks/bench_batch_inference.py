@@ -0,0 +1,63 @@
+"""
+CPU frames/sec of detection + tracking for different inference batch sizes.
+Batch size 1 is the frame-by-frame model.track() path.
+
+    python -m benchmarks.bench_batch_inference --model best.pt --batch-sizes 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.common import PROJECT_DIR, make_synthetic_video
+
+
+def decoded_frames(video_path, max_frames):
+    import cv2
+    from traffic_monitor.video_pipeline import DecodedFrame
+
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(DecodedFrame(len(frames) + 1, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame))
+    cap.release()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.path.join(PROJECT_DIR, 'best.pt'))
+    parser.add_argument('--video', help="Recording to process; a synthetic clip is generated if omitted")
+    parser.add_argument('--max-frames', type=int, default=200)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'traffic_project.settings')
+    sys.path.insert(0, PROJECT_DIR)
+    import django
+    django.setup()
+    import torch
+    from ultralytics import YOLO
+    from traffic_monitor.yolo_processor import _track_frames
+
+    video_path = args.video or make_synthetic_video(os.path.join(tempfile.mkdtemp(prefix='traffic_bench_'), 'synthetic.mp4'))
+    # Decode up front so only detection + tracking is measured.
+    frames = decoded_frames(video_path, args.max_frames)
+    print(f"{len(frames)} frames, torch threads: {torch.get_num_threads()}")
+
+    for batch_size in args.batch_sizes:
+        model = YOLO(args.model)
+        model.predict(frames[0].image, verbose=False)  # Warm-up outside the timed region.
+        start = time.perf_counter()
+        for _ in _track_frames(model, iter(frames), batch_size):
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"batch_size={batch_size:<3}: {len(frames) / elapsed:6.1f} frames/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Load test for /api/chart-data/: requests per second with the response cache
+disabled, with a warm cache, and for clients revalidating with If-None-Match.
+
+    python -m benchmarks.bench_chart_api --requests 500 --minutes 10
+"""
+import argparse
+
+from benchmarks.common import setup_django, timed
+
+
+def make_video(minutes, fps=25):
+    from django.utils import timezone
+    from traffic_monitor.models import AggregatedData, DetectionResult, VideoUpload
+    from traffic_monitor.time_buckets import TimeBucketAccumulator
+
+    video = VideoUpload.objects.create(video_file='videos/bench.mp4', status='completed', processed_at=timezone.now())
+    buckets = TimeBucketAccumulator()
+    rows = []
+    for frame_number in range(minutes * 60 * fps):
+        for vehicle_class in ('car', 'van'):
+            rows.append(DetectionResult(video=video, timestamp_in_video=frame_number / fps, vehicle_class=vehicle_class, count=1))
+            buckets.add(frame_number / fps, vehicle_class, 1)
+    DetectionResult.objects.bulk_create(rows, batch_size=5000)
+    buckets.save(video)
+    for vehicle_class, count in (('car', 120), ('van', 30)):
+        AggregatedData.objects.create(video=video, time_period_start=video.uploaded_at, vehicle_class=vehicle_class, count=count)
+
+
+def run(client, url, requests, **headers):
+    def loop():
+        for _ in range(requests):
+            response = client.get(url, **headers)
+            assert response.status_code in (200, 304), response.status_code
+        return response
+    elapsed, response = timed(loop)
+    return requests / elapsed, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--minutes', type=int, default=10, help="Length of the processed video")
+    parser.add_argument('--resolution', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test import Client
+    from django.test.utils import override_settings, setup_test_environment
+
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = ['*']
+    make_video(args.minutes)
+    client = Client()
+    url = f'/api/chart-data/?resolution={args.resolution}'
+
+    dummy_cache = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    with override_settings(CACHES=dummy_cache):
+        uncached, _ = run(client, url, args.requests)
+    cached, response = run(client, url, args.requests)
+    revalidated, _ = run(client, url, args.requests, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    print(f"no cache          : {uncached:8.1f} req/s")
+    print(f"cached            : {cached:8.1f} req/s")
+    print(f"304 revalidation  : {revalidated:8.1f} req/s")
+
+
+if __name__ == '__main__':
+    main()
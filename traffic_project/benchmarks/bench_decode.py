@@ -0,0 +1,65 @@
+"""
+Decode throughput per frame source: cv2.VideoCapture against PyAV with
+each --threads count, plus PyAV's keyframe-only and scaled decoding. Every
+configuration reads the whole file (up to --max-frames) into BGR frames, as
+the pipeline's decoder thread does.
+
+    python -m benchmarks.bench_decode --video camera.ts --threads 1 2 4 0 --scale 0.5
+"""
+import argparse
+import os
+import time
+
+from benchmarks.common import make_synthetic_video, setup_django
+
+
+def decode(cap, max_frames):
+    """(frames read, seconds) for reading `cap` to the end."""
+    frames = 0
+    started = time.perf_counter()
+    try:
+        while frames < max_frames:
+            ret, _ = cap.read()
+            if not ret:
+                break
+            frames += 1
+    finally:
+        cap.release()
+    return frames, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', default=None, help="Sample video (default: a synthetic 1080p clip).")
+    parser.add_argument('--max-frames', type=int, default=2000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 0],
+                        help="PyAV decoder thread counts to try (0: FFmpeg's choice).")
+    parser.add_argument('--scale', type=float, default=0.5, help="Scale factor of the scaled-decode run.")
+    args = parser.parse_args()
+
+    scratch_dir = setup_django()
+    import cv2
+    from traffic_monitor.frame_sources import PyAVCapture
+
+    video_path = args.video or make_synthetic_video(os.path.join(scratch_dir, 'synthetic.mp4'),
+                                                    frames=500, size=(1920, 1080))
+    configurations = [('opencv', lambda: cv2.VideoCapture(video_path))]
+    for threads in args.threads:
+        configurations.append((f"pyav threads={threads}", lambda threads=threads: PyAVCapture(video_path, threads=threads)))
+    configurations.append((f"pyav scale={args.scale}", lambda: PyAVCapture(video_path, scale=args.scale)))
+    configurations.append(('pyav keyframes', lambda: PyAVCapture(video_path, keyframes_only=True)))
+
+    print(f"Decoding {args.video or 'a synthetic 1080p clip'}")
+    print(f"{'source':<22} {'frames':>7} {'fps':>8} {'ms/frame':>9}")
+    for name, open_capture in configurations:
+        try:
+            cap = open_capture()
+        except ImportError:
+            print(f"{name:<22} skipped: PyAV is not installed (pip install av)")
+            continue
+        frames, seconds = decode(cap, args.max_frames)
+        print(f"{name:<22} {frames:>7} {frames / seconds:8.1f} {1000.0 * seconds / max(frames, 1):9.2f}")
+
+
+if __name__ == '__main__':
+    main()
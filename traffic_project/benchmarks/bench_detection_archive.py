@@ -0,0 +1,126 @@
+"""
+Size, write and reload times of the per-video detection archive
+(detection_archive.py) for synthetic traffic with millions of boxes, in every
+format available here (Parquet needs pyarrow), and a per-class count computed
+with NumPy over the archive's columns against the same count as an SQL
+aggregate over the video's DetectionResult rows.
+
+    python -m benchmarks.bench_detection_archive --detections 1000000 5000000
+"""
+import argparse
+import os
+
+from benchmarks.common import setup_django, timed
+
+FPS = 25
+CLASS_NAMES = {0: 'car', 1: 'van', 6: 'truck 2-axle', 2: '3-axle bus'}
+
+
+def synthetic_columns(detections, boxes_per_frame=8, seed=0):
+    """{column: array} of `detections` boxes, `boxes_per_frame` per frame."""
+    import numpy as np
+    from traffic_monitor.detection_archive import COLUMNS
+
+    rng = np.random.default_rng(seed)
+    frame = np.arange(detections, dtype=np.int64) // boxes_per_frame + 1
+    x1 = rng.uniform(0, 1800, detections)
+    y1 = rng.uniform(0, 1000, detections)
+    data = {
+        'frame': frame,
+        'timestamp': frame / FPS,
+        # A vehicle stays for ~100 frames, so IDs repeat like a tracker's do
+        'track_id': frame // 100 * boxes_per_frame + np.arange(detections) % boxes_per_frame,
+        'class_id': rng.choice(list(CLASS_NAMES), detections, p=[0.7, 0.15, 0.1, 0.05]),
+        'confidence': rng.uniform(0.25, 1.0, detections),
+        'x1': x1, 'y1': y1, 'x2': x1 + 120, 'y2': y1 + 80,
+    }
+    return {name: values.astype(COLUMNS[name]) for name, values in data.items()}
+
+
+def archive_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def formats():
+    from traffic_monitor.detection_archive import ARCHIVE_NPZ, ARCHIVE_PARQUET
+    try:
+        import pyarrow  # noqa: F401 -- only checks that the Parquet format is available
+    except ImportError:
+        print("pyarrow is not installed, skipping the Parquet format")
+        return [ARCHIVE_NPZ]
+    return [ARCHIVE_NPZ, ARCHIVE_PARQUET]
+
+
+def count_from_archive(path):
+    """Boxes per class name, from the class_id column only."""
+    import numpy as np
+    from traffic_monitor.detection_archive import load_detections
+
+    class_ids, counts = np.unique(load_detections(path, columns=['class_id'])['class_id'], return_counts=True)
+    return {CLASS_NAMES[class_id]: count for class_id, count in zip(class_ids.tolist(), counts.tolist())}
+
+
+def seed_detection_results(data):
+    """The DetectionResult rows (one per frame and class) processing would have written for `data`."""
+    import numpy as np
+    from traffic_monitor.detection_writer import BufferedDetectionWriter
+    from traffic_monitor.models import VideoUpload
+
+    video = VideoUpload.objects.create(video_file='videos/archive-bench.mp4', status='completed')
+    keys, counts = np.unique(np.stack([data['frame'], data['class_id']], axis=1), axis=0, return_counts=True)
+    with BufferedDetectionWriter(batch_size=20000, flush_interval=None) as writer:
+        for (frame, class_id), count in zip(keys.tolist(), counts.tolist()):
+            writer.add(video, frame / FPS, CLASS_NAMES[class_id], count)
+    return video
+
+
+def count_from_database(video):
+    from django.db.models import Sum
+    from traffic_monitor.models import DetectionResult
+
+    return dict(DetectionResult.objects.filter(video=video).values('vehicle_class')
+                .annotate(total=Sum('count')).values_list('vehicle_class', 'total'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--detections', type=int, nargs='+', default=[1000000, 5000000])
+    parser.add_argument('--chunk-rows', type=int, default=65536)
+    args = parser.parse_args()
+
+    scratch_dir = setup_django()
+    from traffic_monitor.detection_archive import DetectionArchiveWriter, archive_filename, load_detections, remove_archive
+    from traffic_monitor.models import DetectionResult
+
+    print(f"{'detections':>10} {'format':<8} {'MB':>8} {'write s':>8} {'load all s':>11} {'load 1 col s':>13} {'count s':>8}")
+    for detections in args.detections:
+        data = synthetic_columns(detections)
+        for archive_format in formats():
+            path = os.path.join(scratch_dir, archive_filename(f'bench_{detections}', archive_format))
+
+            def write():
+                with DetectionArchiveWriter(path, archive_format, args.chunk_rows) as writer:
+                    for start in range(0, detections, args.chunk_rows):
+                        writer.add_columns({name: values[start:start + args.chunk_rows] for name, values in data.items()})
+
+            write_seconds, _ = timed(write)
+            load_seconds, loaded = timed(load_detections, path)
+            assert len(loaded['frame']) == detections
+            column_seconds, _ = timed(load_detections, path, columns=['class_id'])
+            count_seconds, archive_counts = timed(count_from_archive, path)
+            print(f"{detections:>10} {archive_format:<8} {archive_bytes(path) / 1e6:8.1f} {write_seconds:8.2f} "
+                  f"{load_seconds:11.2f} {column_seconds:13.2f} {count_seconds:8.2f}")
+            remove_archive(path)
+
+        seed_seconds, video = timed(seed_detection_results, data)
+        sql_seconds, database_counts = timed(count_from_database, video)
+        assert database_counts == archive_counts
+        print(f"{detections:>10} {'sql':<8} {'':>8} {seed_seconds:8.2f} {'':>11} {'':>13} {sql_seconds:8.2f}"
+              f"  ({DetectionResult.objects.filter(video=video).count()} DetectionResult rows)")
+        video.delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Row count, disk size and write time of per-frame DetectionResult rows against
+run-length encoded DetectionRun rows (DETECTION_STORAGE = 'frames' / 'runs'),
+for synthetic fixed-camera traffic: vehicles of a few classes arrive at
+random and stay on screen for a few seconds each. Sizes are the tables plus
+their indexes, from SQLite's dbstat.
+
+    python -m benchmarks.bench_detection_storage --minutes 10 60 --vehicles-per-minute 20
+"""
+import argparse
+
+from benchmarks.common import setup_django, timed
+
+FPS = 25
+CLASSES = ('car', 'van', 'truck 2-axle', '3-axle bus')
+
+
+def synthetic_frames(minutes, vehicles_per_minute, seed=0):
+    """Per-frame {vehicle_class: count} of `minutes` of traffic."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    frames = minutes * 60 * FPS
+    arrivals = rng.uniform(0, frames, int(minutes * vehicles_per_minute)).astype(int)
+    dwell = rng.uniform(2 * FPS, 8 * FPS, len(arrivals)).astype(int)
+    classes = rng.choice(len(CLASSES), len(arrivals), p=[0.7, 0.15, 0.1, 0.05])
+    counts = np.zeros((frames, len(CLASSES)), dtype=np.int64)
+    for start, length, class_index in zip(arrivals, dwell, classes):
+        counts[start:start + length, class_index] += 1
+    return [{CLASSES[i]: int(c) for i, c in enumerate(row) if c} for row in counts]
+
+
+def table_bytes(table):
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE tbl_name = %s", [table])
+        names = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({', '.join(['%s'] * len(names))})", names)
+        return cursor.fetchone()[0] or 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=int, nargs='+', default=[10, 60])
+    parser.add_argument('--vehicles-per-minute', type=float, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from traffic_monitor.detection_writer import BufferedDetectionWriter, RunLengthDetectionWriter, detection_timeline
+    from traffic_monitor.models import DetectionResult, DetectionRun, VideoUpload
+
+    print(f"{'minutes':>7} {'storage':<7} {'rows':>10} {'MB':>8} {'write s':>8} {'reduction':>10}")
+    for minutes in args.minutes:
+        frames = synthetic_frames(minutes, args.vehicles_per_minute)
+        report = {}
+        for storage, writer_class, model in (('frames', BufferedDetectionWriter, DetectionResult),
+                                             ('runs', RunLengthDetectionWriter, DetectionRun)):
+            model.objects.all().delete()
+            video = VideoUpload.objects.create(video_file=f'videos/{minutes}min-{storage}.mp4', status='completed')
+
+            def write():
+                with writer_class(batch_size=5000, flush_interval=None) as writer:
+                    for frame_index, frame_detections in enumerate(frames):
+                        writer.add_frame(video, frame_index / FPS, frame_detections)
+
+            seconds, _ = timed(write)
+            report[storage] = (model.objects.count(), table_bytes(model._meta.db_table), seconds, video)
+        assert len(detection_timeline(report['runs'][3])) == len(detection_timeline(report['frames'][3]))
+        for storage, (rows, size, seconds, _) in report.items():
+            reduction = '' if storage == 'frames' else f"{report['frames'][0] / max(rows, 1):.1f}x rows, " \
+                                                       f"{report['frames'][1] / max(size, 1):.1f}x size"
+            print(f"{minutes:>7} {storage:<7} {rows:>10} {size / 1e6:8.2f} {seconds:8.2f}  {reduction}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Compares DetectionResult insert throughput of the old per-row
+`objects.create` path against BufferedDetectionWriter.
+
+    python -m benchmarks.bench_detection_writes --frames 5000 --classes 3
+"""
+import argparse
+
+from benchmarks.common import setup_django, timed
+
+
+def write_per_row(video, frames, classes):
+    from traffic_monitor.models import DetectionResult
+    for frame_number in range(frames):
+        for vehicle_class in classes:
+            DetectionResult.objects.create(
+                video=video,
+                timestamp_in_video=frame_number / 25.0,
+                vehicle_class=vehicle_class,
+                count=1,
+            )
+
+
+def write_buffered(video, frames, classes, batch_size):
+    from traffic_monitor.detection_writer import BufferedDetectionWriter
+    with BufferedDetectionWriter(batch_size=batch_size, flush_interval=None) as writer:
+        for frame_number in range(frames):
+            for vehicle_class in classes:
+                writer.add(video, frame_number / 25.0, vehicle_class, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--classes', type=int, default=3, help="Classes detected per frame")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 500, 2000])
+    args = parser.parse_args()
+
+    setup_django()
+    from traffic_monitor.models import VideoUpload, DetectionResult
+    from traffic_monitor.yolo_processor import YOLO_CLASS_NAMES
+
+    classes = [YOLO_CLASS_NAMES[i] for i in range(args.classes)]
+    rows = args.frames * args.classes
+    video = VideoUpload.objects.create(video_file='videos/bench.mp4')
+
+    elapsed, _ = timed(write_per_row, video, args.frames, classes)
+    print(f"per-row create        : {rows / elapsed:>10.0f} rows/s ({elapsed:.2f}s for {rows} rows)")
+    DetectionResult.objects.all().delete()
+
+    for batch_size in args.batch_sizes:
+        elapsed, _ = timed(write_buffered, video, args.frames, classes, batch_size)
+        print(f"buffered batch={batch_size:<6}: {rows / elapsed:>10.0f} rows/s ({elapsed:.2f}s for {rows} rows)")
+        DetectionResult.objects.all().delete()
+
+
+if __name__ == '__main__':
+    main()
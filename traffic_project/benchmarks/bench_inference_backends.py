@@ -0,0 +1,54 @@
+"""
+CPU throughput and accuracy parity of the exported inference backends against
+PyTorch: every export of --model that exists (`manage.py export_model`) runs
+on the same sample frames, once per --threads value.
+
+    python -m benchmarks.bench_inference_backends --model best.pt --video sample.mp4 --threads 1 4
+"""
+import argparse
+import os
+
+from benchmarks.common import PROJECT_DIR, make_synthetic_video, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.path.join(PROJECT_DIR, 'best.pt'))
+    parser.add_argument('--video', default=None, help="Sample video (default: a synthetic clip).")
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--threads', type=int, nargs='+', default=[os.cpu_count()])
+    args = parser.parse_args()
+
+    scratch_dir = setup_django()
+    import torch
+    from ultralytics import YOLO
+    from traffic_monitor.inference_backend import (
+        BACKEND_ONNX, BACKEND_OPENVINO, check_parity, exported_model_path, limit_threads, sample_frames,
+    )
+
+    video_path = args.video or make_synthetic_video(os.path.join(scratch_dir, 'synthetic.mp4'))
+    frames = sample_frames(video_path, args.frames)
+    candidates = [(f"{backend}{' int8' if int8 else ''}", exported_model_path(args.model, backend, int8))
+                  for backend in (BACKEND_ONNX, BACKEND_OPENVINO) for int8 in (False, True)]
+    candidates = [(name, path) for name, path in candidates if os.path.exists(path)]
+    if not candidates:
+        print(f"No exports of {args.model} found; run `python manage.py export_model` first.")
+        return
+
+    print(f"{len(frames)} frames from {args.video or 'a synthetic clip'}")
+    print(f"{'backend':<14} {'threads':>7} {'ms/frame':>9} {'pytorch':>9} {'speedup':>8} {'recall':>7} {'precision':>9}")
+    for threads in args.threads:
+        for name, path in candidates:
+            torch.set_num_threads(threads)
+            reference = YOLO(args.model)
+            candidate = YOLO(path, task='detect')
+            limit_threads(candidate, path, threads)
+            parity = check_parity(reference, candidate, frames)
+            speedup = parity['reference_ms_per_frame'] / parity['candidate_ms_per_frame']
+            print(f"{name:<14} {threads:>7} {parity['candidate_ms_per_frame']:9.1f} "
+                  f"{parity['reference_ms_per_frame']:9.1f} {speedup:7.2f}x "
+                  f"{parity['recall']:7.3f} {parity['precision']:9.3f}")
+
+
+if __name__ == '__main__':
+    main()
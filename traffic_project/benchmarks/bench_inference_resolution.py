@@ -0,0 +1,65 @@
+"""
+Latency and accuracy of YOLO inference sizes, with and without a region of
+interest. Every combination runs on the same sample frames; accuracy is
+recall/precision against the largest --imgsz on the full frame, with ROI
+boxes mapped back to full-frame coordinates first.
+
+    python -m benchmarks.bench_inference_resolution --model best.pt --video sample.mp4 \
+        --imgsz 640 960 1280 --roi 0,0.35 1,0.35 1,1 0,1
+"""
+import argparse
+import os
+import time
+
+from benchmarks.common import PROJECT_DIR, make_synthetic_video, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.path.join(PROJECT_DIR, 'best.pt'))
+    parser.add_argument('--video', default=None, help="Sample video (default: a synthetic clip).")
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640, 960, 1280])
+    parser.add_argument('--roi', nargs='*', default=None,
+                        help="Region of interest as relative x,y points, like Camera.roi_points.")
+    args = parser.parse_args()
+
+    scratch_dir = setup_django()
+    from ultralytics import YOLO
+    from traffic_monitor.inference_backend import compare_detections, detection_arrays, sample_frames, summarize_parity
+    from traffic_monitor.roi import RoiCropper
+
+    video_path = args.video or make_synthetic_video(os.path.join(scratch_dir, 'synthetic.mp4'))
+    frames = sample_frames(video_path, args.frames)
+    height, width = frames[0].shape[:2]
+    roi = None
+    if args.roi:
+        roi = RoiCropper([[float(v) for v in point.split(',')] for point in args.roi], (width, height))
+    model = YOLO(args.model)
+
+    def run(imgsz, cropper):
+        model.predict(frames[0], imgsz=imgsz, verbose=False)  # Warm-up for this size
+        detections = []
+        started = time.perf_counter()
+        for frame in frames:
+            result = model.predict(cropper.crop(frame) if cropper else frame, imgsz=imgsz, verbose=False)[0]
+            if cropper:
+                cropper.restore(result, frame)
+            detections.append(detection_arrays(result))
+        return 1000.0 * (time.perf_counter() - started) / len(frames), detections
+
+    _, reference = run(max(args.imgsz), None)
+    print(f"{len(frames)} frames of {width}x{height}"
+          + (f", ROI {roi.crop_size[0]}x{roi.crop_size[1]} ({100 * roi.pixel_fraction:.0f}% of the pixels)" if roi else ""))
+    print(f"{'imgsz':>6} {'input':<5} {'ms/frame':>9} {'recall':>7} {'precision':>9}")
+    for imgsz in sorted(args.imgsz):
+        for name, cropper in (('full', None), ('roi', roi)):
+            if name == 'roi' and roi is None:
+                continue
+            ms_per_frame, detections = run(imgsz, cropper)
+            parity = summarize_parity([compare_detections(ref, det) for ref, det in zip(reference, detections)])
+            print(f"{imgsz:>6} {name:<5} {ms_per_frame:9.1f} {parity['recall']:7.3f} {parity['precision']:9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Per-task model start-up cost with and without the worker model registry:
+a fresh YOLO(...) load plus first inference versus a registry cache hit.
+
+    python -m benchmarks.bench_model_cache --model best.pt --tasks 5
+"""
+import argparse
+import os
+import sys
+import time
+
+from benchmarks.common import PROJECT_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.path.join(PROJECT_DIR, 'best.pt'))
+    parser.add_argument('--tasks', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'traffic_project.settings')
+    sys.path.insert(0, PROJECT_DIR)
+    import django
+    django.setup()
+    import numpy as np
+    from ultralytics import YOLO
+    from traffic_monitor.model_registry import ModelRegistry
+
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+
+    cold = []
+    for _ in range(args.tasks):
+        start = time.perf_counter()
+        model = YOLO(args.model)
+        model.track(frame, persist=True, verbose=False)
+        cold.append(time.perf_counter() - start)
+
+    registry = ModelRegistry()
+    registry.get(args.model, warmup=True)  # What worker_process_init does.
+    warm = []
+    for _ in range(args.tasks):
+        start = time.perf_counter()
+        model, _ = registry.get(args.model)
+        model.track(frame, persist=True, verbose=False)
+        warm.append(time.perf_counter() - start)
+
+    print(f"load per task : {np.mean(cold) * 1000:8.1f} ms/task (first {cold[0] * 1000:.1f} ms)")
+    print(f"registry hit  : {np.mean(warm) * 1000:8.1f} ms/task")
+    print(f"saved         : {(np.mean(cold) - np.mean(warm)) * 1000:8.1f} ms/task, "
+          f"registry reports {registry.saved_seconds / args.tasks * 1000:.1f} ms/task")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Time recount_video takes to rebuild a video's counts from its detection
+archive, keeping the archived track IDs and re-running ByteTrack over the
+boxes, for synthetic fixed-camera traffic: vehicles cross a 1920x1080 frame
+left to right in a few seconds each and are counted on a line in the middle.
+No detector runs; the video file only provides the frame size.
+
+    python -m benchmarks.bench_recount --minutes 10 60 --vehicles-per-minute 20
+"""
+import argparse
+import os
+
+from benchmarks.common import make_synthetic_video, setup_django, timed
+
+FPS = 25
+FRAME_SIZE = (1920, 1080)
+CLASS_IDS = (0, 1, 6, 2)  # car, van, truck 2-axle, 3-axle bus
+
+
+def synthetic_tracks(minutes, vehicles_per_minute, seed=0):
+    """{column: array} of the tracked boxes of `minutes` of traffic, in frame order."""
+    import numpy as np
+    from traffic_monitor.detection_archive import COLUMNS
+
+    rng = np.random.default_rng(seed)
+    vehicles = int(minutes * vehicles_per_minute)
+    arrivals = np.sort(rng.integers(1, minutes * 60 * FPS, vehicles))
+    dwell = rng.integers(2 * FPS, 8 * FPS, vehicles)
+    lanes = rng.uniform(200, 900, vehicles)
+    classes = rng.choice(CLASS_IDS, vehicles, p=[0.7, 0.15, 0.1, 0.05])
+    track = np.repeat(np.arange(vehicles), dwell)
+    step = np.arange(len(track)) - np.repeat(np.cumsum(dwell) - dwell, dwell)
+    x1 = step / dwell[track] * (FRAME_SIZE[0] - 200)
+    data = {
+        'frame': arrivals[track] + step,
+        'timestamp': (arrivals[track] + step - 1) / FPS,
+        'track_id': track + 1,
+        'class_id': classes[track],
+        'confidence': rng.uniform(0.5, 0.95, len(track)),
+        'x1': x1, 'y1': lanes[track], 'x2': x1 + 200, 'y2': lanes[track] + 120,
+    }
+    order = np.argsort(data['frame'], kind='stable')
+    return {name: values[order].astype(COLUMNS[name]) for name, values in data.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=int, nargs='+', default=[10, 60])
+    parser.add_argument('--vehicles-per-minute', type=float, default=20)
+    args = parser.parse_args()
+
+    scratch_dir = setup_django()
+    from django.conf import settings
+    from traffic_monitor.detection_archive import DetectionArchiveWriter
+    from traffic_monitor.models import AggregatedData, Camera, CountingRegion, VideoUpload
+    from traffic_monitor.tracking import TRACKER_CONFIG
+    from traffic_monitor.yolo_processor import YOLO_CLASS_NAMES, recount_video
+
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, 'videos'))
+    make_synthetic_video(os.path.join(settings.MEDIA_ROOT, 'videos', 'recount.mp4'), frames=5, size=FRAME_SIZE)
+    camera = Camera.objects.create(name='Bench camera', count_period_seconds=300)
+    CountingRegion.objects.create(camera=camera, name='Middle', points=[[0.5, 1.0], [0.5, 0.0]])
+
+    print(f"{'minutes':>7} {'boxes':>10} {'mode':<8} {'seconds':>8} {'vehicles':>9} {'line count':>11}")
+    for minutes in args.minutes:
+        data = synthetic_tracks(minutes, args.vehicles_per_minute)
+        video = VideoUpload.objects.create(video_file='videos/recount.mp4', camera=camera, status='completed')
+        video.detection_archive.name = os.path.join('detections', f'recount_{minutes}.npz')
+        video.save()
+        with DetectionArchiveWriter(os.path.join(settings.MEDIA_ROOT, video.detection_archive.name)) as writer:
+            writer.add_columns(data)
+        for mode, tracker_config in (('archived', None), ('retrack', TRACKER_CONFIG)):
+            seconds, boxes = timed(recount_video, video.id, YOLO_CLASS_NAMES, tracker_config=tracker_config)
+            counts = AggregatedData.objects.filter(video=video)
+            vehicles = sum(counts.filter(region__isnull=True).values_list('count', flat=True))
+            line_count = sum(counts.filter(region__isnull=False).values_list('count', flat=True))
+            print(f"{minutes:>7} {boxes:>10} {mode:<8} {seconds:8.2f} {vehicles:>9} {line_count:>11}")
+    print(f"(scratch files in {scratch_dir})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Chart API response time against video length: the timeline read from
+DetectionBucket rows versus the old loop over every DetectionResult row.
+
+    python -m benchmarks.bench_timeline --minutes 1 10 60
+"""
+import argparse
+
+from benchmarks.common import setup_django, timed
+
+FPS = 25
+CLASSES = ('car', 'van', 'truck 2-axle')
+
+
+def legacy_timeline(video):
+    from traffic_monitor.models import DetectionResult
+    temp_timeline_data = {}
+    for dr in DetectionResult.objects.filter(video=video).order_by('timestamp_in_video'):
+        temp_timeline_data[dr.timestamp_in_video] = temp_timeline_data.get(dr.timestamp_in_video, 0) + dr.count
+    labels, data, running_total = [], [], 0
+    for ts in sorted(temp_timeline_data):
+        running_total += temp_timeline_data[ts]
+        labels.append(f"{ts:.2f}s")
+        data.append(running_total)
+    return labels, data
+
+
+def make_video(minutes):
+    from traffic_monitor.detection_writer import BufferedDetectionWriter
+    from traffic_monitor.models import VideoUpload
+    from traffic_monitor.time_buckets import TimeBucketAccumulator
+
+    video = VideoUpload.objects.create(video_file=f'videos/{minutes}min.mp4', status='completed')
+    buckets = TimeBucketAccumulator()
+    with BufferedDetectionWriter(batch_size=5000, flush_interval=None) as writer:
+        for frame_number in range(minutes * 60 * FPS):
+            for vehicle_class in CLASSES:
+                writer.add(video, frame_number / FPS, vehicle_class, 1)
+                buckets.add(frame_number / FPS, vehicle_class, 1)
+    buckets.save(video)
+    return video
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=int, nargs='+', default=[1, 10, 60])
+    args = parser.parse_args()
+
+    setup_django()
+    from traffic_monitor.time_buckets import TIMELINE_RESOLUTIONS, cumulative_timeline
+
+    for minutes in args.minutes:
+        video = make_video(minutes)
+        legacy, _ = timed(legacy_timeline, video)
+        line = f"{minutes:4d} min video: legacy loop {legacy * 1000:8.1f} ms"
+        for resolution in TIMELINE_RESOLUTIONS:
+            elapsed, _ = timed(cumulative_timeline, video, resolution)
+            line += f" | {resolution:2d}s buckets {elapsed * 1000:6.1f} ms"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
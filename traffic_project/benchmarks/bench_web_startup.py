@@ -0,0 +1,63 @@
+"""
+Start-up cost of a web process against a Celery worker process: import time
+and peak RSS of django.setup() plus the URLconf (everything a gunicorn or
+runserver worker loads before its first request), and the same plus the
+inference stack a worker imports. Each run is a fresh interpreter.
+
+    python -m benchmarks.bench_web_startup --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import PROJECT_DIR
+
+# Modules only Celery workers need; a web process should load none of them.
+INFERENCE_MODULES = ('torch', 'ultralytics', 'cv2')
+
+CHILD_SCRIPT = """
+import json, os, resource, sys, time
+sys.path.insert(0, {project_dir!r})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'traffic_project.settings')
+started = time.perf_counter()
+import django
+django.setup()
+import traffic_project.urls
+{extra_imports}
+print(json.dumps({{
+    'seconds': time.perf_counter() - started,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    'inference_modules': [name for name in {modules!r} if name in sys.modules],
+}}))
+"""
+
+PROCESSES = {
+    'web': '',
+    'worker': 'import traffic_monitor.tasks, traffic_monitor.yolo_processor',
+}
+
+
+def measure(process):
+    script = CHILD_SCRIPT.format(project_dir=PROJECT_DIR, extra_imports=PROCESSES[process],
+                                 modules=INFERENCE_MODULES)
+    output = subprocess.run([sys.executable, '-c', script], cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'process':<8} {'import s':>9} {'max RSS MB':>11}  inference modules loaded")
+    for process in PROCESSES:
+        runs = [measure(process) for _ in range(args.runs)]
+        print(f"{process:<8} {statistics.median(run['seconds'] for run in runs):9.2f} "
+              f"{statistics.median(run['max_rss_mb'] for run in runs):11.1f}  "
+              f"{', '.join(runs[-1]['inference_modules']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
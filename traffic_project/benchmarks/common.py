@@ -0,0 +1,47 @@
+"""
+Shared setup for the standalone benchmark scripts in this directory.
+
+Run the scripts from the Django project root (the directory with manage.py),
+for example `python -m benchmarks.bench_detection_writes`. They never touch
+db.sqlite3: each run migrates a throwaway SQLite database in a temp dir.
+"""
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+# The synthetic clip lives in the app, so `manage.py benchmark_pipeline` can use it too.
+from traffic_monitor.synthetic_video import make_synthetic_video  # noqa: E402,F401 -- re-exported for the scripts
+
+
+def setup_django(db_path=None, databases=None):
+    """
+    Configures Django against a scratch database and applies migrations.
+    `databases` adds further connections ({alias: settings}), which are left
+    unmigrated.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'traffic_project.settings')
+
+    import django
+    from django.conf import settings
+
+    scratch_dir = tempfile.mkdtemp(prefix='traffic_bench_')
+    settings.DATABASES['default']['NAME'] = db_path or os.path.join(scratch_dir, 'bench.sqlite3')
+    settings.MEDIA_ROOT = os.path.join(scratch_dir, 'media')
+    settings.DATABASES.update(databases or {})
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return scratch_dir
+
+
+def timed(fn, *args, **kwargs):
+    """Returns (elapsed_seconds, result) for a single call."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
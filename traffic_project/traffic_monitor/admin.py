@@ -1,13 +1,33 @@
-from django.contrib import admin
-from .models import VideoUpload, DetectionResult, AggregatedData
+from django.contrib import admin, messages
+from .models import VideoUpload, DetectionResult, DetectionRun, AggregatedData, VideoChunk, DetectionBucket, TrackSummary, Camera, CountingRegion, LiveStream, StreamAggregate, ProcessingCheckpoint, ProcessingProgress
+from .tasks import recount_video_task
 
 
 # Register your models here.
 @admin.register(VideoUpload)
 class VideoAdmin(admin.ModelAdmin):
-    list_display = ('id', 'video_file', 'status', 'uploaded_at', 'processed_at')
+    list_display = ('id', 'video_file', 'status', 'uploaded_at', 'processed_at', 'frame_count', 'skipped_frame_count')
     search_fields = ('video_file',)
     list_filter = ('uploaded_at',)
+    actions = ('recount_from_detections', 'retrack_and_recount_from_detections')
+
+    def _queue_recounts(self, request, queryset, **options):
+        videos = [video for video in queryset if video.detection_archive]
+        for video in videos:
+            recount_video_task.delay(video.id, **options)
+        skipped = len(queryset) - len(videos)
+        message = f"Queued a recount for {len(videos)} video(s)."
+        if skipped:
+            message += f" {skipped} video(s) have no detection archive and need to be processed again."
+        self.message_user(request, message, messages.WARNING if skipped else messages.SUCCESS)
+
+    @admin.action(description="Recount from cached detections")
+    def recount_from_detections(self, request, queryset):
+        self._queue_recounts(request, queryset)
+
+    @admin.action(description="Re-run tracking and recount from cached detections")
+    def retrack_and_recount_from_detections(self, request, queryset):
+        self._queue_recounts(request, queryset, retrack=True)
 
 @admin.register(DetectionResult)
 class DetectionResultAdmin(admin.ModelAdmin):
@@ -15,9 +35,58 @@ class DetectionResultAdmin(admin.ModelAdmin):
     search_fields = ('video__title', 'vehicle_class')
     list_filter = ('vehicle_class',)
 
+@admin.register(DetectionRun)
+class DetectionRunAdmin(admin.ModelAdmin):
+    list_display = ('video', 'start_time', 'end_time', 'frame_count', 'vehicle_class', 'count')
+    list_filter = ('vehicle_class',)
+
 @admin.register(AggregatedData)
 class AggregatedDataAdmin(admin.ModelAdmin):
-    list_display = ('video', 'time_period_start', 'vehicle_class', 'count')
+    list_display = ('video', 'time_period_start', 'region', 'direction', 'vehicle_class', 'count')
     search_fields = ('video__title', 'vehicle_class')
+    list_filter = ('vehicle_class', 'region', 'direction')
+
+
+@admin.register(VideoChunk)
+class VideoChunkAdmin(admin.ModelAdmin):
+    list_display = ('video', 'index', 'start_frame', 'end_frame', 'status', 'frames_processed', 'updated_at')
+    list_filter = ('status',)
+
+@admin.register(DetectionBucket)
+class DetectionBucketAdmin(admin.ModelAdmin):
+    list_display = ('video', 'resolution_seconds', 'bucket_index', 'vehicle_class', 'count')
+    list_filter = ('resolution_seconds', 'vehicle_class')
+
+@admin.register(TrackSummary)
+class TrackSummaryAdmin(admin.ModelAdmin):
+    list_display = ('video', 'track_id', 'vehicle_class', 'first_seen', 'last_seen', 'frames_seen', 'max_confidence')
     list_filter = ('vehicle_class',)
 
+@admin.register(ProcessingCheckpoint)
+class ProcessingCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('video', 'frame_number', 'timestamp_in_video', 'updated_at')
+    exclude = ('state',)
+
+@admin.register(ProcessingProgress)
+class ProcessingProgressAdmin(admin.ModelAdmin):
+    list_display = ('video', 'frames_done', 'total_frames', 'current_fps', 'infer_seconds', 'updated_at')
+
+class CountingRegionInline(admin.TabularInline):
+    model = CountingRegion
+    extra = 1
+
+@admin.register(Camera)
+class CameraAdmin(admin.ModelAdmin):
+    list_display = ('name', 'count_period_seconds', 'inference_imgsz')
+    inlines = [CountingRegionInline]
+
+@admin.register(LiveStream)
+class LiveStreamAdmin(admin.ModelAdmin):
+    list_display = ('name', 'source', 'camera', 'status', 'last_frame_at', 'frames_processed', 'frames_dropped', 'reconnect_count', 'latency_seconds')
+    list_filter = ('status',)
+    readonly_fields = ('status', 'started_at', 'last_frame_at', 'frames_processed', 'frames_dropped', 'reconnect_count', 'latency_seconds')
+
+@admin.register(StreamAggregate)
+class StreamAggregateAdmin(admin.ModelAdmin):
+    list_display = ('stream', 'time_period_start', 'region', 'direction', 'vehicle_class', 'count')
+    list_filter = ('stream', 'vehicle_class', 'region', 'direction')
@@ -0,0 +1,59 @@
+import cv2
+
+# BGR colours cycled by class id.
+CLASS_COLOURS = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+    (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0),
+    (168, 153, 44), (255, 194, 0), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+    (255, 56, 132), (133, 0, 82), (255, 56, 203), (200, 149, 255),
+]
+
+
+def output_frame_size(width, height, scale=1.0):
+    """Output size for a scale factor, rounded down to even numbers for the encoder."""
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+class FrameAnnotator:
+    """
+    Draws tracked boxes and labels straight onto the decoded frame.
+
+    Unlike results[0].plot(), no copy of the full-resolution frame is made: the
+    frame is downscaled first when `size` is smaller than the source (so the
+    drawing runs on fewer pixels) and annotated in place otherwise. Box
+    coordinates are read once per frame as NumPy arrays.
+    """
+
+    def __init__(self, class_names_dict, size=None):
+        self.class_names_dict = class_names_dict
+        self.size = size
+
+    def __call__(self, decoded_frame, yolo_results_frame):
+        image = decoded_frame.image
+        height, width = image.shape[:2]
+        scale_x = scale_y = 1.0
+        if self.size is not None and self.size != (width, height):
+            image = cv2.resize(image, self.size, interpolation=cv2.INTER_AREA)
+            scale_x, scale_y = self.size[0] / width, self.size[1] / height
+
+        boxes = yolo_results_frame.boxes
+        if boxes is None or len(boxes) == 0:
+            return image
+
+        # A scaled copy: on CPU numpy() is a view of the boxes that counting and the archive still read.
+        xyxy = boxes.xyxy.cpu().numpy() * [scale_x, scale_y, scale_x, scale_y]
+        class_ids = boxes.cls.cpu().numpy().astype(int)
+        track_ids = boxes.id.cpu().numpy().astype(int) if boxes.id is not None else None
+
+        thickness = max(1, round(min(image.shape[:2]) / 400))
+        font_scale = thickness / 3
+        for i, (x1, y1, x2, y2) in enumerate(xyxy.astype(int)):
+            class_id = class_ids[i]
+            colour = CLASS_COLOURS[class_id % len(CLASS_COLOURS)]
+            label = self.class_names_dict.get(class_id, str(class_id))
+            if track_ids is not None:
+                label = f"{track_ids[i]} {label}"
+            cv2.rectangle(image, (x1, y1), (x2, y2), colour, thickness, cv2.LINE_AA)
+            cv2.putText(image, label, (x1, max(y1 - 4, 10)), cv2.FONT_HERSHEY_SIMPLEX, font_scale,
+                        colour, thickness, cv2.LINE_AA)
+        return image
@@ -0,0 +1,49 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Defaults used when the settings module does not override them.
+DEFAULT_CHART_DATA_CACHE_ALIAS = 'default'
+DEFAULT_CHART_DATA_CACHE_SECONDS = 60 * 60
+
+# Bumped whenever a video finishes processing; part of every cache key and ETag,
+# so responses cached before that point are never served or revalidated again.
+_GENERATION_KEY = 'chart-data:generation'
+
+
+def _cache():
+    return caches[getattr(settings, 'CHART_DATA_CACHE_ALIAS', DEFAULT_CHART_DATA_CACHE_ALIAS)]
+
+
+def _generation():
+    generation = _cache().get(_GENERATION_KEY)
+    if generation is None:
+        generation = 1
+        _cache().add(_GENERATION_KEY, generation, None)
+    return generation
+
+
+def chart_data_key(video, resolution):
+    """Cache key for a completed video's chart data; changes with `processed_at`."""
+    return f"chart-data:{_generation()}:{video.id}:{video.processed_at.timestamp()}:{resolution}"
+
+
+def chart_data_etag(cache_key):
+    return '"%s"' % hashlib.md5(cache_key.encode()).hexdigest()
+
+
+def get_chart_data(cache_key):
+    return _cache().get(cache_key)
+
+
+def set_chart_data(cache_key, data):
+    _cache().set(cache_key, data, getattr(settings, 'CHART_DATA_CACHE_SECONDS', DEFAULT_CHART_DATA_CACHE_SECONDS))
+
+
+def invalidate_chart_data():
+    """Drops every cached chart response; called when a video finishes processing."""
+    try:
+        _cache().incr(_GENERATION_KEY)
+    except ValueError:
+        _cache().add(_GENERATION_KEY, 2, None)
@@ -0,0 +1,94 @@
+"""
+Checkpoints for resuming single-pass video processing after a crash.
+
+A retry restarts `overlap_frames` before the checkpointed frame so its fresh
+tracker is warmed up when recording resumes, and maps its track IDs onto the
+interrupted run's by box IoU on those frames, as chunk merging does at chunk
+boundaries. Tracks without a match get IDs above any the interrupted run
+used, so track IDs stay unique across the whole video.
+"""
+from collections import deque
+
+import numpy as np
+
+from .chunking import match_overlap_tracks
+
+# Defaults used when the settings module does not override them.
+DEFAULT_CHECKPOINT_INTERVAL_FRAMES = 1000
+DEFAULT_CHECKPOINT_OVERLAP_FRAMES = 25
+
+
+def _box_rows(frame_index, track_ids, xyxy):
+    return [[frame_index, track_id] + box for track_id, box in zip(track_ids.tolist(), xyxy.tolist())]
+
+
+class CheckpointRecorder:
+    """
+    Keeps what a checkpoint needs besides the TrackStore, TimeBucketAccumulator
+    and CountingEngine state: the tracked boxes of the last `overlap_frames`
+    recorded frames, the highest track ID used and the finished annotated
+    segments. `resume_state` is the ProcessingCheckpoint.state to continue from.
+    """
+
+    def __init__(self, interval_frames=DEFAULT_CHECKPOINT_INTERVAL_FRAMES,
+                 overlap_frames=DEFAULT_CHECKPOINT_OVERLAP_FRAMES, resume_state=None):
+        self.interval_frames = interval_frames
+        self.overlap_frames = overlap_frames
+        self.max_track_id = 0
+        self.segments = []
+        self._tail = deque()  # Box rows [frame_index, track_id, x1, y1, x2, y2] per recorded frame
+        self._matches = {}
+        self._id_offset = 0
+        self._head = None
+        self._resume_tail = None
+        if resume_state:
+            self.max_track_id = resume_state['max_track_id']
+            self.segments = list(resume_state['segments'])
+            self._id_offset = self.max_track_id
+            self._matches = None  # Decided on the first recorded frame
+            self._head = []
+            self._resume_tail = resume_state['tail']
+
+    def map_track_id(self, track_id):
+        return self._matches.get(track_id, track_id + self._id_offset)
+
+    def track_ids(self, frame_index, track_ids, xyxy, recording):
+        """
+        Returns (track_ids, matched_now) for one frame's tracked boxes. When
+        resuming, warm-up frames keep the new tracker's IDs; matched_now is True
+        on the frame the mapping is decided on, after which per-track state
+        collected on the warm-up frames has to be renamed with map_track_id.
+        """
+        matched_now = False
+        if self._matches is None:
+            if not recording:
+                self._head.extend(_box_rows(frame_index, track_ids, xyxy))
+                return track_ids, False
+            self._matches = match_overlap_tracks(self._resume_tail, self._head)
+            self._head = self._resume_tail = None
+            matched_now = True
+        if self._matches or self._id_offset:
+            track_ids = np.array([self.map_track_id(track_id) for track_id in track_ids.tolist()], dtype=np.int64)
+        if len(track_ids):
+            self.max_track_id = max(self.max_track_id, int(track_ids.max()))
+        rows = _box_rows(frame_index, track_ids, xyxy)
+        if rows:
+            self._tail.append(rows)
+        while self._tail and self._tail[0][0][0] <= frame_index - self.overlap_frames:
+            self._tail.popleft()
+        return track_ids, matched_now
+
+    def due(self, frame_index):
+        return bool(self.interval_frames) and frame_index % self.interval_frames == 0
+
+    def state(self, track_store, time_buckets, counting, frames_skipped):
+        """JSON-serialisable ProcessingCheckpoint.state."""
+        return {
+            'open_tracks': track_store.records(),
+            'tail': [row for rows in self._tail for row in rows],
+            'max_track_id': self.max_track_id,
+            'buckets': time_buckets.rows(),
+            'events': [list(event) for event in counting.events] if counting is not None else [],
+            'segments': self.segments,
+            'frames_skipped': frames_skipped,
+        }
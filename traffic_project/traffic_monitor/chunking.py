@@ -0,0 +1,157 @@
+"""
+Splitting long videos into overlapping frame ranges and merging the per-chunk
+tracks back into video-wide tracks.
+
+Chunk k owns the "core" frames [start_frame, end_frame). Every chunk but the
+first also decodes `overlap` frames before its core ([process_start_frame,
+start_frame)) so its tracker is warmed up when the core starts. Those overlap
+frames are also the last core frames of chunk k-1, so vehicles crossing the
+boundary are seen by both chunks there and their track IDs can be matched by
+box IoU on the shared frames.
+
+Frame numbers in the plan are 0-based; DecodedFrame.index is 1-based, so frame
+number f has index f + 1.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .track_store import combine_track_records
+
+ChunkPlan = namedtuple('ChunkPlan', ['index', 'process_start_frame', 'start_frame', 'end_frame'])
+
+# Share of the shared overlap frames in which two tracks' boxes must overlap
+# (IoU >= iou_threshold) before they are treated as the same vehicle.
+DEFAULT_MATCH_IOU = 0.5
+
+
+def plan_chunks(total_frames, chunk_frames, overlap_frames):
+    """Splits [0, total_frames) into core ranges of chunk_frames with overlap_frames warm-up."""
+    if chunk_frames < 1:
+        raise ValueError(f"chunk_frames must be at least 1, got {chunk_frames}")
+    overlap_frames = max(0, min(overlap_frames, chunk_frames))
+    plans = []
+    for index, start_frame in enumerate(range(0, total_frames, chunk_frames)):
+        plans.append(ChunkPlan(
+            index=index,
+            process_start_frame=max(0, start_frame - overlap_frames),
+            start_frame=start_frame,
+            end_frame=min(start_frame + chunk_frames, total_frames),
+        ))
+    return plans
+
+
+class ChunkTrackRecorder:
+    """
+    Collects the tracked boxes merge_chunk_tracks matches on: those on the frames
+    shared with the previous chunk (head) and with the next chunk (tail). The
+    tail overlap is the next chunk's warm-up length, 0 for the last chunk.
+    """
+
+    def __init__(self, start_frame, end_frame, head_overlap_frames, tail_overlap_frames):
+        # 1-based frame indexes, inclusive. A zero overlap gives an empty range.
+        self.head = (start_frame - head_overlap_frames + 1, start_frame)
+        self.tail = (end_frame - tail_overlap_frames + 1, end_frame)
+        self.head_boxes = []
+        self.tail_boxes = []
+
+    def observe(self, frame_index, yolo_results_frame):
+        boxes = yolo_results_frame.boxes
+        if boxes is None or boxes.id is None or len(boxes) == 0:
+            return
+        in_head = self.head[0] <= frame_index <= self.head[1]
+        in_tail = self.tail[0] <= frame_index <= self.tail[1]
+        if in_head or in_tail:
+            track_ids = boxes.id.cpu().numpy().astype(int)
+            xyxy = boxes.xyxy.cpu().numpy()
+            rows = [[frame_index, int(track_id)] + [float(v) for v in box] for track_id, box in zip(track_ids, xyxy)]
+            (self.head_boxes if in_head else self.tail_boxes).extend(rows)
+
+    def summary(self):
+        """JSON-serialisable result handed from the chunk task to the merge task."""
+        return {
+            'head': self.head_boxes,
+            'tail': self.tail_boxes,
+        }
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU of every box in `boxes_a` with every box in `boxes_b` (x1, y1, x2, y2 rows), as an (a, b) array."""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+def match_overlap_tracks(tail_rows, head_rows, iou_threshold=DEFAULT_MATCH_IOU):
+    """
+    Pairs track IDs of one chunk's tail with the next chunk's head.
+    Rows are [frame_index, track_id, x1, y1, x2, y2]. Returns {next_track_id: prev_track_id}.
+    """
+    if not tail_rows or not head_rows:
+        return {}
+    tail = np.asarray(tail_rows, dtype=np.float64)
+    head = np.asarray(head_rows, dtype=np.float64)
+    votes = {}
+    for frame_index in np.intersect1d(tail[:, 0], head[:, 0]):
+        prev = tail[tail[:, 0] == frame_index]
+        nxt = head[head[:, 0] == frame_index]
+        prev_idx, next_idx = np.nonzero(iou_matrix(prev[:, 2:], nxt[:, 2:]) >= iou_threshold)
+        for p, n in zip(prev[prev_idx, 1].astype(int), nxt[next_idx, 1].astype(int)):
+            votes[(p, n)] = votes.get((p, n), 0) + 1
+
+    # Greedy one-to-one assignment, most shared frames first.
+    matches, used_prev = {}, set()
+    for (prev_id, next_id), _ in sorted(votes.items(), key=lambda item: -item[1]):
+        if prev_id not in used_prev and next_id not in matches:
+            matches[next_id] = prev_id
+            used_prev.add(prev_id)
+    return matches
+
+
+def merge_chunk_tracks(summaries, iou_threshold=DEFAULT_MATCH_IOU, track_id_maps=None):
+    """
+    Merges per-chunk summaries (in chunk order) into one list of TrackStore
+    records for the whole video, renumbered 1..n in order of appearance.
+
+    Each summary's 'tracks' holds the chunk's records for its core frames.
+    Tracks matched across a boundary become one vehicle whose class votes are
+    summed, so the majority class is decided over the whole crossing. Tracks
+    that only appeared on a chunk's warm-up frames have no record there and
+    are counted by the previous chunk instead.
+
+    A `track_id_maps` list is filled with one {chunk track ID: video track ID}
+    dict per chunk.
+    """
+    parent = {}
+
+    def find(key):
+        while parent.get(key, key) != key:
+            key = parent[key]
+        return key
+
+    for chunk_index in range(1, len(summaries)):
+        matches = match_overlap_tracks(summaries[chunk_index - 1]['tail'], summaries[chunk_index]['head'], iou_threshold)
+        for next_id, prev_id in matches.items():
+            parent[find((chunk_index, next_id))] = find((chunk_index - 1, prev_id))
+
+    records_by_vehicle = {}
+    for chunk_index, summary in enumerate(summaries):
+        for record in summary['tracks']:
+            records_by_vehicle.setdefault(find((chunk_index, record['track_id'])), []).append(record)
+
+    vehicles = sorted(((vehicle, combine_track_records(records)) for vehicle, records in records_by_vehicle.items()),
+                      key=lambda item: (item[1]['first_frame'], item[1]['track_id']))
+    video_track_ids = {}
+    for track_id, (vehicle, record) in enumerate(vehicles, start=1):
+        record['track_id'] = track_id
+        video_track_ids[vehicle] = track_id
+    if track_id_maps is not None:
+        track_id_maps[:] = [{record['track_id']: video_track_ids[find((chunk_index, record['track_id']))]
+                             for record in summary['tracks']}
+                            for chunk_index, summary in enumerate(summaries)]
+    return [record for _, record in vehicles]
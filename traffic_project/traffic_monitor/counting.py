@@ -0,0 +1,169 @@
+"""
+Counting lines and zones: turns per-frame track positions into crossing events.
+
+Every frame, each track's centroid movement since its previous position is a
+segment; it is tested against all counting-line segments at once, and the
+current centroids are tested against all zone polygons at once. Events are
+(track_id, region_id, direction, timestamp) and are resolved to vehicle
+classes and counting periods at the end, once each track's majority class is
+known.
+"""
+import numpy as np
+
+from .models import CountingRegion
+
+# Defaults used when the settings module does not override them.
+DEFAULT_COUNTING_MAX_IDLE_FRAMES = 750
+# Forgotten track positions are looked for every this many frames.
+EVICT_INTERVAL_FRAMES = 250
+
+
+def _cross(o, a, b):
+    """z of (a - o) x (b - o), broadcast over leading dimensions."""
+    return (a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1]) - (a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0])
+
+
+def segment_crossings(starts, ends, seg_a, seg_b):
+    """
+    Tests N movement segments (starts -> ends, (N, 2)) against S line segments
+    (seg_a -> seg_b, (S, 2)). Returns an (N, S) int8 matrix: +1 where the
+    movement crosses to the right of the line segment ('in'), -1 for the
+    opposite direction and 0 for no crossing. Ending exactly on a line counts
+    as crossing it; starting on it does not, so a crossing is never counted twice.
+    """
+    p, q = starts[:, None, :], ends[:, None, :]
+    a, b = seg_a[None, :, :], seg_b[None, :, :]
+    side_before = _cross(a, b, p)
+    side_after = _cross(a, b, q)
+    movement_side_a = _cross(p, q, a)
+    movement_side_b = _cross(p, q, b)
+    crosses_line = (side_before != 0) & ((side_before > 0) != (side_after > 0)) | (side_before != 0) & (side_after == 0)
+    straddles_movement = (movement_side_a > 0) != (movement_side_b > 0)
+    crossed = crosses_line & straddles_movement
+    # Image y grows downwards: a positive cross product is to the right of a -> b.
+    return np.where(crossed, np.where(side_before < 0, 1, -1), 0).astype(np.int8)
+
+
+def points_in_polygon(points, polygon):
+    """Ray-casting point-in-polygon test for (N, 2) points; returns an (N,) bool array."""
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0][None, :], polygon[:, 1][None, :]
+    x2, y2 = np.roll(polygon[:, 0], -1)[None, :], np.roll(polygon[:, 1], -1)[None, :]
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_at_y = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(straddles & (x < x_at_y), axis=1) % 2 == 1
+
+
+class CountingEngine:
+    """
+    Incremental line/zone counter for one video.
+
+    `regions` are CountingRegion objects (or anything with id, kind and points);
+    their relative points are scaled to `frame_size` (width, height). Each track
+    is counted at most once per region and direction.
+    """
+
+    def __init__(self, regions, frame_size, max_idle_frames=DEFAULT_COUNTING_MAX_IDLE_FRAMES):
+        scale = np.array(frame_size, dtype=np.float64)
+        self.max_idle_frames = max_idle_frames
+        seg_a, seg_b, seg_regions = [], [], []
+        self.zones = []  # (region_id, polygon in pixels)
+        for region in regions:
+            points = np.asarray(region.points, dtype=np.float64) * scale
+            if region.kind == CountingRegion.KIND_ZONE:
+                self.zones.append((region.id, points))
+            else:
+                seg_a.extend(points[:-1])
+                seg_b.extend(points[1:])
+                seg_regions.extend([region.id] * (len(points) - 1))
+        self.seg_a = np.array(seg_a, dtype=np.float64).reshape(-1, 2)
+        self.seg_b = np.array(seg_b, dtype=np.float64).reshape(-1, 2)
+        self.seg_regions = seg_regions
+        self.events = []  # (track_id, region_id, direction, timestamp)
+        self._last_position = {}  # track_id -> (x, y, frame_index)
+        self._inside = {}  # track_id -> bool array, one entry per zone
+        self._counted = {}  # track_id -> {(region_id, direction)}
+        self._next_evict_frame = EVICT_INTERVAL_FRAMES
+
+    @property
+    def enabled(self):
+        return len(self.seg_regions) > 0 or len(self.zones) > 0
+
+    def update(self, frame_index, timestamp, track_ids, xyxy, record=True):
+        """
+        Advances all tracks seen on this frame. `xyxy` holds their boxes (N, 4).
+        With record=False (tracker warm-up frames) positions and zone states
+        are updated but no events are emitted.
+        """
+        if len(track_ids):
+            centroids = np.column_stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2])
+            track_ids = track_ids.tolist()
+            if len(self.seg_regions):
+                self._update_lines(track_ids, centroids, timestamp, record)
+            if self.zones:
+                self._update_zones(track_ids, centroids, timestamp, record)
+            for track_id, (x, y) in zip(track_ids, centroids.tolist()):
+                self._last_position[track_id] = (x, y, frame_index)
+
+        if frame_index >= self._next_evict_frame:
+            self._next_evict_frame = frame_index + EVICT_INTERVAL_FRAMES
+            for track_id in [t for t, (_, _, last) in self._last_position.items() if last < frame_index - self.max_idle_frames]:
+                del self._last_position[track_id]
+                self._inside.pop(track_id, None)
+                self._counted.pop(track_id, None)
+
+    def restore_events(self, events):
+        """Continues after a checkpoint: `events` were emitted before it and are not emitted again."""
+        self.events = [tuple(event) for event in events]
+        for track_id, region_id, direction, _ in self.events:
+            self._counted.setdefault(track_id, set()).add((region_id, direction))
+
+    def rename_tracks(self, rename):
+        """Re-keys positions and zone states with rename(track_id), e.g. once a resumed run's IDs are matched."""
+        for state in (self._last_position, self._inside):
+            renamed = {rename(track_id): value for track_id, value in state.items()}
+            state.clear()
+            state.update(renamed)
+
+    def _emit(self, track_id, region_id, direction, timestamp, record):
+        counted = self._counted.setdefault(track_id, set())
+        if record and (region_id, direction) not in counted:
+            counted.add((region_id, direction))
+            self.events.append((track_id, region_id, direction, timestamp))
+
+    def _update_lines(self, track_ids, centroids, timestamp, record):
+        known = [i for i, track_id in enumerate(track_ids) if track_id in self._last_position]
+        if not known:
+            return
+        starts = np.array([self._last_position[track_ids[i]][:2] for i in known], dtype=np.float64)
+        crossings = segment_crossings(starts, centroids[known], self.seg_a, self.seg_b)
+        for row, segment in zip(*np.nonzero(crossings)):
+            direction = CountingRegion.DIRECTION_IN if crossings[row, segment] > 0 else CountingRegion.DIRECTION_OUT
+            self._emit(track_ids[known[row]], self.seg_regions[segment], direction, timestamp, record)
+
+    def _update_zones(self, track_ids, centroids, timestamp, record):
+        inside_now = np.column_stack([points_in_polygon(centroids, polygon) for _, polygon in self.zones])
+        for row, track_id in enumerate(track_ids):
+            before = self._inside.get(track_id)
+            self._inside[track_id] = inside_now[row]
+            if before is None:
+                continue  # First sighting: already inside is not an entry.
+            for zone in np.flatnonzero(before != inside_now[row]).tolist():
+                direction = CountingRegion.DIRECTION_IN if inside_now[row, zone] else CountingRegion.DIRECTION_OUT
+                self._emit(track_id, self.zones[zone][0], direction, timestamp, record)
+
+
+def period_counts(events, track_classes, period_seconds):
+    """
+    Sums events into {(region_id, direction, period_index, vehicle_class): count}.
+    `track_classes` maps track_id -> vehicle class name; unknown tracks are skipped.
+    """
+    counts = {}
+    for track_id, region_id, direction, timestamp in events:
+        vehicle_class = track_classes.get(track_id)
+        if vehicle_class is None or vehicle_class == "unknown":
+            continue
+        key = (region_id, direction, int(timestamp // period_seconds), vehicle_class)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
@@ -0,0 +1,219 @@
+"""
+Columnar archive of a video's raw per-frame detections.
+
+While a video is processed every recorded frame's tracked boxes are appended
+to one archive per video in MEDIA_ROOT/detections (VideoUpload.detection_archive),
+one row per box:
+
+    frame, timestamp, track_id (-1: none), class_id, confidence, x1, y1, x2, y2
+
+DETECTION_ARCHIVE_FORMAT selects the format:
+
+    'npz'      one .npz file; each flush appends a chunk of every column as
+               its own compressed member, so load_detections() decompresses
+               only the columns asked for. Needs nothing beyond NumPy.
+    'parquet'  a directory of Parquet files, one per flush (pyarrow); loading
+               memory-maps them and reads only the selected columns.
+
+Each flush leaves a complete, readable archive, so a job that dies keeps
+everything flushed before its last checkpoint. Analytics and re-counting
+work on the loaded column arrays without touching the database.
+"""
+import os
+import shutil
+import zipfile
+
+import numpy as np
+
+ARCHIVE_NPZ = 'npz'
+ARCHIVE_PARQUET = 'parquet'
+ARCHIVE_FORMATS = (ARCHIVE_NPZ, ARCHIVE_PARQUET)
+
+COLUMNS = {
+    'frame': np.int32,
+    'timestamp': np.float64,
+    'track_id': np.int32,
+    'class_id': np.int16,
+    'confidence': np.float32,
+    'x1': np.float32,
+    'y1': np.float32,
+    'x2': np.float32,
+    'y2': np.float32,
+}
+
+# Defaults used when the settings module does not override them.
+DEFAULT_DETECTION_ARCHIVE_FORMAT = ARCHIVE_NPZ
+DEFAULT_DETECTION_ARCHIVE_CHUNK_ROWS = 65536
+
+
+def archive_filename(stem, archive_format):
+    """File (npz) or directory (parquet) name of an archive."""
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown detection archive format {archive_format!r}, expected one of {', '.join(ARCHIVE_FORMATS)}")
+    return f"{stem}.{archive_format}"
+
+
+def _archive_format(path):
+    return ARCHIVE_PARQUET if str(path).endswith('.' + ARCHIVE_PARQUET) else ARCHIVE_NPZ
+
+
+def _empty_columns(columns=None):
+    return {name: np.empty(0, dtype=COLUMNS[name]) for name in (columns or COLUMNS)}
+
+
+def _select(data, keep):
+    return {name: values[keep] for name, values in data.items()}
+
+
+def _write_chunk(path, archive_format, chunk_index, data):
+    if archive_format == ARCHIVE_PARQUET:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(path, exist_ok=True)
+        table = pa.table({name: data[name] for name in COLUMNS})
+        part_path = os.path.join(path, f'part-{chunk_index:05d}.parquet')
+        pq.write_table(table, part_path + '.tmp', compression='zstd')
+        os.replace(part_path + '.tmp', part_path)  # Readers never see a half-written part
+        return
+    # Opening in append mode rewrites the central directory on close, so the
+    # file is a valid archive after every chunk.
+    with zipfile.ZipFile(path, 'a', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name in COLUMNS:
+            with archive.open(f'{name}/{chunk_index:05d}.npy', 'w') as member:
+                np.lib.format.write_array(member, np.ascontiguousarray(data[name]))
+
+
+def remove_archive(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def load_detections(path, columns=None):
+    """
+    {column: array} of an archive, for `columns` only (default: all), in the
+    order the rows were written. Empty arrays when the archive does not exist.
+    """
+    columns = list(columns or COLUMNS)
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown detection archive columns: {', '.join(sorted(unknown))}")
+    if not os.path.exists(path):
+        return _empty_columns(columns)
+    if _archive_format(path) == ARCHIVE_PARQUET:
+        import pyarrow.parquet as pq
+        parts = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.parquet'))
+        if not parts:
+            return _empty_columns(columns)
+        tables = [pq.read_table(part, columns=columns, memory_map=True) for part in parts]
+        return {name: np.concatenate([table.column(name).to_numpy() for table in tables]).astype(COLUMNS[name], copy=False)
+                for name in columns}
+    with np.load(path) as archive:
+        names = sorted(archive.files)
+        return {name: np.concatenate([archive[member] for member in names if member.startswith(name + '/')]
+                                     or [np.empty(0, dtype=COLUMNS[name])])
+                for name in columns}
+
+
+class DetectionArchiveWriter:
+    """
+    Appends per-frame detections to the archive at `path`, a chunk of
+    `chunk_rows` rows at a time. An existing archive is replaced, unless
+    `keep_through_frame` is given (a resumed job): then its rows up to and
+    including that frame are kept and later ones dropped.
+
+    Use it as a context manager so the rows buffered last are written, also
+    when processing fails.
+    """
+
+    def __init__(self, path, archive_format=DEFAULT_DETECTION_ARCHIVE_FORMAT,
+                 chunk_rows=DEFAULT_DETECTION_ARCHIVE_CHUNK_ROWS, keep_through_frame=None):
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown detection archive format {archive_format!r}, expected one of {', '.join(ARCHIVE_FORMATS)}")
+        if archive_format == ARCHIVE_PARQUET:
+            import pyarrow  # noqa: F401 -- fail before processing starts, not at the first flush
+        self.path = str(path)
+        self.archive_format = archive_format
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self._pending = []
+        self._pending_rows = 0
+        kept = None
+        if keep_through_frame is not None and os.path.exists(self.path):
+            existing = load_detections(self.path)
+            kept = _select(existing, existing['frame'] <= keep_through_frame)
+        remove_archive(self.path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._chunks = 0
+        if kept is not None and len(kept['frame']):
+            _write_chunk(self.path, self.archive_format, 0, kept)
+            self._chunks = 1
+            self.rows_written = len(kept['frame'])
+
+    def add(self, frame, timestamp, class_ids, track_ids, confidences, xyxy):
+        """Buffers one frame's boxes (arrays as from yolo_processor._frame_arrays; track_ids may be None)."""
+        count = len(class_ids)
+        if not count:
+            return
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.add_columns({
+            'frame': np.full(count, frame, dtype=COLUMNS['frame']),
+            'timestamp': np.full(count, timestamp, dtype=COLUMNS['timestamp']),
+            'track_id': np.full(count, -1, dtype=COLUMNS['track_id']) if track_ids is None
+                        else np.asarray(track_ids, dtype=COLUMNS['track_id']),
+            'class_id': np.asarray(class_ids, dtype=COLUMNS['class_id']),
+            'confidence': np.asarray(confidences, dtype=COLUMNS['confidence']),
+            'x1': xyxy[:, 0], 'y1': xyxy[:, 1], 'x2': xyxy[:, 2], 'y2': xyxy[:, 3],
+        })
+
+    def add_columns(self, data):
+        """Buffers rows given as {column: array}, all columns of equal length."""
+        rows = len(data['frame'])
+        if not rows:
+            return
+        self._pending.append(data)
+        self._pending_rows += rows
+        if self._pending_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows as one chunk; the archive is complete afterwards."""
+        if not self._pending:
+            return
+        data = {name: np.concatenate([frame[name] for frame in self._pending]) for name in COLUMNS}
+        _write_chunk(self.path, self.archive_format, self._chunks, data)
+        self._chunks += 1
+        self.rows_written += self._pending_rows
+        self._pending, self._pending_rows = [], 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def concatenate_archives(part_paths, output_path, track_id_maps=None, chunk_rows=DEFAULT_DETECTION_ARCHIVE_CHUNK_ROWS):
+    """
+    Joins per-chunk archives into `output_path` (same format as the parts) and
+    removes the parts. `track_id_maps` holds one {chunk track ID: video track
+    ID} dict per part; IDs missing from it become -1.
+    """
+    archive_format = _archive_format(output_path)
+    with DetectionArchiveWriter(output_path, archive_format, chunk_rows) as writer:
+        for index, part_path in enumerate(part_paths):
+            data = load_detections(part_path)
+            if track_id_maps is not None:
+                chunk_ids, positions = np.unique(data['track_id'], return_inverse=True)
+                video_ids = np.array([track_id_maps[index].get(int(track_id), -1) for track_id in chunk_ids],
+                                     dtype=COLUMNS['track_id'])
+                data['track_id'] = video_ids[positions]
+            writer.add_columns(data)
+    for part_path in part_paths:
+        remove_archive(part_path)
+    return writer.rows_written
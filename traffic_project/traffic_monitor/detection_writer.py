@@ -0,0 +1,174 @@
+import time
+from django.conf import settings
+from django.db import transaction
+from .models import DetectionResult, DetectionRun
+
+# How per-frame detection counts are stored: a DetectionResult row per frame
+# and class, or a DetectionRun row per run of frames with the same count.
+STORAGE_FRAMES = 'frames'
+STORAGE_RUNS = 'runs'
+STORAGE_MODES = (STORAGE_FRAMES, STORAGE_RUNS)
+
+# Defaults used when the settings module does not override them.
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL_SECONDS = 5.0
+DEFAULT_DETECTION_STORAGE = STORAGE_FRAMES
+
+
+class _BatchedWriter:
+    """
+    Collects rows of `model` in memory and writes them with bulk_create.
+
+    A flush happens when `batch_size` rows are buffered or when `flush_interval`
+    seconds have passed since the last flush, whichever comes first. Every flush
+    runs inside its own transaction, so a partially processed video keeps all the
+    rows of the batches flushed before a failure.
+
+    Use it as a context manager so the remaining rows are written even when the
+    processing loop raises.
+    """
+    model = None
+
+    def __init__(self, batch_size=None, flush_interval=None, clock=time.monotonic):
+        if batch_size is None:
+            batch_size = getattr(settings, 'DETECTION_WRITE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        if flush_interval is None:
+            flush_interval = getattr(settings, 'DETECTION_WRITE_FLUSH_SECONDS', DEFAULT_FLUSH_INTERVAL_SECONDS)
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._pending = []
+        self._last_flush = clock()
+        self.rows_written = 0
+
+    def _buffer(self, row):
+        self._pending.append(row)
+        self._flush_if_due()
+
+    def _flush_if_due(self):
+        if len(self._pending) >= self.batch_size or self._interval_elapsed():
+            self.flush()
+
+    def _interval_elapsed(self):
+        if self.flush_interval is None:
+            return False
+        return self._clock() - self._last_flush >= self.flush_interval
+
+    def flush(self):
+        """Writes all buffered rows in a single transaction."""
+        if self._pending:
+            rows, self._pending = self._pending, []
+            with transaction.atomic():
+                self.model.objects.bulk_create(rows, batch_size=self.batch_size)
+            self.rows_written += len(rows)
+        self._last_flush = self._clock()
+
+    def checkpoint(self):
+        """Writes everything about the frames added so far, for a processing checkpoint."""
+        self.flush()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Flush on both success and failure: rows collected before an error
+        # describe frames that were processed correctly.
+        self.checkpoint()
+        return False
+
+
+class BufferedDetectionWriter(_BatchedWriter):
+    """Writes a DetectionResult row per frame and detected class (DETECTION_STORAGE = 'frames')."""
+    model = DetectionResult
+
+    def add(self, video, timestamp_in_video, vehicle_class, count):
+        """Buffers one row and flushes if the batch size or interval is reached."""
+        self._buffer(DetectionResult(
+            video=video,
+            timestamp_in_video=timestamp_in_video,
+            vehicle_class=vehicle_class,
+            count=count,
+        ))
+
+    def add_frame(self, video, timestamp_in_video, frame_detections):
+        """Buffers the rows of one frame's {vehicle_class: count}."""
+        for vehicle_class, count in frame_detections.items():
+            self.add(video, timestamp_in_video, vehicle_class, count)
+
+
+class RunLengthDetectionWriter(_BatchedWriter):
+    """
+    Writes a DetectionRun row per run of consecutive frames in which a class
+    has the same count (DETECTION_STORAGE = 'runs'). Every recorded frame has
+    to be added, frames without detections included, since a class missing
+    from a frame ends its run. Runs still open are written at checkpoints and
+    on exit.
+    """
+    model = DetectionRun
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._open_runs = {}  # vehicle_class -> DetectionRun being extended
+
+    def add_frame(self, video, timestamp_in_video, frame_detections):
+        for vehicle_class in [c for c, run in self._open_runs.items() if frame_detections.get(c) != run.count]:
+            self._pending.append(self._open_runs.pop(vehicle_class))
+        for vehicle_class, count in frame_detections.items():
+            run = self._open_runs.get(vehicle_class)
+            if run is None:
+                self._open_runs[vehicle_class] = DetectionRun(
+                    video=video, vehicle_class=vehicle_class, count=count,
+                    start_time=timestamp_in_video, end_time=timestamp_in_video, frame_count=1,
+                )
+            else:
+                run.end_time = timestamp_in_video
+                run.frame_count += 1
+        self._flush_if_due()
+
+    def checkpoint(self):
+        # A resumed run starts new runs after the checkpoint frame, so none may stay open across it.
+        self._pending.extend(self._open_runs.values())
+        self._open_runs = {}
+        self.flush()
+
+
+def make_detection_writer():
+    """Writer for the configured DETECTION_STORAGE."""
+    storage = getattr(settings, 'DETECTION_STORAGE', DEFAULT_DETECTION_STORAGE)
+    if storage == STORAGE_RUNS:
+        return RunLengthDetectionWriter()
+    if storage == STORAGE_FRAMES:
+        return BufferedDetectionWriter()
+    raise ValueError(f"Unknown DETECTION_STORAGE {storage!r}, expected one of {', '.join(STORAGE_MODES)}")
+
+
+def expand_runs(runs):
+    """
+    Per-frame (timestamp_in_video, vehicle_class, count) rows of DetectionRun
+    objects. Frame times are spread evenly over each run, which is exact for
+    constant frame-rate video.
+    """
+    rows = []
+    for run in runs:
+        step = (run.end_time - run.start_time) / (run.frame_count - 1) if run.frame_count > 1 else 0.0
+        rows.extend((run.start_time + i * step, run.vehicle_class, run.count) for i in range(run.frame_count - 1))
+        rows.append((run.end_time, run.vehicle_class, run.count))
+    return rows
+
+
+def detection_timeline(video):
+    """
+    A video's per-frame (timestamp_in_video, vehicle_class, count) rows in time
+    order, from whichever storage it was processed with.
+    """
+    runs = DetectionRun.objects.filter(video=video).order_by('start_time')
+    if runs.exists():
+        return sorted(expand_runs(runs), key=lambda row: (row[0], row[1]))
+    return list(DetectionResult.objects.filter(video=video).order_by('timestamp_in_video', 'vehicle_class')
+                .values_list('timestamp_in_video', 'vehicle_class', 'count'))
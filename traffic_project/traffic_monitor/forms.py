@@ -4,4 +4,17 @@ from .models import VideoUpload
 class VideoUploadForm(forms.ModelForm):
     class Meta:
         model = VideoUpload
-        fields = ['video_file']
+        fields = ['video_file', 'camera', 'recorded_at', 'render_mode', 'output_scale', 'output_fps']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Processing options are optional; empty values fall back to the model defaults.
+        self.fields['render_mode'].required = False
+        self.fields['output_scale'].required = False
+
+    def clean_render_mode(self):
+        return self.cleaned_data.get('render_mode') or VideoUpload.RENDER_ANNOTATED
+
+    def clean_output_scale(self):
+        output_scale = self.cleaned_data.get('output_scale')
+        return 1.0 if output_scale is None else output_scale
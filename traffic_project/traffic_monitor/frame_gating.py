@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+
+# Defaults used when the settings module does not override them.
+DEFAULT_MOTION_MAX_SKIPPED_FRAMES = 25
+# Frames are compared at this width; differencing a thumbnail is enough to
+# tell "something moved" apart from sensor noise and costs well under 1 ms.
+MOTION_THUMBNAIL_WIDTH = 160
+# Grey-level change for a thumbnail pixel to count as "moved".
+MOTION_PIXEL_DELTA = 25
+
+
+class FrameGate:
+    """
+    Decides which decoded frames are sent to YOLO.
+
+    `stride` runs inference on every stride-th frame only. With `motion_threshold`
+    set, a frame that passes the stride check is still skipped when the fraction
+    of thumbnail pixels that changed since the last inferred frame is below the
+    threshold (e.g. 0.002 = 0.2% of the image). At most `max_skipped_frames`
+    frames in a row are skipped because of the motion gate, so slow-moving
+    vehicles and tracker state are refreshed regularly.
+
+    The first frame is always inferred.
+    """
+
+    def __init__(self, stride=1, motion_threshold=None, max_skipped_frames=DEFAULT_MOTION_MAX_SKIPPED_FRAMES):
+        if stride < 1:
+            raise ValueError(f"stride must be at least 1, got {stride}")
+        self.stride = stride
+        self.motion_threshold = motion_threshold
+        self.max_skipped_frames = max_skipped_frames
+        self.frames_seen = 0
+        self.frames_skipped = 0
+        self._reference = None
+        self._skipped_in_a_row = 0
+
+    @property
+    def enabled(self):
+        return self.stride > 1 or self.motion_threshold is not None
+
+    def should_infer(self, image):
+        position = self.frames_seen
+        self.frames_seen += 1
+        if position == 0:
+            self._infer(self._thumbnail(image) if self.motion_threshold is not None else None)
+            return True
+        if position % self.stride != 0:
+            self.frames_skipped += 1
+            return False
+        if self.motion_threshold is None:
+            return self._infer(None)
+
+        thumbnail = self._thumbnail(image)
+        if self._skipped_in_a_row >= self.max_skipped_frames or self._motion(thumbnail) >= self.motion_threshold:
+            return self._infer(thumbnail)
+        self.frames_skipped += 1
+        self._skipped_in_a_row += 1
+        return False
+
+    def _infer(self, thumbnail):
+        self._reference = thumbnail
+        self._skipped_in_a_row = 0
+        return True
+
+    def _motion(self, thumbnail):
+        """Fraction of thumbnail pixels that changed since the last inferred frame."""
+        diff = cv2.absdiff(thumbnail, self._reference)
+        return np.count_nonzero(diff > MOTION_PIXEL_DELTA) / diff.size
+
+    @staticmethod
+    def _thumbnail(image):
+        height, width = image.shape[:2]
+        scale = MOTION_THUMBNAIL_WIDTH / float(width)
+        small = cv2.resize(image, (MOTION_THUMBNAIL_WIDTH, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (3, 3), 0)
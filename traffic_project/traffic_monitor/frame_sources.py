@@ -0,0 +1,216 @@
+"""
+Frame sources: what decodes the uploaded videos and camera files.
+
+cv2.VideoCapture decodes H.264 on a single thread, which leaves the decoder
+thread of the pipeline as the bottleneck on long .ts recordings. With
+VIDEO_DECODE_BACKEND = 'pyav', PyAVCapture decodes through PyAV with FFmpeg's
+frame and slice threading (VIDEO_DECODE_THREADS) instead. It has the same
+read/get/set/isOpened/release interface as cv2.VideoCapture, so VideoPipeline,
+chunks and live streams use it unchanged.
+
+PyAVCapture can also decode keyframes only and scale frames while converting
+them to BGR, for thumbnails and quick previews, and returns frames in buffers
+from a FrameBufferPool, which VideoPipeline hands back once a frame is done,
+instead of a new array per frame.
+
+PyAV (`pip install av`) is optional: without it, or when it cannot open a
+file, the video is decoded with OpenCV as before.
+"""
+import threading
+import weakref
+
+import cv2
+import numpy as np
+
+DECODE_BACKEND_OPENCV = 'opencv'
+DECODE_BACKEND_PYAV = 'pyav'
+DECODE_BACKENDS = (DECODE_BACKEND_OPENCV, DECODE_BACKEND_PYAV)
+
+# Defaults used when the settings module does not override them.
+DEFAULT_VIDEO_DECODE_BACKEND = DECODE_BACKEND_OPENCV
+DEFAULT_VIDEO_DECODE_THREADS = 0  # 0: as many as FFmpeg sees fit
+DEFAULT_FRAME_BUFFER_POOL_SIZE = 64
+
+
+class FrameBufferPool:
+    """
+    Reusable frame buffers with explicit ownership: get() hands a buffer to the
+    caller, who owns it until passing it to release(). Only released buffers
+    are handed out again. The pool keeps no reference to a buffer it handed
+    out, so a frame nobody releases (live streams do not) is never reused and
+    is freed like any other array once dropped. VideoPipeline releases every
+    frame once it is tracked and, if submitted, written. Up to `max_buffers`
+    released buffers are kept for reuse.
+    """
+
+    def __init__(self, max_buffers=DEFAULT_FRAME_BUFFER_POOL_SIZE):
+        self.max_buffers = max_buffers
+        self.allocated = 0
+        self._free = []
+        self._in_use = weakref.WeakValueDictionary()  # id(buffer) -> buffer, while the caller still has it
+        self._lock = threading.Lock()  # get() runs on the decoder thread, release() on the others
+
+    def get(self, shape, dtype=np.uint8):
+        dtype = np.dtype(dtype)
+        with self._lock:
+            for index, buffer in enumerate(self._free):
+                if buffer.shape == shape and buffer.dtype == dtype:
+                    del self._free[index]
+                    break
+            else:
+                self.allocated += 1
+                buffer = np.empty(shape, dtype=dtype)
+            self._in_use[id(buffer)] = buffer
+        return buffer
+
+    @property
+    def in_use(self):
+        """Buffers handed out that are neither released nor freed yet."""
+        return len(self._in_use)
+
+    def release(self, buffer):
+        """Returns a buffer from get() to the pool; anything else (views, other arrays) is ignored."""
+        with self._lock:
+            if self._in_use.get(id(buffer)) is not buffer:
+                return
+            del self._in_use[id(buffer)]
+            if len(self._free) < self.max_buffers:
+                self._free.append(buffer)
+
+
+class PyAVCapture:
+    """
+    cv2.VideoCapture over PyAV. `threads` decoder threads (0: FFmpeg's
+    choice); `keyframes_only` skips all other frames, which are then missing
+    from read() while POS_FRAMES keeps the frame's position in the video;
+    `scale` resizes frames in the BGR conversion. Raises ImportError without
+    PyAV and av's errors when `path` cannot be opened.
+    """
+
+    def __init__(self, path, threads=DEFAULT_VIDEO_DECODE_THREADS, keyframes_only=False, scale=None,
+                 buffer_pool=None):
+        import av
+
+        self._container = av.open(str(path))
+        try:
+            self._stream = self._container.streams.video[0]
+        except IndexError:
+            self._container.close()
+            raise ValueError(f"{path} has no video stream")
+        self._stream.thread_type = 'AUTO'
+        self._stream.thread_count = threads
+        self.keyframes_only = keyframes_only
+        if keyframes_only:
+            self._stream.codec_context.skip_frame = 'NONKEY'
+        self._time_base = float(self._stream.time_base)
+        self._start_pts = self._stream.start_time or 0
+        self._fps = float(self._stream.average_rate or self._stream.guessed_rate or 0)
+        self._frame_count = self._stream.frames
+        if not self._frame_count and self._stream.duration and self._fps:
+            self._frame_count = int(round(self._stream.duration * self._time_base * self._fps))
+        width, height = self._stream.codec_context.width, self._stream.codec_context.height
+        if scale and scale != 1.0:
+            # Even sizes, which every pixel format conversion supports
+            width, height = max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+        self.width, self.height = width, height
+        self.buffer_pool = buffer_pool if buffer_pool is not None else FrameBufferPool()
+        self._frames = self._container.decode(self._stream)
+        self._pending = None  # First frame at the target of the last seek
+        self._position = 0
+        self._msec = 0.0
+
+    def isOpened(self):
+        return self._container is not None
+
+    def _frame_seconds(self, frame):
+        return (frame.pts - self._start_pts) * self._time_base if frame.pts is not None else None
+
+    def _to_bgr(self, frame):
+        """The frame as a (height, width, 3) BGR image in a pooled buffer."""
+        frame = frame.reformat(width=self.width, height=self.height, format='bgr24')
+        plane = frame.planes[0]
+        rows = np.frombuffer(plane, dtype=np.uint8).reshape(self.height, plane.line_size)
+        image = self.buffer_pool.get((self.height, self.width, 3))
+        np.copyto(image, rows[:, :self.width * 3].reshape(self.height, self.width, 3))
+        return image
+
+    def read(self):
+        if self._container is None:
+            return False, None
+        frame, self._pending = self._pending, None
+        if frame is None:
+            try:
+                frame = next(self._frames)
+            except StopIteration:
+                return False, None
+            except Exception as e:  # av's decoding errors; OpenCV ends the video there too
+                print(f"PyAV stopped decoding at frame {self._position}: {e}")
+                return False, None
+        seconds = self._frame_seconds(frame)
+        if seconds is not None:
+            self._msec = 1000.0 * seconds
+        if self.keyframes_only and seconds is not None and self._fps:
+            self._position = int(round(seconds * self._fps)) + 1
+        else:
+            self._position += 1
+        return True, self._to_bgr(frame)
+
+    def _seek(self, frame_index):
+        """Seeks to the keyframe before `frame_index` and decodes up to it."""
+        frame_index = max(0, int(frame_index))
+        target_seconds = frame_index / self._fps if self._fps else 0.0
+        self._container.seek(self._start_pts + int(target_seconds / self._time_base), stream=self._stream,
+                             backward=True, any_frame=False)
+        self._frames = self._container.decode(self._stream)
+        self._pending = None
+        for frame in self._frames:
+            seconds = self._frame_seconds(frame)
+            if seconds is None or seconds * self._fps >= frame_index - 0.5:
+                self._pending = frame
+                break
+        self._position = frame_index
+        self._msec = 1000.0 * target_seconds
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self._fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self._frame_count)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self._msec
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES and self._container is not None:
+            return self._seek(value)
+        return False
+
+    def release(self):
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+
+
+def open_video_capture(path, backend=DEFAULT_VIDEO_DECODE_BACKEND, threads=DEFAULT_VIDEO_DECODE_THREADS):
+    """
+    A capture for `path` with the `backend` decoder: PyAVCapture for 'pyav',
+    falling back to cv2.VideoCapture when PyAV is not installed or cannot open
+    the source; cv2.VideoCapture for 'opencv'.
+    """
+    if backend not in DECODE_BACKENDS:
+        raise ValueError(f"Unknown decode backend {backend!r}, expected one of {', '.join(DECODE_BACKENDS)}")
+    if backend == DECODE_BACKEND_PYAV:
+        try:
+            return PyAVCapture(path, threads=threads)
+        except ImportError:
+            print(f"PyAV is not installed (pip install av), decoding {path} with OpenCV.")
+        except Exception as e:
+            print(f"PyAV could not open {path} ({e}), decoding it with OpenCV.")
+    return cv2.VideoCapture(str(path))
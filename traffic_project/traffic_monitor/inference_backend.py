@@ -0,0 +1,232 @@
+"""
+CPU inference backends for the YOLO weights.
+
+`manage.py export_model` exports best.pt once to ONNX (ONNX Runtime) or
+OpenVINO, optionally INT8-quantized, next to the weights:
+
+    best.pt -> best.onnx / best_int8.onnx / best_openvino_model/ / best_int8_openvino_model/
+
+With YOLO_INFERENCE_BACKEND set to 'onnx' or 'openvino', the model registry
+loads that export instead of best.pt whenever it exists and is newer than the
+weights, and falls back to PyTorch otherwise. YOLO_INFERENCE_THREADS caps the
+threads each worker process uses for inference.
+
+onnx/onnxruntime and openvino are optional; ultralytics asks for them when
+exporting or loading such a model.
+"""
+import os
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from .chunking import iou_matrix
+
+BACKEND_PYTORCH = 'pytorch'
+BACKEND_ONNX = 'onnx'
+BACKEND_OPENVINO = 'openvino'
+BACKENDS = (BACKEND_PYTORCH, BACKEND_ONNX, BACKEND_OPENVINO)
+
+# Defaults used when the settings module does not override them.
+DEFAULT_YOLO_INFERENCE_BACKEND = BACKEND_PYTORCH
+DEFAULT_YOLO_INFERENCE_INT8 = False
+DEFAULT_YOLO_INFERENCE_THREADS = None
+DEFAULT_YOLO_EXPORT_IMGSZ = 640
+# Detections of two backends are the same box at this IoU (and the same class).
+DEFAULT_PARITY_IOU = 0.5
+
+
+def exported_model_path(weights_path, backend, int8=False):
+    """Where the `backend` export of `weights_path` is stored (the weights themselves for PyTorch)."""
+    if backend == BACKEND_PYTORCH:
+        return str(weights_path)
+    stem = os.path.splitext(str(weights_path))[0]
+    prefix = '_int8' if int8 else ''
+    if backend == BACKEND_ONNX:
+        return f"{stem}{prefix}.onnx"
+    if backend == BACKEND_OPENVINO:
+        return f"{stem}{prefix}_openvino_model"
+    raise ValueError(f"Unknown inference backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+def _is_up_to_date(artifact_path, weights_path):
+    try:
+        return os.path.getmtime(artifact_path) >= os.path.getmtime(weights_path)
+    except OSError:
+        return False
+
+
+def resolve_model_path(weights_path, backend=DEFAULT_YOLO_INFERENCE_BACKEND, int8=DEFAULT_YOLO_INFERENCE_INT8):
+    """
+    The file to load for `weights_path` with `backend`: its export when that
+    exists and is not older than the weights, the weights otherwise.
+    """
+    artifact_path = exported_model_path(weights_path, backend, int8)
+    if artifact_path == str(weights_path) or _is_up_to_date(artifact_path, weights_path):
+        return artifact_path
+    print(f"No up-to-date {backend} export of {weights_path} (run `manage.py export_model`), using PyTorch.")
+    return str(weights_path)
+
+
+def export_model(model, weights_path, backend, int8=False, imgsz=DEFAULT_YOLO_EXPORT_IMGSZ, calibration_data=None):
+    """
+    Exports the loaded PyTorch `model` (of `weights_path`) for `backend` and
+    returns the path of the artifact. INT8 quantization calibrates on
+    `calibration_data` (an ultralytics dataset YAML). Shapes stay dynamic, so
+    batched inference works with any YOLO_INFERENCE_BATCH_SIZE.
+    """
+    artifact_path = exported_model_path(weights_path, backend, int8)
+    if artifact_path == str(weights_path):
+        raise ValueError("PyTorch weights are used as they are, there is nothing to export.")
+    options = {'format': backend, 'imgsz': imgsz, 'dynamic': True}
+    if int8:
+        options.update(quantize=8, data=calibration_data)
+    # ultralytics names INT8 and FP32 ONNX files alike: an existing FP32 export
+    # is moved aside while the INT8 one is written, then both sit side by side.
+    fp32_path = exported_model_path(weights_path, backend)
+    moved_aside = None
+    if int8 and backend == BACKEND_ONNX and os.path.exists(fp32_path):
+        moved_aside = f"{fp32_path}.fp32"
+        os.replace(fp32_path, moved_aside)
+    try:
+        exported = str(model.export(**options))
+        if os.path.normpath(exported) != os.path.normpath(artifact_path):
+            os.replace(exported, artifact_path)
+    finally:
+        if moved_aside is not None:
+            os.replace(moved_aside, fp32_path)
+    return artifact_path
+
+
+def limit_threads(model, model_path, threads):
+    """
+    Limits `model` (a YOLO) to `threads` inference threads: torch's thread pool
+    right away, an ONNX Runtime session or OpenVINO compiled model once the
+    predictor has created it (ultralytics has no option for either, so they
+    are rebuilt on the first predict).
+    """
+    import torch
+    torch.set_num_threads(threads)
+
+    def on_predict_start(predictor):
+        backend = getattr(predictor.model, 'backend', None)
+        if backend is None or getattr(backend, 'threads_limited', False):
+            return
+        backend.threads_limited = True
+        try:
+            if getattr(backend, 'session', None) is not None:
+                import onnxruntime
+                options = onnxruntime.SessionOptions()
+                options.intra_op_num_threads = threads
+                options.inter_op_num_threads = 1
+                backend.session = onnxruntime.InferenceSession(
+                    str(model_path), options, providers=backend.session.get_providers())
+            elif isinstance(getattr(backend, 'compile_model', None), partial):
+                compile_model = backend.compile_model
+                core = compile_model.func.__self__
+                config = dict(compile_model.keywords.get('config', {}), INFERENCE_NUM_THREADS=threads)
+                backend.compile_model = partial(compile_model.func, device_name=compile_model.keywords['device_name'],
+                                                config=config)
+                backend.ov_compiled_model = backend.compile_model(core.read_model(next(Path(model_path).glob('*.xml'))))
+        except Exception as e:
+            print(f"Could not limit {model_path} to {threads} threads: {e}")
+
+    model.add_callback('on_predict_start', on_predict_start)
+
+
+def detection_arrays(yolo_results_frame):
+    """(boxes (N, 4) xyxy, class ids (N,), confidences (N,)) of one frame's results."""
+    boxes = yolo_results_frame.boxes
+    return (boxes.xyxy.cpu().numpy().astype(np.float64), boxes.cls.cpu().numpy().astype(np.int64),
+            boxes.conf.cpu().numpy().astype(np.float64))
+
+
+def compare_detections(reference, candidate, iou_threshold=DEFAULT_PARITY_IOU):
+    """
+    Accuracy parity of one frame: `candidate` detections (boxes, classes,
+    confidences as from detection_arrays) against the `reference` (PyTorch)
+    ones. Boxes are matched greedily by IoU within the same class. Returns
+    {'reference', 'candidate', 'matched', 'mean_iou', 'max_confidence_difference'}.
+    """
+    ref_boxes, ref_classes, ref_conf = reference
+    cand_boxes, cand_classes, cand_conf = candidate
+    matched_ious, confidence_differences = [], []
+    if len(ref_boxes) and len(cand_boxes):
+        ious = iou_matrix(ref_boxes, cand_boxes)
+        ious[ref_classes[:, None] != cand_classes[None, :]] = 0.0
+        while True:
+            ref_index, cand_index = np.unravel_index(np.argmax(ious), ious.shape)
+            if ious[ref_index, cand_index] <= 0.0 or ious[ref_index, cand_index] < iou_threshold:
+                break
+            matched_ious.append(float(ious[ref_index, cand_index]))
+            confidence_differences.append(abs(float(ref_conf[ref_index] - cand_conf[cand_index])))
+            ious[ref_index, :] = 0.0
+            ious[:, cand_index] = 0.0
+    return {
+        'reference': len(ref_boxes),
+        'candidate': len(cand_boxes),
+        'matched': len(matched_ious),
+        'mean_iou': float(np.mean(matched_ious)) if matched_ious else None,
+        'max_confidence_difference': max(confidence_differences, default=None),
+    }
+
+
+def summarize_parity(frame_comparisons):
+    """
+    Totals of compare_detections() over sample frames: recall (reference boxes
+    the candidate found) and precision (candidate boxes that match one).
+    """
+    reference = sum(c['reference'] for c in frame_comparisons)
+    candidate = sum(c['candidate'] for c in frame_comparisons)
+    matched = sum(c['matched'] for c in frame_comparisons)
+    ious = [c['mean_iou'] for c in frame_comparisons if c['mean_iou'] is not None]
+    differences = [c['max_confidence_difference'] for c in frame_comparisons
+                   if c['max_confidence_difference'] is not None]
+    return {
+        'frames': len(frame_comparisons),
+        'reference_boxes': reference,
+        'candidate_boxes': candidate,
+        'recall': matched / reference if reference else 1.0,
+        'precision': matched / candidate if candidate else 1.0,
+        'mean_iou': float(np.mean(ious)) if ious else None,
+        'max_confidence_difference': max(differences, default=None),
+    }
+
+
+def sample_frames(video_path, count):
+    """Up to `count` frames spread evenly over the video, as BGR images."""
+    import cv2
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frames = []
+        for frame_index in np.linspace(0, max(total_frames - 1, 0), count).astype(int).tolist():
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        return frames
+    finally:
+        cap.release()
+
+
+def check_parity(reference_model, candidate_model, frames, iou_threshold=DEFAULT_PARITY_IOU):
+    """
+    Runs both models frame by frame on `frames` and returns summarize_parity()
+    of the candidate against the reference, plus each model's mean inference
+    time ('reference_ms_per_frame', 'candidate_ms_per_frame'). Each model's
+    first call on the first frame is a warm-up and is not timed.
+    """
+    import time
+    timings = {}
+    detections = {}
+    for name, model in (('reference', reference_model), ('candidate', candidate_model)):
+        model.predict(frames[0], verbose=False)
+        started = time.perf_counter()
+        detections[name] = [detection_arrays(model.predict(frame, verbose=False)[0]) for frame in frames]
+        timings[name] = (time.perf_counter() - started) / len(frames)
+    parity = summarize_parity([compare_detections(reference, candidate, iou_threshold)
+                               for reference, candidate in zip(detections['reference'], detections['candidate'])])
+    parity['reference_ms_per_frame'] = 1000.0 * timings['reference']
+    parity['candidate_ms_per_frame'] = 1000.0 * timings['candidate']
+    return parity
@@ -0,0 +1,157 @@
+"""
+Profiling hooks for the processing hot path.
+
+Instrumentation is a StageTimer that keeps every measurement, not only the
+totals, so a job can report calls and per-call percentiles for each stage
+(decode, infer, track, plot, encode, db); process_video_with_yolo() takes one
+as `instrumentation`. profile_job() additionally runs a whole job under
+cProfile and tracemalloc (PROCESSING_PROFILE_DIR for Celery jobs).
+
+The `benchmark_pipeline` management command puts both into a JSON report;
+compare_reports() flags what got slower than in an earlier report.
+"""
+import cProfile
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+from .video_pipeline import StageTimer
+
+# Defaults used when the settings module does not override them.
+DEFAULT_PROCESSING_PROFILE_DIR = None
+DEFAULT_PROFILE_TOP_FUNCTIONS = 25
+DEFAULT_BENCHMARK_TOLERANCE = 0.10
+# A stage has to get slower by at least this much per frame to count as a
+# regression; below it the difference is timer noise.
+REGRESSION_MIN_MS_PER_FRAME = 0.5
+
+
+class Instrumentation(StageTimer):
+    """StageTimer that also records the duration of every measured call."""
+
+    def __init__(self):
+        super().__init__()
+        self.samples = {stage: [] for stage in self.STAGES}
+
+    def add(self, stage, seconds):
+        super().add(stage, seconds)
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def summary(self, frames):
+        """
+        Per stage: total seconds, number of calls, ms per frame (over `frames`
+        processed frames) and p50/p95/max ms per call (None without calls).
+        """
+        with self._lock:
+            samples = {stage: np.array(values, dtype=np.float64) for stage, values in self.samples.items()}
+        summary = {}
+        for stage, values in samples.items():
+            total = float(values.sum())
+            summary[stage] = {
+                'seconds': round(total, 4),
+                'calls': len(values),
+                'ms_per_frame': round(1000.0 * total / frames, 3) if frames else None,
+                'p50_ms': round(1000.0 * float(np.percentile(values, 50)), 3) if len(values) else None,
+                'p95_ms': round(1000.0 * float(np.percentile(values, 95)), 3) if len(values) else None,
+                'max_ms': round(1000.0 * float(values.max()), 3) if len(values) else None,
+            }
+        return summary
+
+
+def _top_functions(profiler, top):
+    rows = sorted(pstats.Stats(profiler).stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    return [
+        {
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'calls': calls,
+            'own_seconds': round(own_seconds, 4),
+            'cumulative_seconds': round(cumulative_seconds, 4),
+        }
+        for (filename, line, function), (_, calls, own_seconds, cumulative_seconds, _) in rows
+    ]
+
+
+@contextmanager
+def profile_job(name, output_dir, top=DEFAULT_PROFILE_TOP_FUNCTIONS):
+    """
+    Runs the block under cProfile and tracemalloc and writes `<name>.prof`
+    (for pstats / snakeviz) and `<name>-memory.txt` (peak traced memory and
+    the top allocation sites) to `output_dir`.
+
+    Yields a dict that is filled in on exit with the file paths, the peak
+    traced memory and the `top` functions by cumulative time. cProfile only
+    sees the calling thread (tracking, counting, DB writes); the decode and
+    encode threads are covered by the stage timers. With a falsy `output_dir`
+    nothing is profiled and the dict stays empty.
+    """
+    result = {}
+    if not output_dir:
+        yield result
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+        profile_path = os.path.join(output_dir, f'{name}.prof')
+        profiler.dump_stats(profile_path)
+        memory_path = os.path.join(output_dir, f'{name}-memory.txt')
+        with open(memory_path, 'w') as f:
+            f.write(f"Peak traced memory: {peak_bytes} bytes\n")
+            for statistic in snapshot.statistics('lineno')[:top]:
+                f.write(f"{statistic}\n")
+        result.update({
+            'profile_path': profile_path,
+            'memory_path': memory_path,
+            'peak_memory_bytes': peak_bytes,
+            'top_functions': _top_functions(profiler, top),
+        })
+
+
+def compare_reports(baseline, report, tolerance=DEFAULT_BENCHMARK_TOLERANCE):
+    """
+    Compares two benchmark_pipeline reports. Returns {'changes': {metric:
+    {'baseline', 'current', 'change'}}, 'regressions': [metric, ...],
+    'config_differences': [key, ...]}, where `change` is relative to the
+    baseline. A regression is throughput more than `tolerance` below the
+    baseline, or a stage (ms per frame) or peak memory more than `tolerance`
+    above it.
+    """
+    changes, regressions = {}, []
+
+    def compare(metric, old, new, higher_is_better=False, min_difference=0.0):
+        if old is None or new is None:
+            return
+        change = (new - old) / old if old else 0.0
+        changes[metric] = {'baseline': old, 'current': new, 'change': round(change, 4)}
+        worse = -change if higher_is_better else change
+        if worse > tolerance and abs(new - old) >= min_difference:
+            regressions.append(metric)
+
+    old_summary, new_summary = baseline['summary'], report['summary']
+    compare('fps', old_summary.get('fps'), new_summary.get('fps'), higher_is_better=True)
+    old_stages = old_summary.get('stage_ms_per_frame', {})
+    for stage, new_ms in new_summary.get('stage_ms_per_frame', {}).items():
+        compare(f'{stage}_ms_per_frame', old_stages.get(stage), new_ms, min_difference=REGRESSION_MIN_MS_PER_FRAME)
+    compare('peak_memory_bytes', baseline.get('profile', {}).get('peak_memory_bytes'),
+            report.get('profile', {}).get('peak_memory_bytes'))
+
+    old_config, new_config = baseline.get('config', {}), report.get('config', {})
+    config_differences = sorted(key for key in set(old_config) | set(new_config)
+                                if old_config.get(key) != new_config.get(key))
+    return {'changes': changes, 'regressions': regressions, 'config_differences': config_differences}
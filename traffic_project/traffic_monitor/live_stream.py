@@ -0,0 +1,259 @@
+"""
+Live ingestion of camera feeds: RTSP/HTTP stream URLs or video files that are
+still being written.
+
+StreamReader decodes on its own thread and only keeps the newest few frames,
+so a slow model drops frames instead of falling further and further behind.
+LiveAggregator turns the tracked boxes into per-period counts (one minute by
+default) and adds them to StreamAggregate rows every few seconds.
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+
+import cv2
+from django.db import transaction
+from django.db.models import F
+
+from .counting import CountingEngine
+from .models import StreamAggregate
+from .track_store import TrackStore
+from .video_pipeline import DecodedFrame
+
+# Defaults used when the settings module does not override them.
+DEFAULT_LIVE_STREAM_BUFFER_FRAMES = 2
+DEFAULT_LIVE_STREAM_RECONNECT_INITIAL_SECONDS = 1.0
+DEFAULT_LIVE_STREAM_RECONNECT_MAX_SECONDS = 60.0
+DEFAULT_LIVE_STREAM_PERIOD_SECONDS = 60
+DEFAULT_LIVE_STREAM_FLUSH_SECONDS = 10.0
+DEFAULT_LIVE_STREAM_TRACK_IDLE_SECONDS = 30.0
+
+
+class ReplayCapture:
+    """
+    cv2.VideoCapture over a local file that returns frames no faster than the
+    file's frame rate (times `speed`), like a camera would. Used to replay a
+    recording as a stand-in stream.
+    """
+
+    def __init__(self, path, speed=1.0, clock=time.monotonic, sleep=time.sleep):
+        self.cap = cv2.VideoCapture(path)
+        self.frame_seconds = 1.0 / ((self.cap.get(cv2.CAP_PROP_FPS) or 25.0) * speed)
+        self.clock = clock
+        self.sleep = sleep
+        self._started = None
+        self._frames_read = 0
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        if self._started is None:
+            self._started = self.clock()
+        delay = self._started + self._frames_read * self.frame_seconds - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+        self._frames_read += 1
+        return self.cap.read()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+
+class StreamReader(threading.Thread):
+    """
+    Reads a live source on its own thread and keeps only the newest
+    `buffer_frames` frames. When inference falls behind, the oldest buffered
+    frame is dropped, so the consumer is never more than `buffer_frames`
+    frames behind the camera.
+
+    Frames are DecodedFrame objects with a running index (across reconnects)
+    and the wall-clock time they were read at as timestamp.
+
+    When the source cannot be opened or stops delivering frames it is reopened
+    with exponential backoff, starting at `reconnect_initial_seconds` and
+    doubling up to `reconnect_max_seconds`; a successful read resets the delay.
+    A local file is reopened at the frame it stopped at, which follows a file
+    that is still being written. After `max_reconnects` consecutive attempts
+    without a frame (None: never) the reader gives up and `finished` turns True
+    once the buffer is drained.
+    """
+
+    def __init__(self, source, buffer_frames=DEFAULT_LIVE_STREAM_BUFFER_FRAMES,
+                 reconnect_initial_seconds=DEFAULT_LIVE_STREAM_RECONNECT_INITIAL_SECONDS,
+                 reconnect_max_seconds=DEFAULT_LIVE_STREAM_RECONNECT_MAX_SECONDS, max_reconnects=None,
+                 opener=cv2.VideoCapture, clock=time.time, sleep=None):
+        super().__init__(name='stream-reader', daemon=True)
+        if buffer_frames < 1:
+            raise ValueError(f"buffer_frames must be at least 1, got {buffer_frames}")
+        self.source = source
+        self.reconnect_initial_seconds = reconnect_initial_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self.max_reconnects = max_reconnects
+        self.opener = opener
+        self.clock = clock
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self.connected = False
+        self._is_file = os.path.isfile(source)
+        self._buffer = deque(maxlen=buffer_frames)
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._sleep = sleep or self._stop_event.wait
+
+    def stop(self):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    @property
+    def finished(self):
+        return not self.is_alive() and not self._buffer
+
+    def get(self, timeout=None):
+        """Oldest buffered frame, or None if none arrived within `timeout` seconds."""
+        with self._condition:
+            if not self._buffer and not self._stop_event.is_set():
+                self._condition.wait(timeout)
+            return self._buffer.popleft() if self._buffer else None
+
+    def _push(self, decoded_frame):
+        with self._condition:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.frames_dropped += 1
+            self._buffer.append(decoded_frame)
+            self._condition.notify()
+
+    def _open(self, position):
+        try:
+            cap = self.opener(self.source)
+        except Exception as e:
+            print(f"Stream {self.source}: error opening: {e}")
+            return None
+        if not cap.isOpened():
+            cap.release()
+            return None
+        if self._is_file and position:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+        return cap
+
+    def run(self):
+        position = 0  # Frames read from a local file; where to resume after reopening it
+        delay = self.reconnect_initial_seconds
+        reconnects_without_frames = 0
+        try:
+            while not self._stop_event.is_set():
+                cap = self._open(position)
+                read_any = False
+                if cap is not None:
+                    try:
+                        while not self._stop_event.is_set():
+                            ret, frame = cap.read()
+                            if not ret:
+                                break
+                            if not read_any:
+                                read_any = self.connected = True
+                                delay, reconnects_without_frames = self.reconnect_initial_seconds, 0
+                            position += 1
+                            self.frames_read += 1
+                            self._push(DecodedFrame(self.frames_read, self.clock(), frame))
+                    except Exception as e:
+                        print(f"Stream {self.source}: read error: {e}")
+                    finally:
+                        cap.release()
+                self.connected = False
+                if self._stop_event.is_set():
+                    break
+                if self.max_reconnects is not None and reconnects_without_frames >= self.max_reconnects:
+                    print(f"Stream {self.source}: giving up after {self.reconnects} reconnects")
+                    break
+                print(f"Stream {self.source}: no frames, reconnecting in {delay:.1f}s")
+                self._sleep(delay)
+                self.reconnects += 1
+                reconnects_without_frames += 1
+                delay = min(delay * 2, self.reconnect_max_seconds)
+        finally:
+            with self._condition:
+                self._condition.notify_all()
+
+
+def period_start(timestamp, period_seconds):
+    """Start of the `period_seconds` period containing the Unix `timestamp`, as an aware datetime."""
+    return datetime.fromtimestamp(timestamp - timestamp % period_seconds, tz=dt_timezone.utc)
+
+
+class LiveAggregator:
+    """
+    Per-period vehicle counts for one LiveStream.
+
+    Every tracked vehicle is counted once, under its majority-vote class, in
+    the period it was first seen in; with counting regions, line crossings and
+    zone entries/exits are counted in the period they happened in. A vehicle
+    is only counted once its track has not been seen for `track_idle_seconds`,
+    when its class is final, so counts for a period can still grow for that
+    long after it ended. flush() adds what was counted since the last flush to
+    the StreamAggregate rows.
+    """
+
+    def __init__(self, live_stream, class_names_dict, regions=(), period_seconds=DEFAULT_LIVE_STREAM_PERIOD_SECONDS,
+                 track_idle_seconds=DEFAULT_LIVE_STREAM_TRACK_IDLE_SECONDS):
+        self.live_stream = live_stream
+        self.class_names_dict = class_names_dict
+        self.regions = list(regions)
+        self.period_seconds = period_seconds
+        self.track_idle_seconds = track_idle_seconds
+        self.track_store = TrackStore(len(class_names_dict))  # Evicted by time in flush(), not by frame
+        self.counting = None
+        self.counts = {}  # (period_start, vehicle_class, region_id, direction) -> count not yet saved
+        self._events = {}  # track_id -> [(region_id, direction, timestamp)] until the track finishes
+
+    def update(self, decoded_frame, track_ids, class_ids, confidences, xyxy):
+        if self.regions and self.counting is None:
+            height, width = decoded_frame.image.shape[:2]
+            self.counting = CountingEngine(self.regions, (width, height))
+        if self.counting is not None:
+            self.counting.update(decoded_frame.index, decoded_frame.timestamp, track_ids, xyxy)
+            for track_id, region_id, direction, timestamp in self.counting.events:
+                self._events.setdefault(track_id, []).append((region_id, direction, timestamp))
+            self.counting.events = []
+        self.track_store.update(decoded_frame.index, decoded_frame.timestamp, track_ids, class_ids, confidences)
+
+    def _count(self, timestamp, vehicle_class, region_id=None, direction=''):
+        key = (period_start(timestamp, self.period_seconds), vehicle_class, region_id, direction)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def finish_tracks(self, now=None):
+        """Counts the tracks idle since before `now - track_idle_seconds` (all tracks if `now` is None)."""
+        store = self.track_store
+        mask = None if now is None else store.last_seen[:store.size] < now - self.track_idle_seconds
+        for record in store.pop(mask):
+            vehicle_class = self.class_names_dict.get(record['class_id'], "unknown")
+            events = self._events.pop(record['track_id'], [])
+            if vehicle_class == "unknown":
+                continue
+            self._count(record['first_seen'], vehicle_class)
+            for region_id, direction, timestamp in events:
+                self._count(timestamp, vehicle_class, region_id, direction)
+
+    def flush(self, now=None):
+        """Finishes idle tracks (all with now=None) and adds the new counts to the database."""
+        self.finish_tracks(now)
+        counts, self.counts = self.counts, {}
+        with transaction.atomic():
+            for (time_period_start, vehicle_class, region_id, direction), count in sorted(
+                    counts.items(), key=lambda item: (item[0][0], item[0][1], item[0][2] or 0, item[0][3])):
+                row, created = StreamAggregate.objects.get_or_create(
+                    stream=self.live_stream, time_period_start=time_period_start, vehicle_class=vehicle_class,
+                    region_id=region_id, direction=direction, defaults={'count': count})
+                if not created:
+                    StreamAggregate.objects.filter(pk=row.pk).update(count=F('count') + count)
+        return sum(counts.values())
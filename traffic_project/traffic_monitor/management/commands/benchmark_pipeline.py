@@ -0,0 +1,254 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from traffic_monitor.instrumentation import (
+    DEFAULT_BENCHMARK_TOLERANCE,
+    Instrumentation,
+    compare_reports,
+    profile_job,
+)
+from traffic_monitor.models import VideoUpload
+from traffic_monitor.synthetic_video import make_synthetic_video
+from traffic_monitor.video_pipeline import StageTimer
+from traffic_monitor.yolo_processor import YOLO_CLASS_NAMES, process_video_with_yolo
+
+
+def _package_version(name):
+    try:
+        module = __import__(name)
+    except ImportError:
+        return None
+    return getattr(module, '__version__', None)
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    try:
+        import torch
+        cuda = torch.cuda.is_available()
+    except ImportError:
+        cuda = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'cuda_available': cuda,
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'torch': _package_version('torch'),
+        'ultralytics': _package_version('ultralytics'),
+        'git_commit': commit,
+    }
+
+
+def _video_info(path):
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise CommandError(f"Cannot open video {path}")
+        return {
+            'frames': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': cap.get(cv2.CAP_PROP_FPS),
+        }
+    finally:
+        cap.release()
+
+
+@contextmanager
+def _scratch_environment(scratch_dir):
+    """
+    Runs the block against a freshly migrated SQLite database and a private
+    chart cache in `scratch_dir`, so benchmark videos never show up on the
+    dashboard and cached chart data of the real site is left alone. Nothing has
+    to be cleaned up when the process is killed, and the connection the caller
+    had (e.g. a test's transaction) is back in place afterwards.
+    """
+    previous_connection = connections[DEFAULT_DB_ALIAS]
+    previous_settings = connections.settings[DEFAULT_DB_ALIAS]
+    connections.settings[DEFAULT_DB_ALIAS] = connections.configure_settings({DEFAULT_DB_ALIAS: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(scratch_dir, 'benchmark.sqlite3'),
+    }})[DEFAULT_DB_ALIAS]
+    # Threads without a connection of their own open one from these settings too.
+    connections[DEFAULT_DB_ALIAS] = connections.create_connection(DEFAULT_DB_ALIAS)
+    caches = dict(settings.CACHES, benchmark={'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                              'LOCATION': 'benchmark-pipeline'})
+    try:
+        with override_settings(MEDIA_ROOT=os.path.join(scratch_dir, 'media'), CACHES=caches,
+                               CHART_DATA_CACHE_ALIAS='benchmark'):
+            call_command('migrate', verbosity=0, interactive=False)
+            yield
+    finally:
+        connections[DEFAULT_DB_ALIAS].close()
+        connections.settings[DEFAULT_DB_ALIAS] = previous_settings
+        connections[DEFAULT_DB_ALIAS] = previous_connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the YOLO processing pipeline on a synthetic or sample video and writes a JSON report with "
+        "throughput and per-stage timings. With --baseline, flags regressions against an earlier report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', default=None,
+                            help="Video to process (default: a synthetic clip of --frames frames).")
+        parser.add_argument('--frames', type=int, default=250, help="Length of the synthetic clip.")
+        parser.add_argument('--model', default=os.path.join(settings.BASE_DIR, 'best.pt'),
+                            help="YOLO weights (default: best.pt in the project root).")
+        parser.add_argument('--runs', type=int, default=3, help="Measured runs; the report holds their median.")
+        parser.add_argument('--warmup-runs', type=int, default=1,
+                            help="Unmeasured runs first (model load, first-call overhead).")
+        parser.add_argument('--batch-size', type=int, default=1)
+        parser.add_argument('--frame-stride', type=int, default=1)
+        parser.add_argument('--motion-threshold', type=float, default=None)
+        parser.add_argument('--render-mode', choices=[choice for choice, _ in VideoUpload.RENDER_MODE_CHOICES],
+                            default=VideoUpload.RENDER_ANNOTATED)
+        parser.add_argument('--profile', action='store_true',
+                            help="One more run under cProfile and tracemalloc; the .prof and memory report "
+                                 "are written next to the output.")
+        parser.add_argument('--output', default='benchmark_report.json', help="Where to write the JSON report.")
+        parser.add_argument('--baseline', default=None, help="Earlier report to compare against.")
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_BENCHMARK_TOLERANCE,
+                            help="Relative slowdown that counts as a regression (default: 0.10).")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit with an error when the comparison finds a regression.")
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError("--runs must be at least 1.")
+        if not os.path.exists(options['model']):
+            raise CommandError(f"Model {options['model']} not found.")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        scratch_dir = tempfile.mkdtemp(prefix='traffic_benchmark_')
+        try:
+            video_path = options['video']
+            if video_path is None:
+                video_path = make_synthetic_video(os.path.join(scratch_dir, 'synthetic.mp4'), frames=options['frames'])
+            with _scratch_environment(scratch_dir):
+                report = self._benchmark(video_path, options)
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        if options['video'] is None:
+            report['video']['path'] = None
+
+        if baseline is not None:
+            report['comparison'] = dict(baseline=options['baseline'], tolerance=options['tolerance'],
+                                        **compare_reports(baseline, report, options['tolerance']))
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self._print_summary(report)
+        self.stdout.write(f"Report written to {options['output']}")
+        if baseline is not None and report['comparison']['regressions'] and options['fail_on_regression']:
+            raise CommandError(f"Regressions: {', '.join(report['comparison']['regressions'])}")
+
+    def _run(self, video_path, options, instrumentation=None):
+        """Processes the video once in the scratch environment; returns (wall seconds, frames)."""
+        videos_dir = os.path.join(settings.MEDIA_ROOT, 'videos')
+        os.makedirs(videos_dir, exist_ok=True)
+        shutil.copy(video_path, os.path.join(videos_dir, os.path.basename(video_path)))
+        video = VideoUpload.objects.create(video_file=f'videos/{os.path.basename(video_path)}',
+                                           render_mode=options['render_mode'])
+        try:
+            started = time.perf_counter()
+            process_video_with_yolo(video.id, options['model'], YOLO_CLASS_NAMES,
+                                    batch_size=options['batch_size'], frame_stride=options['frame_stride'],
+                                    motion_threshold=options['motion_threshold'], instrumentation=instrumentation)
+            wall_seconds = time.perf_counter() - started
+            video.refresh_from_db()
+            if video.status != 'completed':
+                raise CommandError(f"Processing failed (status {video.status!r}), see the log above.")
+            return wall_seconds, video.frame_count
+        finally:
+            video.delete()  # Keeps the runs' databases the same size
+
+    def _benchmark(self, video_path, options):
+        for _ in range(options['warmup_runs']):
+            self._run(video_path, options)
+
+        runs = []
+        for _ in range(options['runs']):
+            instrumentation = Instrumentation()
+            wall_seconds, frames = self._run(video_path, options, instrumentation)
+            runs.append({
+                'wall_seconds': round(wall_seconds, 4),
+                'frames': frames,
+                'fps': round(frames / wall_seconds, 2) if wall_seconds else None,
+                'stages': instrumentation.summary(frames),
+            })
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'environment': _environment(),
+            'config': {
+                'model': os.path.basename(options['model']),
+                'video': os.path.basename(options['video']) if options['video'] else f"synthetic-{options['frames']}",
+                'batch_size': options['batch_size'],
+                'frame_stride': options['frame_stride'],
+                'motion_threshold': options['motion_threshold'],
+                'render_mode': options['render_mode'],
+                'runs': options['runs'],
+            },
+            'video': dict(path=video_path, **_video_info(video_path)),
+            'runs': runs,
+            'summary': {
+                'fps': statistics.median(run['fps'] for run in runs),
+                'wall_seconds': statistics.median(run['wall_seconds'] for run in runs),
+                'stage_ms_per_frame': {
+                    stage: statistics.median(run['stages'][stage]['ms_per_frame'] or 0.0 for run in runs)
+                    for stage in StageTimer.STAGES
+                },
+            },
+        }
+
+        if options['profile']:
+            output_dir = os.path.dirname(os.path.abspath(options['output']))
+            name = os.path.splitext(os.path.basename(options['output']))[0]
+            with profile_job(name, output_dir) as profile:
+                self._run(video_path, options)
+            report['profile'] = profile
+        return report
+
+    def _print_summary(self, report):
+        summary = report['summary']
+        self.stdout.write(f"{report['video']['frames']} frames, median {summary['fps']:.1f} fps "
+                          f"over {len(report['runs'])} runs")
+        for stage, ms in summary['stage_ms_per_frame'].items():
+            self.stdout.write(f"  {stage:<7} {ms:8.2f} ms/frame")
+        comparison = report.get('comparison')
+        if comparison is None:
+            return
+        for metric, change in comparison['changes'].items():
+            flag = '  REGRESSION' if metric in comparison['regressions'] else ''
+            self.stdout.write(f"  {metric:<22} {change['baseline']} -> {change['current']} "
+                              f"({100 * change['change']:+.1f}%){flag}")
+        if comparison['config_differences']:
+            self.stdout.write(f"  Configuration differs from the baseline: {', '.join(comparison['config_differences'])}")
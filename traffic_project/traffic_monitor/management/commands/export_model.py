@@ -0,0 +1,66 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from traffic_monitor.inference_backend import (
+    BACKEND_ONNX,
+    BACKEND_OPENVINO,
+    DEFAULT_YOLO_EXPORT_IMGSZ,
+    check_parity,
+    export_model,
+    sample_frames,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the YOLO weights to ONNX or OpenVINO (optionally INT8) next to them, for "
+        "YOLO_INFERENCE_BACKEND. With --video, checks the export's detections and speed against PyTorch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=os.path.join(settings.BASE_DIR, 'best.pt'),
+                            help="YOLO weights (default: best.pt in the project root).")
+        configured_backend = getattr(settings, 'YOLO_INFERENCE_BACKEND', None)
+        parser.add_argument('--backend', choices=[BACKEND_ONNX, BACKEND_OPENVINO],
+                            default=configured_backend if configured_backend == BACKEND_OPENVINO else BACKEND_ONNX,
+                            help="Export format (default: YOLO_INFERENCE_BACKEND, or onnx).")
+        parser.add_argument('--int8', action='store_true', help="INT8-quantize the export (needs --data).")
+        parser.add_argument('--data', default=None, help="Dataset YAML with calibration images for --int8.")
+        parser.add_argument('--imgsz', type=int, default=DEFAULT_YOLO_EXPORT_IMGSZ)
+        parser.add_argument('--video', default=None, help="Sample video for the accuracy/speed check.")
+        parser.add_argument('--frames', type=int, default=50, help="Frames sampled from --video.")
+        parser.add_argument('--min-recall', type=float, default=0.95,
+                            help="Fail when the export finds fewer of the PyTorch detections than this.")
+
+    def handle(self, *args, **options):
+        from ultralytics import YOLO
+
+        weights_path = options['model']
+        if not os.path.exists(weights_path):
+            raise CommandError(f"Model {weights_path} not found.")
+        if options['int8'] and not options['data']:
+            raise CommandError("--int8 needs calibration images: pass a dataset YAML with --data.")
+
+        artifact_path = export_model(YOLO(weights_path), weights_path, options['backend'], int8=options['int8'],
+                                     imgsz=options['imgsz'], calibration_data=options['data'])
+        self.stdout.write(f"Exported {weights_path} to {artifact_path}")
+        if not options['video']:
+            return
+
+        frames = sample_frames(options['video'], options['frames'])
+        if not frames:
+            raise CommandError(f"No frames could be read from {options['video']}")
+        parity = check_parity(YOLO(weights_path), YOLO(artifact_path, task='detect'), frames)
+        self.stdout.write(
+            f"{parity['frames']} frames: recall {parity['recall']:.3f}, precision {parity['precision']:.3f} "
+            f"({parity['candidate_boxes']} boxes vs {parity['reference_boxes']} with PyTorch), "
+            f"max confidence difference {parity['max_confidence_difference'] or 0.0:.3f}"
+        )
+        self.stdout.write(f"PyTorch {parity['reference_ms_per_frame']:.1f} ms/frame, "
+                          f"{options['backend']}{' INT8' if options['int8'] else ''} "
+                          f"{parity['candidate_ms_per_frame']:.1f} ms/frame")
+        if parity['recall'] < options['min_recall']:
+            raise CommandError(f"Recall {parity['recall']:.3f} is below --min-recall {options['min_recall']}; "
+                               f"remove {artifact_path} or export again before using it.")
@@ -0,0 +1,51 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from traffic_monitor.live_stream import ReplayCapture
+from traffic_monitor.models import LiveStream
+from traffic_monitor.yolo_processor import YOLO_CLASS_NAMES, process_live_stream
+
+
+class Command(BaseCommand):
+    help = (
+        "Continuously ingests a LiveStream (RTSP/HTTP URL or growing video file) with the YOLO tracker "
+        "and writes per-period counts to StreamAggregate. Runs until interrupted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('stream', help="LiveStream name or id.")
+        parser.add_argument('--model', default=os.path.join(settings.BASE_DIR, 'best.pt'),
+                            help="YOLO weights (default: best.pt in the project root).")
+        parser.add_argument('--max-reconnects', type=int, default=None,
+                            help="Stop after this many reconnects without a frame (default: retry forever).")
+        parser.add_argument('--max-seconds', type=float, default=None, help="Stop after this many seconds.")
+        parser.add_argument('--replay-speed', type=float, default=None,
+                            help="Treat the source as a local recording and replay it at this multiple of its "
+                                 "frame rate, as a stand-in for a camera.")
+
+    def handle(self, *args, **options):
+        stream_ref = options['stream']
+        lookup = {'id': int(stream_ref)} if stream_ref.isdigit() else {'name': stream_ref}
+        try:
+            live_stream = LiveStream.objects.get(**lookup)
+        except LiveStream.DoesNotExist:
+            raise CommandError(f"LiveStream {stream_ref!r} does not exist.")
+
+        opener = None
+        if options['replay_speed']:
+            speed = options['replay_speed']
+            opener = lambda source: ReplayCapture(source, speed=speed)
+
+        self.stdout.write(f"Ingesting {live_stream.name} from {live_stream.source} (Ctrl+C to stop)")
+        try:
+            process_live_stream(live_stream.id, options['model'], YOLO_CLASS_NAMES, opener=opener,
+                                max_reconnects=options['max_reconnects'], max_seconds=options['max_seconds'])
+        except KeyboardInterrupt:
+            pass
+        live_stream.refresh_from_db()
+        self.stdout.write(
+            f"{live_stream.name}: {live_stream.status}, {live_stream.frames_processed} frames processed, "
+            f"{live_stream.frames_dropped} dropped, {live_stream.reconnect_count} reconnects"
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0002_videoupload_processed_video_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoupload',
+            name='unique_car_count',
+            field=models.IntegerField(default=0, help_text='DEPRECATED: Total number of unique cars tracked in the video. This is replaced by class-specific unique counts in AggregatedData.'),
+        ),
+        migrations.AlterField(
+            model_name='aggregateddata',
+            name='count',
+            field=models.IntegerField(help_text='Stores the total count of unique objects of vehicle_class for the entire video.'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0003_videoupload_unique_car_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoupload',
+            name='frame_count',
+            field=models.IntegerField(default=0, help_text='Number of frames decoded while processing the video.'),
+        ),
+        migrations.AddField(
+            model_name='videoupload',
+            name='skipped_frame_count',
+            field=models.IntegerField(default=0, help_text="Frames that skipped YOLO inference (frame stride or motion gate) and reused the previous frame's tracks."),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:24
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0004_videoupload_frame_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoupload',
+            name='output_fps',
+            field=models.PositiveIntegerField(blank=True, help_text='Frame rate of the annotated video. Leave empty to keep the source frame rate.', null=True),
+        ),
+        migrations.AddField(
+            model_name='videoupload',
+            name='output_scale',
+            field=models.FloatField(default=1.0, help_text='Size of the annotated video relative to the source, e.g. 0.5 for half resolution.', validators=[django.core.validators.MinValueValidator(0.1), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.AddField(
+            model_name='videoupload',
+            name='render_mode',
+            field=models.CharField(choices=[('annotated', 'Annotated video'), ('counts_only', 'Counts only (no video output)')], default='annotated', max_length=20),
+        ),
+    ]
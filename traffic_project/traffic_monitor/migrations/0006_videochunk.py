@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0005_videoupload_render_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('process_start_frame', models.IntegerField(help_text='First frame decoded, including the warm-up overlap (0-based).')),
+                ('start_frame', models.IntegerField(help_text='First frame this chunk reports results for (0-based).')),
+                ('end_frame', models.IntegerField(help_text='Frame after the last frame of this chunk (exclusive).')),
+                ('overlap_frames', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('frames_processed', models.IntegerField(default=0)),
+                ('skipped_frame_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='traffic_monitor.videoupload')),
+            ],
+            options={
+                'ordering': ['video', 'index'],
+                'unique_together': {('video', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:31
+
+import django.db.models.deletion
+import math
+
+from django.db import migrations, models
+
+
+def backfill_buckets(apps, schema_editor):
+    # Videos processed before the bucket table existed get their buckets from
+    # their DetectionResult rows, so the timeline charts keep working for them.
+    VideoUpload = apps.get_model('traffic_monitor', 'VideoUpload')
+    DetectionResult = apps.get_model('traffic_monitor', 'DetectionResult')
+    DetectionBucket = apps.get_model('traffic_monitor', 'DetectionBucket')
+    for video_id in VideoUpload.objects.values_list('id', flat=True):
+        counts = {}
+        rows = DetectionResult.objects.filter(video_id=video_id).values_list('timestamp_in_video', 'vehicle_class', 'count')
+        for timestamp, vehicle_class, count in rows.iterator():
+            for resolution in (1, 10, 60):
+                key = (resolution, int(math.floor(timestamp / resolution)), vehicle_class)
+                counts[key] = counts.get(key, 0) + count
+        DetectionBucket.objects.bulk_create([
+            DetectionBucket(video_id=video_id, resolution_seconds=resolution, bucket_index=bucket_index,
+                            vehicle_class=vehicle_class, count=count)
+            for (resolution, bucket_index, vehicle_class), count in counts.items()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0006_videochunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution_seconds', models.PositiveIntegerField()),
+                ('bucket_index', models.IntegerField(help_text='Bucket number; the bucket starts at bucket_index * resolution_seconds.')),
+                ('vehicle_class', models.CharField(max_length=50)),
+                ('count', models.IntegerField()),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='traffic_monitor.videoupload')),
+            ],
+            options={
+                'ordering': ['video', 'resolution_seconds', 'bucket_index'],
+                'unique_together': {('video', 'resolution_seconds', 'bucket_index', 'vehicle_class')},
+            },
+        ),
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0007_detectionbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('track_id', models.IntegerField()),
+                ('vehicle_class', models.CharField(max_length=50)),
+                ('first_frame', models.IntegerField()),
+                ('last_frame', models.IntegerField()),
+                ('first_seen', models.FloatField(help_text='Timestamp in the video, in seconds, of the first frame with this track.')),
+                ('last_seen', models.FloatField()),
+                ('frames_seen', models.IntegerField()),
+                ('max_confidence', models.FloatField()),
+                ('class_votes', models.JSONField(default=dict, help_text='Frames per predicted vehicle class.')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tracks', to='traffic_monitor.videoupload')),
+            ],
+            options={
+                'ordering': ['video', 'track_id'],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0008_tracksummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Camera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('count_period_seconds', models.PositiveIntegerField(default=900, help_text='Length of the counting periods AggregatedData is split into.')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='aggregateddata',
+            name='direction',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='videoupload',
+            name='recorded_at',
+            field=models.DateTimeField(blank=True, help_text='When the recording started. Counting periods are placed relative to it (upload time if empty).', null=True),
+        ),
+        migrations.AlterField(
+            model_name='aggregateddata',
+            name='count',
+            field=models.IntegerField(help_text='Without a region: unique objects of vehicle_class in the entire video. With a region: vehicles that crossed it in `direction` during the counting period starting at time_period_start.'),
+        ),
+        migrations.AddField(
+            model_name='videoupload',
+            name='camera',
+            field=models.ForeignKey(blank=True, help_text='Camera whose counting lines and zones are applied to this video.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='videos', to='traffic_monitor.camera'),
+        ),
+        migrations.CreateModel(
+            name='CountingRegion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('line', 'Counting line'), ('zone', 'Counting zone')], default='line', max_length=10)),
+                ('points', models.JSONField(help_text='[[x, y], ...] relative to the frame size, e.g. [[0.1, 0.6], [0.9, 0.6]].')),
+                ('is_active', models.BooleanField(default=True)),
+                ('camera', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regions', to='traffic_monitor.camera')),
+            ],
+            options={
+                'unique_together': {('camera', 'name')},
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='aggregateddata',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='aggregateddata',
+            name='region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='traffic_monitor.countingregion'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='aggregateddata',
+            unique_together={('video', 'time_period_start', 'vehicle_class', 'region', 'direction')},
+        ),
+    ]
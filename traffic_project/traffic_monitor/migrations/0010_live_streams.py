@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0009_counting_regions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveStream',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('source', models.CharField(help_text='Stream URL (e.g. rtsp://...) or path of a video file.', max_length=500)),
+                ('status', models.CharField(choices=[('idle', 'Idle'), ('running', 'Running'), ('reconnecting', 'Reconnecting'), ('stopped', 'Stopped'), ('failed', 'Failed')], default='idle', max_length=20)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_frame_at', models.DateTimeField(blank=True, null=True)),
+                ('frames_processed', models.BigIntegerField(default=0)),
+                ('frames_dropped', models.BigIntegerField(default=0, help_text='Frames dropped because inference fell behind the stream.')),
+                ('reconnect_count', models.IntegerField(default=0)),
+                ('latency_seconds', models.FloatField(blank=True, help_text='Highest delay between reading a frame and finishing its inference since the last flush.', null=True)),
+                ('camera', models.ForeignKey(blank=True, help_text='Camera whose counting lines and zones are applied to the stream.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='streams', to='traffic_monitor.camera')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StreamAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_period_start', models.DateTimeField()),
+                ('vehicle_class', models.CharField(max_length=50)),
+                ('direction', models.CharField(blank=True, default='', max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='traffic_monitor.countingregion')),
+                ('stream', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='traffic_monitor.livestream')),
+            ],
+            options={
+                'ordering': ['stream', 'time_period_start', 'vehicle_class'],
+                'unique_together': {('stream', 'time_period_start', 'vehicle_class', 'region', 'direction')},
+            },
+        ),
+    ]
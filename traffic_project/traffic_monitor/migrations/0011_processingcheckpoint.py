@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0010_live_streams'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frame_number', models.IntegerField(help_text='Last frame (1-based) whose results are committed.')),
+                ('timestamp_in_video', models.FloatField(help_text='Timestamp of that frame, in seconds.')),
+                ('state', models.JSONField(default=dict, help_text='Open tracks, overlap boxes, time buckets, counting events and annotated segments.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoint', to='traffic_monitor.videoupload')),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0011_processingcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_frames', models.IntegerField(default=0)),
+                ('frames_done', models.IntegerField(default=0)),
+                ('current_fps', models.FloatField(default=0.0, help_text='Frames per second of the worker that reported last, over its last update interval.')),
+                ('decode_seconds', models.FloatField(default=0.0)),
+                ('infer_seconds', models.FloatField(default=0.0)),
+                ('plot_seconds', models.FloatField(default=0.0)),
+                ('encode_seconds', models.FloatField(default=0.0)),
+                ('db_seconds', models.FloatField(default=0.0)),
+                ('started_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='traffic_monitor.videoupload')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0012_processingprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingprogress',
+            name='track_seconds',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
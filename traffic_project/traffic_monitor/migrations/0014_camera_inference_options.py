@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0013_processingprogress_track_seconds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='inference_imgsz',
+            field=models.PositiveIntegerField(blank=True, help_text="Size YOLO resizes frames to (long side, e.g. 1280 for small, distant vehicles). Leave empty for the model's default of 640.", null=True, validators=[django.core.validators.MinValueValidator(32)]),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='roi_points',
+            field=models.JSONField(blank=True, default=list, help_text='Polygon [[x, y], ...] around the roadway, relative to the frame size. Only its bounding box is passed to YOLO and pixels outside it are blanked; boxes are mapped back to the full frame. Leave empty to use the whole frame.'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0014_camera_inference_options'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detectionresult',
+            name='video',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='traffic_monitor.videoupload'),
+        ),
+        migrations.AddIndex(
+            model_name='detectionresult',
+            index=models.Index(fields=['video', 'timestamp_in_video'], name='detection_video_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detectionresult',
+            index=models.Index(fields=['video', 'vehicle_class'], name='detection_video_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videoupload',
+            index=models.Index(fields=['status', '-processed_at'], name='video_status_processed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videoupload',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'processing'])), fields=['-uploaded_at'], name='video_active_uploaded_idx'),
+        ),
+    ]
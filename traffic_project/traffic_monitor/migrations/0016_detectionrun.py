@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0015_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vehicle_class', models.CharField(max_length=50)),
+                ('count', models.IntegerField()),
+                ('start_time', models.FloatField(help_text="Timestamp in the video, in seconds, of the run's first frame.")),
+                ('end_time', models.FloatField(help_text="Timestamp of the run's last frame.")),
+                ('frame_count', models.IntegerField()),
+                ('video', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='detection_runs', to='traffic_monitor.videoupload')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['video', 'start_time'], name='detection_run_video_start_idx')],
+            },
+        ),
+    ]
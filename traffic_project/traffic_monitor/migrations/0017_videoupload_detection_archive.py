@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_monitor', '0016_detectionrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoupload',
+            name='detection_archive',
+            field=models.FileField(blank=True, help_text='Columnar archive of the raw per-frame detections (DETECTION_ARCHIVE_FORMAT).', null=True, upload_to='detections/'),
+        ),
+    ]
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from ultralytics import YOLO
+
+from .inference_backend import (
+    DEFAULT_YOLO_INFERENCE_BACKEND,
+    DEFAULT_YOLO_INFERENCE_INT8,
+    DEFAULT_YOLO_INFERENCE_THREADS,
+    limit_threads,
+    resolve_model_path,
+)
+
+# Defaults used when the settings module does not override them.
+DEFAULT_MODEL_CACHE_SIZE = 2
+# Blank frame run through a freshly loaded model so CUDA/cuDNN initialisation
+# and the predictor setup happen before the first video.
+WARMUP_FRAME_SIZE = 640
+
+
+def reset_tracking(model):
+    """
+    Clears the tracker state model.track(persist=True) keeps on the predictor,
+    so a cached model starts every video with fresh track IDs.
+    """
+    predictor = getattr(model, 'predictor', None)
+    for tracker in getattr(predictor, 'trackers', None) or []:
+        tracker.reset()
+
+
+def warm_up(model):
+    model.predict(np.zeros((WARMUP_FRAME_SIZE, WARMUP_FRAME_SIZE, 3), dtype=np.uint8), verbose=False)
+
+
+class ModelRegistry:
+    """
+    Process-level cache of loaded YOLO models.
+
+    Models are keyed by absolute path and file modification time, so replacing
+    best.pt on disk loads the new weights on the next get(). Up to `max_models`
+    models (e.g. several model versions) stay loaded; the least recently used
+    one is evicted first.
+
+    Load times are remembered per model, so every cache hit can report the
+    cold-start cost it saved.
+
+    `resolve(model_path)` picks the file actually loaded, e.g. an ONNX export
+    of the weights (see inference_backend.py); a new export is picked up on
+    the next get(). `threads` limits each loaded model's inference threads.
+    """
+
+    def __init__(self, max_models=DEFAULT_MODEL_CACHE_SIZE, loader=None, resolve=None, threads=None):
+        if max_models < 1:
+            raise ValueError(f"max_models must be at least 1, got {max_models}")
+        self.max_models = max_models
+        self.loader = loader
+        self.resolve = resolve
+        self.threads = threads
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._models = OrderedDict()  # (path, mtime) -> (model, load_seconds)
+        self._lock = threading.Lock()
+
+    def _key(self, model_path):
+        if self.resolve is not None:
+            model_path = self.resolve(model_path)
+        model_path = os.path.abspath(str(model_path))
+        try:
+            return model_path, os.path.getmtime(model_path)
+        except OSError:
+            return model_path, None
+
+    def get(self, model_path, warmup=False):
+        """
+        Returns (model, stats) with tracker state reset. `stats` holds `cache_hit`,
+        `load_seconds` (time spent loading now), `saved_seconds` (cold-start
+        time a hit avoided) and `loaded_path` (the file the model came from).
+        """
+        key = self._key(model_path)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                model, load_seconds = self._models[key]
+                self.hits += 1
+                self.saved_seconds += load_seconds
+                reset_tracking(model)
+                return model, {'cache_hit': True, 'load_seconds': 0.0, 'saved_seconds': load_seconds,
+                               'loaded_path': key[0]}
+
+            started = time.perf_counter()
+            model = (self.loader or YOLO)(key[0] if self.resolve is not None else str(model_path))
+            if self.threads:
+                limit_threads(model, key[0], self.threads)
+            if warmup:
+                warm_up(model)
+            load_seconds = time.perf_counter() - started
+            self.misses += 1
+
+            # Older weights of the same file are stale once it has changed on disk.
+            for stale_key in [k for k in self._models if k[0] == key[0]]:
+                del self._models[stale_key]
+            self._models[key] = (model, load_seconds)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+            return model, {'cache_hit': False, 'load_seconds': load_seconds, 'saved_seconds': 0.0,
+                           'loaded_path': key[0]}
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def __len__(self):
+        return len(self._models)
+
+    def __contains__(self, model_path):
+        return self._key(model_path) in self._models
+
+
+_registry = None
+
+
+def get_registry():
+    """
+    The registry of the current process, sized by settings.YOLO_MODEL_CACHE_SIZE
+    and loading the YOLO_INFERENCE_BACKEND export of the weights when there is one.
+    """
+    global _registry
+    if _registry is None:
+        from django.conf import settings
+        backend = getattr(settings, 'YOLO_INFERENCE_BACKEND', DEFAULT_YOLO_INFERENCE_BACKEND)
+        int8 = getattr(settings, 'YOLO_INFERENCE_INT8', DEFAULT_YOLO_INFERENCE_INT8)
+        _registry = ModelRegistry(
+            getattr(settings, 'YOLO_MODEL_CACHE_SIZE', DEFAULT_MODEL_CACHE_SIZE),
+            resolve=lambda model_path: resolve_model_path(model_path, backend, int8),
+            threads=getattr(settings, 'YOLO_INFERENCE_THREADS', DEFAULT_YOLO_INFERENCE_THREADS),
+        )
+    return _registry
+
+
+def get_model(model_path, warmup=False):
+    return get_registry().get(model_path, warmup=warmup)
+
+
+def clear_model_cache():
+    global _registry
+    _registry = None
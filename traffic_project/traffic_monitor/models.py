@@ -1,3 +1,5 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 class VideoUpload(models.Model):
@@ -7,33 +9,317 @@ class VideoUpload(models.Model):
         ('completed', 'Completed'),
         ('failed', 'Failed'),
     ]
+    RENDER_ANNOTATED = 'annotated'
+    RENDER_COUNTS_ONLY = 'counts_only'
+    RENDER_MODE_CHOICES = [
+        (RENDER_ANNOTATED, 'Annotated video'),
+        (RENDER_COUNTS_ONLY, 'Counts only (no video output)'),
+    ]
     video_file = models.FileField(upload_to='videos/')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
     processed_video_file = models.FileField(upload_to='processed_videos/', null=True, blank=True)
     unique_car_count = models.IntegerField(default=0, help_text="DEPRECATED: Total number of unique cars tracked in the video. This is replaced by class-specific unique counts in AggregatedData.")
+    frame_count = models.IntegerField(default=0, help_text="Number of frames decoded while processing the video.")
+    render_mode = models.CharField(max_length=20, choices=RENDER_MODE_CHOICES, default=RENDER_ANNOTATED)
+    output_scale = models.FloatField(default=1.0, validators=[MinValueValidator(0.1), MaxValueValidator(1.0)], help_text="Size of the annotated video relative to the source, e.g. 0.5 for half resolution.")
+    output_fps = models.PositiveIntegerField(null=True, blank=True, help_text="Frame rate of the annotated video. Leave empty to keep the source frame rate.")
+    skipped_frame_count = models.IntegerField(default=0, help_text="Frames that skipped YOLO inference (frame stride or motion gate) and reused the previous frame's tracks.")
+    camera = models.ForeignKey('Camera', on_delete=models.SET_NULL, null=True, blank=True, related_name='videos', help_text="Camera whose counting lines and zones are applied to this video.")
+    recorded_at = models.DateTimeField(null=True, blank=True, help_text="When the recording started. Counting periods are placed relative to it (upload time if empty).")
+    detection_archive = models.FileField(upload_to='detections/', null=True, blank=True, help_text="Columnar archive of the raw per-frame detections (DETECTION_ARCHIVE_FORMAT).")
+
+    class Meta:
+        indexes = [
+            # Latest completed video (dashboard, chart API)
+            models.Index(fields=['status', '-processed_at'], name='video_status_processed_idx'),
+            # Jobs still running (dashboard); only the few unfinished videos are in it.
+            # SQLite ignores partial indexes for bound parameters and uses the one above.
+            models.Index(fields=['-uploaded_at'], name='video_active_uploaded_idx',
+                         condition=models.Q(status__in=['pending', 'processing'])),
+        ]
 
     def __str__(self):
         return self.video_file.name
 
 class DetectionResult(models.Model):
-    video = models.ForeignKey(VideoUpload, on_delete=models.CASCADE)
+    # The (video, timestamp_in_video) index below serves lookups by video, so
+    # the foreign key gets no index of its own to maintain on every insert.
+    video = models.ForeignKey(VideoUpload, on_delete=models.CASCADE, db_index=False)
     timestamp_in_video = models.FloatField()
     vehicle_class = models.CharField(max_length=50)
     count = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['video', 'timestamp_in_video'], name='detection_video_time_idx'),
+            models.Index(fields=['video', 'vehicle_class'], name='detection_video_class_idx'),
+        ]
+
     def __str__(self):
         return f"Detections for {self.video.video_file.name} at {self.timestamp_in_video}s: {self.count} {self.vehicle_class}(s)"
 
+class DetectionRun(models.Model):
+    """
+    Run-length encoded DetectionResult rows (DETECTION_STORAGE = 'runs'): a
+    vehicle class seen `count` times on each of `frame_count` consecutive
+    frames, from the frame at start_time to the one at end_time. A run ends
+    when the class's count changes or it leaves the frame.
+    """
+    video = models.ForeignKey(VideoUpload, on_delete=models.CASCADE, related_name='detection_runs', db_index=False)
+    vehicle_class = models.CharField(max_length=50)
+    count = models.IntegerField()
+    start_time = models.FloatField(help_text="Timestamp in the video, in seconds, of the run's first frame.")
+    end_time = models.FloatField(help_text="Timestamp of the run's last frame.")
+    frame_count = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['video', 'start_time'], name='detection_run_video_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} {self.vehicle_class}(s) in {self.video.video_file.name} from {self.start_time}s to {self.end_time}s"
+
 class AggregatedData(models.Model):
     video = models.ForeignKey(VideoUpload, on_delete=models.CASCADE)
     time_period_start = models.DateTimeField()
     vehicle_class = models.CharField(max_length=50)
-    count = models.IntegerField(help_text="Stores the total count of unique objects of vehicle_class for the entire video.")
+    count = models.IntegerField(help_text="Without a region: unique objects of vehicle_class in the entire video. With a region: vehicles that crossed it in `direction` during the counting period starting at time_period_start.")
+    region = models.ForeignKey('CountingRegion', on_delete=models.CASCADE, null=True, blank=True)
+    direction = models.CharField(max_length=10, blank=True, default='')
 
     class Meta:
-        unique_together = ('video', 'time_period_start', 'vehicle_class')
+        unique_together = ('video', 'time_period_start', 'vehicle_class', 'region', 'direction')
 
     def __str__(self):
         return f"{self.count} {self.vehicle_class}(s) in {self.video.video_file.name} starting {self.time_period_start}"
+
+class VideoChunk(models.Model):
+    """
+    A frame range of a long video processed by its own Celery task. Chunks
+    overlap by `overlap_frames` so track IDs can be merged across boundaries.
+    """
+    video = models.ForeignKey(VideoUpload, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    process_start_frame = models.IntegerField(help_text="First frame decoded, including the warm-up overlap (0-based).")
+    start_frame = models.IntegerField(help_text="First frame this chunk reports results for (0-based).")
+    end_frame = models.IntegerField(help_text="Frame after the last frame of this chunk (exclusive).")
+    overlap_frames = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=VideoUpload.STATUS_CHOICES, default='pending')
+    frames_processed = models.IntegerField(default=0)
+    skipped_frame_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('video', 'index')
+        ordering = ['video', 'index']
+
+    @property
+    def total_frames(self):
+        return self.end_frame - self.process_start_frame
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.video.video_file.name} (frames {self.start_frame}-{self.end_frame}): {self.status}"
+
+class DetectionBucket(models.Model):
+    """
+    DetectionResult counts summed per vehicle class over fixed time buckets
+    (1 s, 10 s and 60 s), written by the processor so timeline charts read a few
+    hundred rows instead of every detection.
+    """
+    video = models.ForeignKey(VideoUpload, on_delete=models.CASCADE, related_name='buckets')
+    resolution_seconds = models.PositiveIntegerField()
+    bucket_index = models.IntegerField(help_text="Bucket number; the bucket starts at bucket_index * resolution_seconds.")
+    vehicle_class = models.CharField(max_length=50)
+    count = models.IntegerField()
+
+    class Meta:
+        unique_together = ('video', 'resolution_seconds', 'bucket_index', 'vehicle_class')
+        ordering = ['video', 'resolution_seconds', 'bucket_index']
+
+    @property
+    def bucket_start(self):
+        return self.bucket_index * self.resolution_seconds
+
+    def __str__(self):
+        return f"{self.count} {self.vehicle_class}(s) in {self.video.video_file.name} at {self.bucket_start}s (+{self.resolution_seconds}s)"
+
+class TrackSummary(models.Model):
+    """
+    One tracked vehicle: when it was on screen, how confident the detector was
+    and how often each class was predicted. `vehicle_class` is the majority
+    vote; AggregatedData counts are the number of tracks per vehicle_class.
+    """
+    video = models.ForeignKey(VideoUpload, on_delete=models.CASCADE, related_name='tracks')
+    track_id = models.IntegerField()
+    vehicle_class = models.CharField(max_length=50)
+    first_frame = models.IntegerField()
+    last_frame = models.IntegerField()
+    first_seen = models.FloatField(help_text="Timestamp in the video, in seconds, of the first frame with this track.")
+    last_seen = models.FloatField()
+    frames_seen = models.IntegerField()
+    max_confidence = models.FloatField()
+    class_votes = models.JSONField(default=dict, help_text="Frames per predicted vehicle class.")
+
+    class Meta:
+        ordering = ['video', 'track_id']
+
+    @property
+    def dwell_time(self):
+        return self.last_seen - self.first_seen
+
+    def __str__(self):
+        return f"Track {self.track_id} ({self.vehicle_class}) in {self.video.video_file.name}, {self.first_seen:.1f}s-{self.last_seen:.1f}s"
+
+class ProcessingCheckpoint(models.Model):
+    """
+    Progress of a single-pass processing run, saved every
+    VIDEO_CHECKPOINT_INTERVAL_FRAMES frames. Results up to `frame_number`
+    (DetectionResult rows, finished TrackSummary rows, annotated segments)
+    are committed; `state` holds what a retry needs to continue from there.
+    """
+    video = models.OneToOneField(VideoUpload, on_delete=models.CASCADE, related_name='checkpoint')
+    frame_number = models.IntegerField(help_text="Last frame (1-based) whose results are committed.")
+    timestamp_in_video = models.FloatField(help_text="Timestamp of that frame, in seconds.")
+    state = models.JSONField(default=dict, help_text="Open tracks, overlap boxes, time buckets, counting events and annotated segments.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Checkpoint of {self.video.video_file.name} at frame {self.frame_number}"
+
+class ProcessingProgress(models.Model):
+    """
+    Live progress of a video's processing job. Workers update it at most every
+    PROGRESS_UPDATE_SECONDS (never per frame), adding the frames and stage
+    times since their last update, so the chunk tasks of one video can all
+    report into the same row.
+    """
+    video = models.OneToOneField(VideoUpload, on_delete=models.CASCADE, related_name='progress')
+    total_frames = models.IntegerField(default=0)
+    frames_done = models.IntegerField(default=0)
+    current_fps = models.FloatField(default=0.0, help_text="Frames per second of the worker that reported last, over its last update interval.")
+    decode_seconds = models.FloatField(default=0.0)
+    infer_seconds = models.FloatField(default=0.0)
+    track_seconds = models.FloatField(default=0.0)
+    plot_seconds = models.FloatField(default=0.0)
+    encode_seconds = models.FloatField(default=0.0)
+    db_seconds = models.FloatField(default=0.0)
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Progress of {self.video.video_file.name}: {self.frames_done}/{self.total_frames} frames"
+
+class Camera(models.Model):
+    """A fixed camera; its counting regions apply to every video recorded by it."""
+    name = models.CharField(max_length=100, unique=True)
+    count_period_seconds = models.PositiveIntegerField(default=900, help_text="Length of the counting periods AggregatedData is split into.")
+    inference_imgsz = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(32)], help_text="Size YOLO resizes frames to (long side, e.g. 1280 for small, distant vehicles). Leave empty for the model's default of 640.")
+    roi_points = models.JSONField(default=list, blank=True, help_text="Polygon [[x, y], ...] around the roadway, relative to the frame size. Only its bounding box is passed to YOLO and pixels outside it are blanked; boxes are mapped back to the full frame. Leave empty to use the whole frame.")
+
+    def clean(self):
+        if not self.roi_points:
+            return
+        try:
+            points = [(float(x), float(y)) for x, y in self.roi_points]
+        except (TypeError, ValueError):
+            raise ValidationError({'roi_points': "Points must be a list of [x, y] pairs."})
+        if len(points) < 3:
+            raise ValidationError({'roi_points': "The region of interest needs at least 3 points."})
+        if any(not (0 <= v <= 1) for point in points for v in point):
+            raise ValidationError({'roi_points': "Coordinates are relative to the frame size and must be between 0 and 1."})
+
+    def __str__(self):
+        return self.name
+
+class CountingRegion(models.Model):
+    """
+    A counting line (polyline) or zone (polygon) on a camera's image.
+
+    `points` are [x, y] pairs relative to the frame size (0..1), so regions do
+    not depend on the video resolution. A line counts tracks whose centroid
+    crosses it: 'in' is the crossing to the right of the line when walking from
+    its first to its last point, i.e. downwards in the image for a line drawn
+    left to right; 'out' is the opposite. A zone counts tracks entering ('in')
+    and leaving ('out') it; vehicles that are already inside when first seen,
+    e.g. parked ones, are not counted.
+    """
+    KIND_LINE = 'line'
+    KIND_ZONE = 'zone'
+    KIND_CHOICES = [
+        (KIND_LINE, 'Counting line'),
+        (KIND_ZONE, 'Counting zone'),
+    ]
+    DIRECTION_IN = 'in'
+    DIRECTION_OUT = 'out'
+
+    camera = models.ForeignKey(Camera, on_delete=models.CASCADE, related_name='regions')
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=KIND_LINE)
+    points = models.JSONField(help_text="[[x, y], ...] relative to the frame size, e.g. [[0.1, 0.6], [0.9, 0.6]].")
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ('camera', 'name')
+
+    def clean(self):
+        minimum = 2 if self.kind == self.KIND_LINE else 3
+        try:
+            points = [(float(x), float(y)) for x, y in self.points]
+        except (TypeError, ValueError):
+            raise ValidationError({'points': "Points must be a list of [x, y] pairs."})
+        if len(points) < minimum:
+            raise ValidationError({'points': f"A {self.get_kind_display().lower()} needs at least {minimum} points."})
+        if any(not (0 <= v <= 1) for point in points for v in point):
+            raise ValidationError({'points': "Coordinates are relative to the frame size and must be between 0 and 1."})
+
+    def __str__(self):
+        return f"{self.camera.name}: {self.name} ({self.kind})"
+
+class LiveStream(models.Model):
+    """
+    A camera feed ingested continuously by `manage.py ingest_stream`: an
+    RTSP/HTTP URL or the path of a video file that is still being written.
+    """
+    STATUS_CHOICES = [
+        ('idle', 'Idle'),
+        ('running', 'Running'),
+        ('reconnecting', 'Reconnecting'),
+        ('stopped', 'Stopped'),
+        ('failed', 'Failed'),
+    ]
+    name = models.CharField(max_length=100, unique=True)
+    source = models.CharField(max_length=500, help_text="Stream URL (e.g. rtsp://...) or path of a video file.")
+    camera = models.ForeignKey(Camera, on_delete=models.SET_NULL, null=True, blank=True, related_name='streams', help_text="Camera whose counting lines and zones are applied to the stream.")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='idle')
+    started_at = models.DateTimeField(null=True, blank=True)
+    last_frame_at = models.DateTimeField(null=True, blank=True)
+    frames_processed = models.BigIntegerField(default=0)
+    frames_dropped = models.BigIntegerField(default=0, help_text="Frames dropped because inference fell behind the stream.")
+    reconnect_count = models.IntegerField(default=0)
+    latency_seconds = models.FloatField(null=True, blank=True, help_text="Highest delay between reading a frame and finishing its inference since the last flush.")
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+class StreamAggregate(models.Model):
+    """
+    Vehicles counted on a LiveStream during the period starting at
+    time_period_start. Without a region: vehicles first seen in the period.
+    With a region: vehicles that crossed it in `direction` during the period.
+    """
+    stream = models.ForeignKey(LiveStream, on_delete=models.CASCADE, related_name='aggregates')
+    time_period_start = models.DateTimeField()
+    vehicle_class = models.CharField(max_length=50)
+    region = models.ForeignKey(CountingRegion, on_delete=models.CASCADE, null=True, blank=True)
+    direction = models.CharField(max_length=10, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('stream', 'time_period_start', 'vehicle_class', 'region', 'direction')
+        ordering = ['stream', 'time_period_start', 'vehicle_class']
+
+    def __str__(self):
+        return f"{self.count} {self.vehicle_class}(s) on {self.stream.name} starting {self.time_period_start}"
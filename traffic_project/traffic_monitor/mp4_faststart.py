@@ -0,0 +1,132 @@
+"""
+Moves the `moov` box of an MP4 file in front of `mdat` ("faststart"), so a
+browser can start playback from the first bytes instead of fetching the end
+of the file first. cv2.VideoWriter writes `moov` last.
+
+Only box headers and the chunk offset tables (stco/co64) are rewritten; the
+media data is copied through unchanged.
+"""
+import os
+import shutil
+import struct
+
+# Boxes on the path from moov to the chunk offset tables.
+_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts', b'dinf', b'mvex', b'moof', b'traf'}
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class FaststartError(Exception):
+    pass
+
+
+def _read_boxes(f, end):
+    """Yields (box_type, start, header_size, size) for the boxes in [f.tell(), end)."""
+    position = f.tell()
+    while position + 8 <= end:
+        f.seek(position)
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size or position + size > end:
+            raise FaststartError(f"Invalid size for box {box_type!r} at offset {position}")
+        yield box_type, position, header_size, size
+        position += size
+
+
+def _shift_chunk_offsets(moov, offset, moved_from, moved_to, start=0, end=None):
+    """
+    Adds `offset` to every stco/co64 entry of the moov bytearray that points
+    into [moved_from, moved_to), in place.
+    """
+    end = len(moov) if end is None else end
+    position = start
+    while position + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', moov, position)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', moov, position + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size or position + size > end:
+            raise FaststartError(f"Invalid size for box {box_type!r} inside moov")
+
+        if box_type in _CONTAINER_BOXES:
+            _shift_chunk_offsets(moov, offset, moved_from, moved_to, position + header_size, position + size)
+        elif box_type in (b'stco', b'co64'):
+            # Full box: version/flags, entry count, then 32- or 64-bit offsets.
+            count_at = position + header_size + 4
+            entry_count = struct.unpack_from('>I', moov, count_at)[0]
+            entry_format = '>I' if box_type == b'stco' else '>Q'
+            entry_size = struct.calcsize(entry_format)
+            for i in range(entry_count):
+                entry_at = count_at + 4 + i * entry_size
+                value = struct.unpack_from(entry_format, moov, entry_at)[0]
+                if not moved_from <= value < moved_to:
+                    continue
+                value += offset
+                if box_type == b'stco' and value > 0xFFFFFFFF:
+                    raise FaststartError("Chunk offset does not fit into stco after moving moov")
+                struct.pack_into(entry_format, moov, entry_at, value)
+        position += size
+
+
+def needs_faststart(path):
+    """True when `moov` comes after `mdat`."""
+    with open(path, 'rb') as f:
+        for box_type, _, _, _ in _read_boxes(f, os.path.getsize(path)):
+            if box_type == b'moov':
+                return False
+            if box_type == b'mdat':
+                return True
+    return False
+
+
+def faststart(path):
+    """
+    Rewrites `path` in place with `moov` before the media data. Returns True if
+    the file was rewritten, False if it already was faststart. Raises
+    FaststartError for files it cannot handle; the original is left untouched then.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        boxes = list(_read_boxes(f, file_size))
+        types = [box[0] for box in boxes]
+        if b'moov' not in types or b'mdat' not in types:
+            raise FaststartError(f"{path} has no moov or mdat box")
+        moov_index = types.index(b'moov')
+        first_mdat_index = types.index(b'mdat')
+        if moov_index < first_mdat_index:
+            return False
+
+        _, moov_start, _, moov_size = boxes[moov_index]
+        f.seek(moov_start)
+        moov = bytearray(f.read(moov_size))
+        # Everything from the first mdat up to the old moov position moves back by the size of moov.
+        _shift_chunk_offsets(moov, moov_size, boxes[first_mdat_index][1], moov_start)
+
+        tmp_path = f"{path}.faststart"
+        try:
+            with open(tmp_path, 'wb') as out:
+                for index, (_, box_start, _, box_size) in enumerate(boxes):
+                    if index == first_mdat_index:
+                        out.write(moov)
+                    if index == moov_index:
+                        continue
+                    f.seek(box_start)
+                    remaining = box_size
+                    while remaining:
+                        data = f.read(min(_COPY_BUFFER_SIZE, remaining))
+                        if not data:
+                            raise FaststartError(f"Unexpected end of file in {path}")
+                        out.write(data)
+                        remaining -= len(data)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    shutil.move(tmp_path, path)
+    return True
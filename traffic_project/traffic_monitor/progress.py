@@ -0,0 +1,96 @@
+"""
+Progress and throughput of processing jobs.
+
+ProgressReporter counts frames in memory and writes them, together with the
+per-stage times of a StageTimer, to the video's ProcessingProgress row at most
+every PROGRESS_UPDATE_SECONDS, as a single UPDATE with F() increments.
+progress_data() turns the row into what the progress API returns.
+"""
+import time
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ProcessingProgress
+from .video_pipeline import StageTimer
+
+# Defaults used when the settings module does not override them.
+DEFAULT_PROGRESS_UPDATE_SECONDS = 2.0
+
+
+def start_progress(video, total_frames, frames_done=0):
+    """Resets the video's progress row at the start of a job (or a resumed one)."""
+    now = timezone.now()
+    ProcessingProgress.objects.update_or_create(video=video, defaults={
+        'total_frames': total_frames, 'frames_done': frames_done, 'current_fps': 0.0,
+        'decode_seconds': 0.0, 'infer_seconds': 0.0, 'track_seconds': 0.0, 'plot_seconds': 0.0, 'encode_seconds': 0.0, 'db_seconds': 0.0,
+        'started_at': now, 'updated_at': now,
+    })
+
+
+class ProgressReporter:
+    """
+    Throttled progress updates for one worker. Call frame_done() per recorded
+    frame and flush() once at the end; the pipeline stages report into `timer`
+    (a new StageTimer unless one is passed, e.g. an Instrumentation).
+    """
+
+    def __init__(self, video_id, update_seconds=DEFAULT_PROGRESS_UPDATE_SECONDS, clock=time.monotonic, timer=None):
+        self.video_id = video_id
+        self.update_seconds = update_seconds
+        self.timer = timer if timer is not None else StageTimer()
+        self.clock = clock
+        self.updates = 0
+        self._frames = 0
+        self._last_update = clock()
+
+    def frame_done(self):
+        self._frames += 1
+        if self.clock() - self._last_update >= self.update_seconds:
+            self.flush()
+
+    def flush(self):
+        now = self.clock()
+        elapsed = now - self._last_update
+        frames, self._frames = self._frames, 0
+        seconds = self.timer.take()
+        self._last_update = now
+        ProcessingProgress.objects.filter(video_id=self.video_id).update(
+            frames_done=F('frames_done') + frames,
+            current_fps=frames / elapsed if elapsed > 0 else 0.0,
+            decode_seconds=F('decode_seconds') + seconds['decode'],
+            infer_seconds=F('infer_seconds') + seconds['infer'],
+            track_seconds=F('track_seconds') + seconds['track'],
+            plot_seconds=F('plot_seconds') + seconds['plot'],
+            encode_seconds=F('encode_seconds') + seconds['encode'],
+            db_seconds=F('db_seconds') + seconds['db'],
+            updated_at=timezone.now(),
+        )
+        self.updates += 1
+
+
+def progress_data(video):
+    """Progress of `video` for the API: frames, percent, fps, ETA and per-stage times."""
+    data = {'video_id': video.id, 'status': video.status}
+    progress = ProcessingProgress.objects.filter(video=video).first()
+    if progress is None:
+        return data
+    elapsed = max((progress.updated_at - progress.started_at).total_seconds(), 0.0)
+    average_fps = progress.frames_done / elapsed if elapsed > 0 else 0.0
+    remaining = max(progress.total_frames - progress.frames_done, 0)
+    rate = progress.current_fps or average_fps
+    stage_seconds = {stage: getattr(progress, f'{stage}_seconds') for stage in StageTimer.STAGES}
+    data.update({
+        'frames_done': progress.frames_done,
+        'total_frames': progress.total_frames,
+        'percent': round(100.0 * progress.frames_done / progress.total_frames, 1) if progress.total_frames else None,
+        'current_fps': round(progress.current_fps, 2),
+        'average_fps': round(average_fps, 2),
+        'eta_seconds': None if video.status != 'processing' or not rate else round(remaining / rate, 1),
+        'stage_seconds': {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
+        'stage_ms_per_frame': {stage: round(1000.0 * seconds / progress.frames_done, 2) if progress.frames_done else None
+                               for stage, seconds in stage_seconds.items()},
+        'started_at': progress.started_at,
+        'updated_at': progress.updated_at,
+    })
+    return data
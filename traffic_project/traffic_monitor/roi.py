@@ -0,0 +1,72 @@
+"""
+Region-of-interest cropping for inference.
+
+A camera's `roi_points` polygon marks the roadway. Only the polygon's bounding
+box is passed to YOLO and pixels inside the box but outside the polygon are
+filled with grey, so sky, verges and buildings are neither processed nor
+detected. Boxes come back in crop coordinates; restore() moves them to the
+full frame before annotation, counting and storage.
+"""
+import cv2
+import numpy as np
+
+# The grey YOLO letterboxes with, so blanked pixels look like padding.
+FILL_VALUE = 114
+
+
+class RoiCropper:
+    """
+    Crops frames of `frame_size` (width, height) to the bounding box of
+    `polygon` (relative [x, y] points) and blanks what lies outside it.
+    """
+
+    def __init__(self, polygon, frame_size):
+        width, height = frame_size
+        points = np.asarray(polygon, dtype=np.float64) * np.array([width, height], dtype=np.float64)
+        x0, y0 = np.floor(points.min(axis=0)).astype(int).tolist()
+        x1, y1 = np.ceil(points.max(axis=0)).astype(int).tolist()
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(max(x1, x0 + 1), width), min(max(y1, y0 + 1), height)
+        self.frame_size = (width, height)
+        self.offset = (x0, y0)
+        self.crop_size = (x1 - x0, y1 - y0)
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillPoly(mask, [np.round(points - [x0, y0]).astype(np.int32)], 255)
+        outside = mask == 0
+        self._outside = outside if outside.any() else None
+
+    @property
+    def covers_frame(self):
+        """True when cropping would change nothing (the polygon is the whole frame)."""
+        return self.crop_size == self.frame_size and self._outside is None
+
+    @property
+    def pixel_fraction(self):
+        """Share of the frame's pixels that is passed to the detector."""
+        return self.crop_size[0] * self.crop_size[1] / (self.frame_size[0] * self.frame_size[1])
+
+    def crop(self, image):
+        x0, y0 = self.offset
+        crop = image[y0:y0 + self.crop_size[1], x0:x0 + self.crop_size[0]]
+        if self._outside is not None:
+            crop = crop.copy()
+            crop[self._outside] = FILL_VALUE
+        return crop
+
+    def restore(self, yolo_results_frame, image):
+        """Moves a crop's results (boxes, tracker IDs kept) onto the full frame `image`, in place."""
+        yolo_results_frame.orig_img = image
+        yolo_results_frame.orig_shape = image.shape[:2]
+        data = yolo_results_frame.boxes.data.clone()
+        data[:, [0, 2]] += self.offset[0]
+        data[:, [1, 3]] += self.offset[1]
+        yolo_results_frame.update(boxes=data)
+        return yolo_results_frame
+
+
+def make_roi_cropper(camera, frame_size):
+    """RoiCropper for the camera's region of interest, or None when there is none to apply."""
+    if camera is None or not camera.roi_points:
+        return None
+    cropper = RoiCropper(camera.roi_points, frame_size)
+    return None if cropper.covers_frame else cropper
@@ -7,3 +7,19 @@ class ChartDataSerializer(serializers.Serializer):
 class CombinedChartDataSerializer(serializers.Serializer):
     distribution_chart = ChartDataSerializer()
     timeline_chart = ChartDataSerializer()
+
+class ProcessingProgressSerializer(serializers.Serializer):
+    # Only video_id and status are present before a job has started.
+    video_id = serializers.IntegerField()
+    status = serializers.CharField()
+    frames_done = serializers.IntegerField(required=False)
+    total_frames = serializers.IntegerField(required=False)
+    percent = serializers.FloatField(required=False, allow_null=True)
+    current_fps = serializers.FloatField(required=False)
+    average_fps = serializers.FloatField(required=False)
+    eta_seconds = serializers.FloatField(required=False, allow_null=True)
+    stage_seconds = serializers.DictField(child=serializers.FloatField(), required=False)
+    stage_ms_per_frame = serializers.DictField(child=serializers.FloatField(allow_null=True), required=False)
+    started_at = serializers.DateTimeField(required=False)
+    updated_at = serializers.DateTimeField(required=False)
+
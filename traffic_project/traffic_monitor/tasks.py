@@ -1,19 +1,87 @@
-from celery import shared_task
-from .yolo_processor import process_video_with_yolo, YOLO_CLASS_NAMES
+from celery import chord, shared_task
+from celery.signals import worker_process_init
+from .instrumentation import DEFAULT_PROCESSING_PROFILE_DIR, profile_job
+from .models import VideoUpload
 from django.conf import settings
 import os
 
-@shared_task
-def process_video_task(video_upload_id):
+# The inference stack (yolo_processor, model_registry and with them ultralytics,
+# torch and cv2) is imported inside the tasks, not here: views import this module
+# to queue tasks, and web processes should not load it. The import guard in
+# tests.py (LazyImportTest) fails when it is imported at module level again.
+
+# Defaults used when the settings module does not override them.
+DEFAULT_VIDEO_CHUNK_OVERLAP_SECONDS = 2.0
+
+def _profile_dir():
+    # With PROCESSING_PROFILE_DIR set, every job writes a cProfile dump and a
+    # tracemalloc report there (see instrumentation.profile_job).
+    return getattr(settings, 'PROCESSING_PROFILE_DIR', DEFAULT_PROCESSING_PROFILE_DIR)
+
+def _model_path():
     # Construct the full path to the YOLO model file (`best.pt`).
     # `settings.BASE_DIR` points to the root directory of the Django project (where manage.py is).
     # This assumes `best.pt` is placed in the project root.
-    model_path = os.path.join(settings.BASE_DIR, 'best.pt')
+    return str(os.path.join(settings.BASE_DIR, 'best.pt'))
+
+@worker_process_init.connect
+def preload_model(**kwargs):
+    # Load and warm up best.pt once per worker process, so the first video a
+    # worker picks up does not pay the cold start. Set YOLO_PRELOAD_MODEL = False
+    # to load lazily on the first task instead.
+    if not getattr(settings, 'YOLO_PRELOAD_MODEL', True):
+        return
+    model_path = _model_path()
+    if not os.path.exists(model_path):
+        print(f"Model {model_path} not found, skipping preload.")
+        return
+    from .model_registry import get_model
+    try:
+        _, stats = get_model(model_path, warmup=True)
+        print(f"Model {model_path}: preloaded {stats['loaded_path']} in {stats['load_seconds']:.2f}s")
+    except Exception as e:
+        print(f"Error preloading model {model_path}: {e}")
+
+# acks_late + reject_on_worker_lost: if the worker dies mid-video the broker hands
+# the task to another worker, which resumes from the video's last checkpoint.
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def process_video_task(video_upload_id, batch_size=None, frame_stride=None, motion_threshold=None, chunk_seconds=None):
+    # `batch_size` is the number of frames per YOLO detection call for this task.
+    # It falls back to settings.YOLO_INFERENCE_BATCH_SIZE (1 = frame-by-frame model.track()).
+    if batch_size is None:
+        batch_size = getattr(settings, 'YOLO_INFERENCE_BATCH_SIZE', 1)
+    # Frame skipping: infer every `frame_stride`-th frame and/or only when the motion
+    # gate sees enough change. Defaults come from YOLO_FRAME_STRIDE / YOLO_MOTION_THRESHOLD.
+    if frame_stride is None:
+        frame_stride = getattr(settings, 'YOLO_FRAME_STRIDE', 1)
+    if motion_threshold is None:
+        motion_threshold = getattr(settings, 'YOLO_MOTION_THRESHOLD', None)
+    from .yolo_processor import create_video_chunks, process_video_with_yolo, YOLO_CLASS_NAMES
+    # Long videos can be split into chunks of `chunk_seconds` that run as separate
+    # tasks (one per worker) and are merged by merge_video_chunks_task.
+    # Defaults to settings.VIDEO_CHUNK_SECONDS; None processes the video in one pass.
+    if chunk_seconds is None:
+        chunk_seconds = getattr(settings, 'VIDEO_CHUNK_SECONDS', None)
+    model_path = _model_path()
+    if chunk_seconds:
+        overlap_seconds = getattr(settings, 'VIDEO_CHUNK_OVERLAP_SECONDS', DEFAULT_VIDEO_CHUNK_OVERLAP_SECONDS)
+        video_upload_instance = VideoUpload.objects.get(id=video_upload_id)
+        chunks = create_video_chunks(video_upload_instance, chunk_seconds, overlap_seconds)
+        if chunks:
+            video_upload_instance.status = 'processing'
+            video_upload_instance.save()
+            options = {'batch_size': batch_size, 'frame_stride': frame_stride, 'motion_threshold': motion_threshold}
+            chord(
+                process_video_chunk_task.s(chunk.id, **options) for chunk in chunks
+            )(merge_video_chunks_task.s(video_upload_id))
+            return
     try:
         # It's better to pass IDs and simple data types (like strings for paths) to Celery tasks
         # rather than complex objects like model instances.
         # The `process_video_with_yolo` function is designed to fetch the VideoUpload instance using its ID.
-        process_video_with_yolo(video_upload_id, str(model_path), YOLO_CLASS_NAMES)
+        with profile_job(f'video-{video_upload_id}', _profile_dir()):
+            process_video_with_yolo(video_upload_id, model_path, YOLO_CLASS_NAMES, batch_size=batch_size,
+                                    frame_stride=frame_stride, motion_threshold=motion_threshold)
     except Exception as e:
         # Log the exception or handle it appropriately
         # You might want to update the VideoUpload status to 'failed' here
@@ -27,7 +95,39 @@ def process_video_task(video_upload_id):
         # A more robust solution would involve a try-except in this task
         # that explicitly sets status to 'failed' if process_video_with_yolo crashes badly.
         raise # Re-raise the exception to mark the task as failed in Celery
-        
+
+@shared_task
+def process_video_chunk_task(chunk_id, batch_size=1, frame_stride=1, motion_threshold=None):
+    # Returns the chunk's track summary; the chord hands all of them, in chunk order,
+    # to merge_video_chunks_task. Failures mark the chunk and the video as failed.
+    from .yolo_processor import process_video_chunk_with_yolo, YOLO_CLASS_NAMES
+    with profile_job(f'chunk-{chunk_id}', _profile_dir()):
+        return process_video_chunk_with_yolo(chunk_id, _model_path(), YOLO_CLASS_NAMES, batch_size=batch_size,
+                                             frame_stride=frame_stride, motion_threshold=motion_threshold)
+
+@shared_task
+def merge_video_chunks_task(chunk_summaries, video_upload_id):
+    from .yolo_processor import merge_video_chunks, YOLO_CLASS_NAMES
+    merge_video_chunks(video_upload_id, chunk_summaries, YOLO_CLASS_NAMES)
+
+@shared_task
+def recount_video_task(video_upload_id, min_confidence=None, retrack=False, tracker_config=None):
+    # Rebuilds the video's counts and timeline from its detection archive with the
+    # current YOLO_CLASS_NAMES and counting regions; no inference, so it takes
+    # seconds. `retrack` re-runs tracking over the archived boxes as well, with
+    # `tracker_config` (e.g. a tuned copy of bytetrack.yaml, default: the one
+    # processing uses).
+    from .yolo_processor import recount_video, YOLO_CLASS_NAMES
+    if retrack and tracker_config is None:
+        from .tracking import TRACKER_CONFIG
+        tracker_config = TRACKER_CONFIG
+    try:
+        return recount_video(video_upload_id, YOLO_CLASS_NAMES, min_confidence=min_confidence,
+                             tracker_config=tracker_config)
+    except Exception as e:
+        print(f"Error recounting video ID {video_upload_id}: {e}")
+        raise
+
 # Note: The yolo_processor.py's process_video_with_yolo function is expected
 # to handle its own try/except blocks for internal errors and update the
 # VideoUpload model's status accordingly ('completed' or 'failed').
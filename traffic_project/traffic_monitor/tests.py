@@ -7,8 +7,15 @@ from unittest.mock import MagicMock
 
 
 from .forms import VideoUploadForm
-from .models import VideoUpload, DetectionResult, AggregatedData
-from .yolo_processor import _get_unique_car_ids_from_results
+from .models import VideoUpload, DetectionResult, AggregatedData, DetectionBucket, TrackSummary, Camera, CountingRegion, LiveStream, StreamAggregate, ProcessingCheckpoint, ProcessingProgress
+from .yolo_processor import _get_unique_ids_from_frame_results, _track_frames, process_live_stream, process_video_with_yolo, YOLO_CLASS_NAMES
+from .detection_writer import BufferedDetectionWriter
+from .video_pipeline import VideoPipeline
+from .model_registry import ModelRegistry, clear_model_cache
+from .time_buckets import TimeBucketAccumulator
+from .chunking import plan_chunks, match_overlap_tracks, merge_chunk_tracks
+from .track_store import TrackStore
+from .live_stream import LiveAggregator, ReplayCapture, StreamReader
 # Serializers are not directly tested here, but through the API view.
 
 # Helper to create a dummy video file for tests
@@ -168,86 +175,1506 @@ class APITest(TestCase):
 # detailed model processing logic) would require a more comprehensive test setup.
 
 
-# Helper classes for mocking YOLO results, as provided in the subtask description
-class MockDetectionItem:
-    def __init__(self, value):
-        self._value = value
-    def item(self):
-        return self._value
-
-class MockBox:
-    def __init__(self, class_id, tracker_id):
-        self.cls = [MockDetectionItem(class_id)]
-        # Ensure self.id is None if tracker_id is None, otherwise wrap with MockDetectionItem
-        self.id = MockDetectionItem(tracker_id) if tracker_id is not None else None
+# Helper for building YOLO results objects without running a model
+def make_frame_results(detections, tracked=True):
+    """
+    Builds an Ultralytics Results object for one frame from (class_id, tracker_id)
+    pairs. With tracked=False the boxes carry no tracker IDs, as on frames where
+    the tracker produced none.
+    """
+    import numpy as np
+    import torch
+    from ultralytics.engine.results import Results
+    rows = []
+    for i, (class_id, tracker_id) in enumerate(detections):
+        box = [10.0 * i, 10.0, 10.0 * i + 8, 18.0]
+        rows.append(box + ([tracker_id] if tracked else []) + [0.9, class_id])
+    boxes = torch.tensor(rows, dtype=torch.float32).reshape(-1, 7 if tracked else 6)
+    return Results(np.zeros((32, 32, 3), dtype=np.uint8), path='', names=YOLO_CLASS_NAMES, boxes=boxes)
 
 
 class YoloProcessorHelperTests(TestCase):
-    def test_get_unique_car_ids_from_results(self):
-        """Test the _get_unique_car_ids_from_results helper function."""
+    def test_get_unique_ids_from_frame_results(self):
+        """Test the _get_unique_ids_from_frame_results helper function."""
 
         # Test case 1: Mixed data
-        mock_yolo_results_mixed = MagicMock()
-        mock_yolo_results_mixed.boxes = [
-            MockBox(class_id=0, tracker_id=101),  # Car
-            MockBox(class_id=1, tracker_id=102),  # Van
-            MockBox(class_id=0, tracker_id=103),  # Car
-            MockBox(class_id=0, tracker_id=101),  # Car (duplicate ID)
-            MockBox(class_id=2, tracker_id=104),  # Other
-            MockBox(class_id=0, tracker_id=None), # Car with no ID
-        ]
-        unique_ids_mixed = _get_unique_car_ids_from_results(mock_yolo_results_mixed)
-        self.assertEqual(unique_ids_mixed, {101, 103})
+        mixed = make_frame_results([
+            (0, 101),  # Car
+            (1, 102),  # Van
+            (0, 103),  # Car
+            (0, 101),  # Car (duplicate ID)
+            (2, 104),  # Other
+        ])
+        self.assertEqual(_get_unique_ids_from_frame_results(mixed), {0: {101, 103}, 1: {102}, 2: {104}})
 
         # Test case 2: Empty boxes list
-        mock_yolo_results_empty = MagicMock()
-        mock_yolo_results_empty.boxes = []
-        unique_ids_empty = _get_unique_car_ids_from_results(mock_yolo_results_empty)
-        self.assertEqual(unique_ids_empty, set())
-
-        # Test case 3: Boxes present, but no valid car IDs (e.g., all non-cars or cars with no IDs)
-        mock_yolo_results_no_cars = MagicMock()
-        mock_yolo_results_no_cars.boxes = [
-            MockBox(class_id=1, tracker_id=201),  # Van
-            MockBox(class_id=2, tracker_id=202),  # Other
-            MockBox(class_id=0, tracker_id=None), # Car with no ID
-        ]
-        unique_ids_no_cars = _get_unique_car_ids_from_results(mock_yolo_results_no_cars)
-        self.assertEqual(unique_ids_no_cars, set())
-
-        # Test case 4: Only cars, but all have None IDs
-        mock_yolo_results_cars_no_ids = MagicMock()
-        mock_yolo_results_cars_no_ids.boxes = [
-            MockBox(class_id=0, tracker_id=None),
-            MockBox(class_id=0, tracker_id=None),
+        self.assertEqual(_get_unique_ids_from_frame_results(make_frame_results([])), {})
+
+        # Test case 3: The tracker produced no IDs for the frame at all (boxes.id is None)
+        untracked = make_frame_results([(0, None), (1, None)], tracked=False)
+        self.assertEqual(_get_unique_ids_from_frame_results(untracked), {})
+
+    def test_extract_frame_detections_counts_boxes_per_class(self):
+        from .yolo_processor import _extract_frame_detections
+        counts, ids = _extract_frame_detections(make_frame_results([(0, 1), (6, 2), (0, 3), (0, 1)]))
+        self.assertEqual(counts, {0: 3, 6: 1})
+        self.assertEqual(ids, {0: {1, 3}, 6: {2}})
+
+        counts, ids = _extract_frame_detections(make_frame_results([(18, None), (18, None)], tracked=False))
+        self.assertEqual(counts, {18: 2})
+        self.assertEqual(ids, {})
+
+
+class FakeClock:
+    """Manually advanced replacement for time.monotonic."""
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+
+class BufferedDetectionWriterTest(TestCase):
+    def setUp(self):
+        self.video = VideoUpload.objects.create(video_file=create_dummy_video_file(name="writer.mp4"))
+
+    def test_flushes_when_batch_size_is_reached(self):
+        writer = BufferedDetectionWriter(batch_size=3, flush_interval=None)
+        writer.add(self.video, 0.04, 'car', 2)
+        writer.add(self.video, 0.04, 'van', 1)
+        self.assertEqual(DetectionResult.objects.count(), 0)
+        writer.add(self.video, 0.08, 'car', 2)
+        self.assertEqual(DetectionResult.objects.count(), 3)
+        self.assertEqual(len(writer), 0)
+
+    def test_flushes_when_interval_elapses(self):
+        clock = FakeClock()
+        writer = BufferedDetectionWriter(batch_size=100, flush_interval=2.0, clock=clock)
+        writer.add(self.video, 0.04, 'car', 1)
+        clock.now = 1.0
+        writer.add(self.video, 0.08, 'car', 1)
+        self.assertEqual(DetectionResult.objects.count(), 0)
+        clock.now = 2.5
+        writer.add(self.video, 0.12, 'car', 1)
+        self.assertEqual(DetectionResult.objects.count(), 3)
+
+    def test_context_manager_flushes_rows_when_processing_fails(self):
+        with self.assertRaises(RuntimeError):
+            with BufferedDetectionWriter(batch_size=100, flush_interval=None) as writer:
+                writer.add(self.video, 0.04, 'car', 4)
+                writer.add(self.video, 0.04, 'truck 2-axle', 1)
+                raise RuntimeError("inference crashed")
+        self.assertEqual(
+            sorted(DetectionResult.objects.values_list('vehicle_class', 'count')),
+            [('car', 4), ('truck 2-axle', 1)],
+        )
+        self.assertEqual(writer.rows_written, 2)
+
+
+class FakeCapture:
+    """Stands in for cv2.VideoCapture: yields `frame_count` frames at 25 fps."""
+    def __init__(self, frame_count, fail_at=None):
+        self.frame_count = frame_count
+        self.fail_at = fail_at
+        self.position = 0
+    def read(self):
+        if self.fail_at is not None and self.position + 1 == self.fail_at:
+            raise IOError("corrupt packet")
+        if self.position >= self.frame_count:
+            return False, None
+        self.position += 1
+        return True, f"frame-{self.position}"
+    def get(self, prop):
+        return self.position * 40.0  # CAP_PROP_POS_MSEC
+    def isOpened(self):
+        return True
+    def release(self):
+        pass
+
+
+class PooledCapture(FakeCapture):
+    """FakeCapture decoding into buffers from a FrameBufferPool, like PyAVCapture."""
+    def __init__(self, frame_count):
+        from .frame_sources import FrameBufferPool
+        super().__init__(frame_count)
+        self.buffer_pool = FrameBufferPool()
+    def read(self):
+        if self.position >= self.frame_count:
+            return False, None
+        self.position += 1
+        image = self.buffer_pool.get((2, 2))
+        image.fill(self.position)
+        return True, image
+
+
+class ListWriter:
+    def __init__(self):
+        self.frames = []
+    def write(self, image):
+        self.frames.append(image)
+
+
+class VideoPipelineTest(TestCase):
+    def test_frames_are_decoded_inferred_and_encoded_in_order(self):
+        writer = ListWriter()
+        seen_by_inference = []
+        render = lambda decoded, result: f"{result}-annotated"
+        with VideoPipeline(FakeCapture(50), writer, render, queue_size=2) as pipeline:
+            for decoded in pipeline.frames():
+                seen_by_inference.append((decoded.index, decoded.timestamp))
+                pipeline.submit(decoded, decoded.image)
+        self.assertEqual(seen_by_inference, [(i, i * 40.0 / 1000.0) for i in range(1, 51)])
+        self.assertEqual(writer.frames, [f"frame-{i}-annotated" for i in range(1, 51)])
+
+    def test_decoder_errors_reach_the_consumer(self):
+        writer = ListWriter()
+        with self.assertRaises(IOError):
+            with VideoPipeline(FakeCapture(50, fail_at=10), writer, lambda d, r: r, queue_size=2) as pipeline:
+                for decoded in pipeline.frames():
+                    pipeline.submit(decoded, decoded.image)
+        self.assertFalse(pipeline.decoder.is_alive())
+        self.assertFalse(pipeline.encoder.is_alive())
+
+    def test_encoder_errors_reach_the_consumer(self):
+        def render(decoded, result):
+            if decoded.index == 3:
+                raise ValueError("encoder failed")
+            return result
+        with self.assertRaises(ValueError):
+            with VideoPipeline(FakeCapture(20), ListWriter(), render, queue_size=2) as pipeline:
+                for decoded in pipeline.frames():
+                    pipeline.submit(decoded, decoded.image)
+        self.assertFalse(pipeline.decoder.is_alive())
+
+    def test_pooled_frames_are_recycled_once_written_or_released(self):
+        writer = ListWriter()
+        cap = PooledCapture(200)
+        with VideoPipeline(cap, writer, lambda decoded, result: int(decoded.image[0, 0]), queue_size=2) as pipeline:
+            for decoded in pipeline.frames():
+                self.assertTrue((decoded.image == decoded.index).all())
+                if decoded.index % 2:
+                    pipeline.submit(decoded, None)
+                else:
+                    pipeline.release(decoded)
+        # Rendered from the frame's own pixels, so no buffer was reused while queued
+        self.assertEqual(writer.frames, list(range(1, 201, 2)))
+        self.assertLess(cap.buffer_pool.allocated, 20)
+
+
+class MovingBoxDetector:
+    """
+    Fake YOLO model for the batched path: every frame shows one car driving
+    right by 10 px per frame. Records the batch sizes it was called with.
+    """
+    def __init__(self):
+        self.batch_sizes = []
+    def predict(self, images, **kwargs):
+        import numpy as np
+        import torch
+        from ultralytics.engine.results import Results
+        self.batch_sizes.append(len(images))
+        results = []
+        for image in images:
+            x = 10.0 * image  # The fake "image" is just the frame index.
+            boxes = torch.tensor([[x, 100.0, x + 60.0, 140.0, 0.9, 0.0]])
+            results.append(Results(np.zeros((360, 640, 3), dtype=np.uint8), path='', names=YOLO_CLASS_NAMES, boxes=boxes))
+        return results
+
+
+class BatchedTrackingTest(TestCase):
+    def test_batched_detection_keeps_frame_order_and_track_ids(self):
+        from .video_pipeline import DecodedFrame
+        detector = MovingBoxDetector()
+        frames = [DecodedFrame(i, i * 0.04, i) for i in range(1, 8)]
+        tracked = list(_track_frames(detector, iter(frames), batch_size=3))
+
+        self.assertEqual(detector.batch_sizes, [3, 3, 1])
+        self.assertEqual([decoded.index for decoded, _ in tracked], list(range(1, 8)))
+        track_ids = {int(result.boxes.id[0]) for _, result in tracked if result.boxes.id is not None}
+        self.assertEqual(track_ids, {1})
+
+
+def write_synthetic_traffic_video(path, frame_count=160, size=(320, 240), fps=25):
+    """
+    Fixed-camera clip on a grey background: a car (30 px tall) crosses during
+    frames 10-60, a truck (40 px tall) during frames 90-150, and nothing moves
+    in between.
+    """
+    import cv2
+    import numpy as np
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for i in range(frame_count):
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        if 10 <= i <= 60:
+            x = -60 + (i - 10) * 8
+            cv2.rectangle(frame, (x, 45), (x + 60, 75), (0, 220, 0), -1)
+        if 90 <= i <= 150:
+            x = -100 + (i - 90) * 7
+            cv2.rectangle(frame, (x, 140), (x + 100, 180), (220, 0, 0), -1)
+        writer.write(frame)
+    writer.release()
+
+
+class BlobTrackingModel:
+    """
+    Fake YOLO model for process_video_with_yolo: detects the coloured blocks of
+    write_synthetic_traffic_video, classifies them by height (car / truck 2-axle)
+    and assigns IDs by nearest centroid. Counts track() calls.
+    """
+    def __init__(self):
+        self.calls = 0
+        self._tracks = {}  # id -> (cx, cy)
+        self._next_id = 1
+    def track(self, image, **kwargs):
+        import cv2
+        import numpy as np
+        import torch
+        from ultralytics.engine.results import Results
+        self.calls += 1
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.int16)
+        mask = (np.abs(gray - 90) > 30).astype(np.uint8)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        rows, tracks = [], {}
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h < 150:
+                continue
+            cx, cy = x + w / 2, y + h / 2
+            nearest = min(self._tracks.items(), key=lambda t: abs(t[1][0] - cx) + abs(t[1][1] - cy), default=None)
+            if nearest and abs(nearest[1][0] - cx) + abs(nearest[1][1] - cy) < 80:
+                track_id = nearest[0]
+            else:
+                track_id, self._next_id = self._next_id, self._next_id + 1
+            tracks[track_id] = (cx, cy)
+            rows.append([x, y, x + w, y + h, track_id, 0.9, 6 if h >= 36 else 0])
+        self._tracks = tracks
+        boxes = torch.tensor(rows, dtype=torch.float32).reshape(-1, 7)
+        return [Results(image, path='', names=YOLO_CLASS_NAMES, boxes=boxes)]
+
+
+class SyntheticVideoTestCase(TestCase):
+    """Runs process_video_with_yolo on write_synthetic_traffic_video with BlobTrackingModel."""
+    def setUp(self):
+        import tempfile
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = self.settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        os.makedirs(os.path.join(self.media_root, 'videos'))
+        write_synthetic_traffic_video(os.path.join(self.media_root, 'videos', 'camera.mp4'))
+
+    def tearDown(self):
+        import shutil
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _process(self, video_fields=None, **options):
+        from unittest.mock import patch
+        video = VideoUpload.objects.create(video_file='videos/camera.mp4', **(video_fields or {}))
+        clear_model_cache()
+        model = BlobTrackingModel()
+        with patch('traffic_monitor.model_registry.YOLO', return_value=model):
+            process_video_with_yolo(video.id, 'best.pt', YOLO_CLASS_NAMES, **options)
+        video.refresh_from_db()
+        self.assertEqual(video.status, 'completed')
+        counts = dict(AggregatedData.objects.filter(video=video).values_list('vehicle_class', 'count'))
+        return video, model, counts
+
+
+class FrameSkippingTest(SyntheticVideoTestCase):
+    def test_frame_stride_and_motion_gate_keep_unique_counts(self):
+        _, full_model, full_counts = self._process()
+        gated_video, gated_model, gated_counts = self._process(frame_stride=2, motion_threshold=0.002)
+
+        self.assertEqual(full_counts, {'car': 1, 'truck 2-axle': 1})
+        self.assertEqual(set(gated_counts), set(full_counts))
+        for vehicle_class, count in full_counts.items():
+            self.assertLessEqual(abs(gated_counts[vehicle_class] - count), 1)
+
+        # Throughput: well under half of the frames reach the model.
+        self.assertEqual(full_model.calls, 160)
+        self.assertLess(gated_model.calls, full_model.calls * 0.45)
+        self.assertEqual(gated_video.frame_count, 160)
+        self.assertEqual(gated_video.skipped_frame_count, 160 - gated_model.calls)
+
+    def test_skipped_frames_carry_over_previous_tracks(self):
+        _, _, _ = self._process()
+        full_rows = DetectionResult.objects.count()
+        video, _, _ = self._process(frame_stride=4)
+        # Frames with a vehicle still get their DetectionResult rows; only the
+        # frames right where a vehicle enters or leaves can differ.
+        self.assertLessEqual(abs(DetectionResult.objects.filter(video=video).count() - full_rows), 4)
+
+
+class RecordingVideoWriter(ListWriter):
+    """Replacement for cv2.VideoWriter that keeps the frames it is given."""
+    instances = []
+    def __init__(self, path, fourcc, fps, size):
+        super().__init__()
+        self.path, self.fps, self.size = path, fps, size
+        RecordingVideoWriter.instances.append(self)
+    def release(self):
+        pass
+
+
+class RenderModeTest(SyntheticVideoTestCase):
+    def setUp(self):
+        super().setUp()
+        RecordingVideoWriter.instances = []
+
+    def _process_with_recording_writer(self, **video_fields):
+        from unittest.mock import patch
+        with patch('traffic_monitor.yolo_processor.cv2.VideoWriter', RecordingVideoWriter):
+            return self._process(video_fields=video_fields)
+
+    def test_counts_only_skips_rendering_and_encoding(self):
+        video, _, counts = self._process_with_recording_writer(render_mode=VideoUpload.RENDER_COUNTS_ONLY)
+        self.assertEqual(RecordingVideoWriter.instances, [])
+        self.assertFalse(video.processed_video_file)
+        self.assertEqual(counts, {'car': 1, 'truck 2-axle': 1})
+
+        response = self.client.get(reverse('stream_video', args=[video.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_annotated_output_can_be_downscaled_and_decimated(self):
+        video, _, _ = self._process_with_recording_writer(output_scale=0.5, output_fps=5)
+        writer = RecordingVideoWriter.instances[0]
+        self.assertEqual(writer.size, (160, 120))
+        self.assertEqual(writer.fps, 5)
+        self.assertEqual(len(writer.frames), 32)  # 160 source frames at 25 fps, every 5th frame
+        self.assertEqual(writer.frames[0].shape, (120, 160, 3))
+        self.assertEqual(video.processed_video_file.name, os.path.join('processed_videos', 'camera_annotated.mp4'))
+
+    def test_annotator_draws_in_place_at_full_resolution(self):
+        import numpy as np
+        from .annotation import FrameAnnotator
+        from .video_pipeline import DecodedFrame
+        image = np.full((240, 320, 3), 90, dtype=np.uint8)
+        result = BlobTrackingModel().track(image)[0]
+        annotated = FrameAnnotator(YOLO_CLASS_NAMES, (320, 240))(DecodedFrame(1, 0.0, image), result)
+        self.assertIs(annotated, image)
+
+    def test_downscaled_annotation_leaves_the_tracked_boxes_alone(self):
+        import cv2
+        import numpy as np
+        import torch
+        from .annotation import FrameAnnotator
+        from .detection_archive import load_detections
+        from .video_pipeline import DecodedFrame
+        image = np.full((240, 320, 3), 90, dtype=np.uint8)
+        cv2.rectangle(image, (40, 100), (100, 130), (255, 255, 255), -1)
+        result = BlobTrackingModel().track(image)[0]
+        self.assertEqual(len(result.boxes), 1)
+        boxes = result.boxes.xyxy.clone()
+        FrameAnnotator(YOLO_CLASS_NAMES, (160, 120))(DecodedFrame(1, 0.0, image), result)
+        self.assertTrue(torch.equal(result.boxes.xyxy, boxes))
+
+        # Frames skipped by the stride reuse the last result, which must not shrink on every reuse
+        full_video, _, full_counts = self._process(frame_stride=3)
+        scaled_video, _, scaled_counts = self._process(frame_stride=3, video_fields={'output_scale': 0.5})
+        self.assertEqual(scaled_counts, full_counts)
+        full, scaled = load_detections(full_video.detection_archive.path), load_detections(scaled_video.detection_archive.path)
+        for column in ('frame', 'x1', 'y1', 'x2', 'y2'):
+            self.assertEqual(scaled[column].tolist(), full[column].tolist())
+
+    def test_upload_form_rejects_upscaling(self):
+        form = VideoUploadForm(data={'output_scale': 2}, files={'video_file': create_dummy_video_file()})
+        self.assertFalse(form.is_valid())
+        self.assertIn('output_scale', form.errors)
+
+
+class ChunkPlanningTest(TestCase):
+    def test_plan_chunks_covers_video_with_warm_up_overlap(self):
+        plans = plan_chunks(160, 50, 20)
+        self.assertEqual([(p.process_start_frame, p.start_frame, p.end_frame) for p in plans],
+                         [(0, 0, 50), (30, 50, 100), (80, 100, 150), (130, 150, 160)])
+
+    def test_overlap_tracks_are_matched_by_iou(self):
+        tail = [[48, 7, 0, 0, 10, 10], [49, 7, 2, 0, 12, 10], [49, 8, 50, 50, 60, 60]]
+        head = [[48, 1, 0, 0, 10, 10], [49, 1, 2, 0, 12, 10], [49, 2, 100, 100, 110, 110]]
+        self.assertEqual(match_overlap_tracks(tail, head), {1: 7})
+
+    def test_merged_tracks_join_boundary_vehicles(self):
+        def record(track_id, first_frame, last_frame, class_votes):
+            return {'track_id': track_id, 'first_frame': first_frame, 'last_frame': last_frame,
+                    'first_seen': first_frame / 25, 'last_seen': last_frame / 25, 'frames_seen': last_frame - first_frame + 1,
+                    'max_confidence': 0.8, 'class_votes': class_votes, 'class_id': 0}
+        summaries = [
+            {'tracks': [record(7, 30, 50, {0: 21}), record(8, 10, 20, {6: 11})],
+             'head': [], 'tail': [[49, 7, 0, 0, 10, 10]]},
+            # JSON round trips turn the vote keys into strings.
+            {'tracks': [record(1, 51, 60, {'6': 10}), record(2, 55, 70, {'0': 16})],
+             'head': [[49, 1, 0, 0, 10, 10]], 'tail': []},
         ]
-        unique_ids_cars_no_ids = _get_unique_car_ids_from_results(mock_yolo_results_cars_no_ids)
-        self.assertEqual(unique_ids_cars_no_ids, set())
-
-        # Test case 5: Results object where boxes[0].id is None (initial check in helper)
-        # This case is slightly tricky to set up perfectly with MagicMock for hasattr(results[0].boxes[0], 'id')
-        # The current helper checks `yolo_results_frame.boxes and hasattr(yolo_results_frame.boxes[0], 'id') and yolo_results_frame.boxes[0].id is not None`
-        # If boxes is not empty, but boxes[0].id is None, it should be handled.
-        # The existing MockBox(class_id=0, tracker_id=None) already covers boxes where individual .id is None.
-        # If the very first box's .id attribute itself was missing or the first box's .id was None, the initial check would prevent iteration.
-
-        # Let's test the condition where yolo_results_frame.boxes[0].id itself is None (not the item() part)
-        # This is covered by MockBox(class_id=0, tracker_id=None) as self.id becomes None.
-        # The hasattr check is for the attribute 'id' on the box object, which MockBox always has.
-        # The critical part is `box.id is not None` inside the loop, which is tested.
-
-        # Test case: yolo_results_frame.boxes is not None, but yolo_results_frame.boxes[0] does not have an 'id' attribute
-        # This is harder to mock with the current MockBox structure if we still want cls.
-        # However, the helper's initial check `hasattr(yolo_results_frame.boxes[0], 'id')` handles this.
-        # Let's simulate this by making boxes[0] a simple MagicMock without an 'id' attribute.
-        mock_yolo_results_first_box_no_id_attr = MagicMock()
-        first_box_missing_id_attr = MagicMock()
-        del first_box_missing_id_attr.id # Ensure 'id' attribute is not present
-        mock_yolo_results_first_box_no_id_attr.boxes = [first_box_missing_id_attr]
-        # To make hasattr work as expected, we might need to configure the mock for first_box_missing_id_attr.
-        # For simplicity, we'll assume the current helper's structure is robust for typical Ultralytics results.
-        # The primary goal is testing the logic *within* the iteration.
-        # The line `if yolo_results_frame.boxes and hasattr(yolo_results_frame.boxes[0], 'id') and yolo_results_frame.boxes[0].id is not None:`
-        # is a guard. If `hasattr` returns false, it won't enter the loop.
-        # If `boxes[0].id` itself is None (not `box.id.item()` being None), it also won't enter.
-        # The existing tests cover `box.id.item()` being None (via `tracker_id=None`).
+        merged = merge_chunk_tracks(summaries)
+        self.assertEqual([(r['track_id'], r['first_frame'], r['last_frame'], r['class_id']) for r in merged],
+                         [(1, 10, 20, 6), (2, 30, 60, 0), (3, 55, 70, 0)])
+        self.assertEqual(merged[1]['class_votes'], {0: 21, 6: 10})
+        self.assertEqual(merged[1]['frames_seen'], 31)
+
+
+class TrackSummaryTest(SyntheticVideoTestCase):
+    def test_processing_stores_one_summary_per_vehicle(self):
+        video, _, counts = self._process()
+        tracks = list(TrackSummary.objects.filter(video=video))
+        self.assertEqual([track.vehicle_class for track in tracks], ['car', 'truck 2-axle'])
+        car, truck = tracks
+        self.assertLess(car.last_seen, truck.first_seen)
+        self.assertGreater(car.dwell_time, 1.5)
+        self.assertEqual(car.class_votes, {'car': car.frames_seen})
+        self.assertEqual(counts, {'car': 1, 'truck 2-axle': 1})
+
+
+class TrackStoreTest(TestCase):
+    def _update(self, store, frame_index, track_ids, class_ids, confidences=None):
+        import numpy as np
+        confidences = confidences if confidences is not None else [0.5] * len(track_ids)
+        store.update(frame_index, frame_index / 25.0, np.array(track_ids), np.array(class_ids),
+                     np.array(confidences, dtype=np.float32))
+
+    def test_majority_vote_counts_flickering_label_once(self):
+        store = TrackStore(len(YOLO_CLASS_NAMES))
+        for frame_index in range(1, 11):
+            # Track 5 is a van on 3 of 10 frames, track 9 appears later.
+            self._update(store, frame_index, [5], [1 if frame_index in (3, 4, 8) else 0], [frame_index / 10.0])
+        self._update(store, 11, [5, 9], [0, 6])
+        records = {record['track_id']: record for record in store.records()}
+        self.assertEqual(records[5]['class_id'], 0)
+        self.assertEqual(records[5]['class_votes'], {0: 8, 1: 3})
+        self.assertEqual((records[5]['first_frame'], records[5]['last_frame'], records[5]['frames_seen']), (1, 11, 11))
+        self.assertAlmostEqual(records[5]['max_confidence'], 1.0)
+        self.assertAlmostEqual(records[5]['last_seen'] - records[5]['first_seen'], 0.4)
+        self.assertEqual(records[9]['class_id'], 6)
+
+    def test_finished_tracks_are_handed_to_sink(self):
+        finished = []
+        store = TrackStore(len(YOLO_CLASS_NAMES), max_idle_frames=50, sink=finished.extend)
+        for frame_index in range(1, 2001):
+            # A new vehicle every 20 frames, each visible for 40 frames.
+            track_ids = [track_id for track_id in (frame_index // 20, frame_index // 20 - 1) if track_id > 0]
+            self._update(store, frame_index, track_ids, [0] * len(track_ids))
+            self.assertLess(len(store), 20)
+        remaining = store.pop()
+        self.assertEqual(len(store), 0)
+        self.assertEqual(sorted(r['track_id'] for r in finished + remaining), list(range(1, 101)))
+        self.assertTrue(all(r['frames_seen'] == 40 for r in finished))
+
+
+class ChunkedProcessingTest(SyntheticVideoTestCase):
+    def setUp(self):
+        super().setUp()
+        from traffic_project.celery import app as celery_app
+        self.celery_app = celery_app
+        self._always_eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+
+    def tearDown(self):
+        self.celery_app.conf.task_always_eager = self._always_eager
+        super().tearDown()
+
+    def test_chunked_run_matches_single_pass(self):
+        from unittest.mock import patch
+        from .tasks import process_video_task
+        single_video, _, single_counts = self._process(video_fields={'render_mode': VideoUpload.RENDER_COUNTS_ONLY})
+
+        video = VideoUpload.objects.create(video_file='videos/camera.mp4', render_mode=VideoUpload.RENDER_COUNTS_ONLY)
+        clear_model_cache()
+        with self.settings(VIDEO_CHUNK_OVERLAP_SECONDS=0.8), \
+                patch('traffic_monitor.model_registry.YOLO', side_effect=lambda *args, **kwargs: BlobTrackingModel()):
+            process_video_task(video.id, chunk_seconds=2)
+        video.refresh_from_db()
+
+        self.assertEqual(video.status, 'completed')
+        self.assertEqual(video.chunks.count(), 4)
+        self.assertTrue(all(chunk.status == 'completed' for chunk in video.chunks.all()))
+        self.assertEqual(video.frame_count, 160)
+        counts = dict(AggregatedData.objects.filter(video=video).values_list('vehicle_class', 'count'))
+        self.assertEqual(counts, single_counts)
+        self.assertEqual(DetectionResult.objects.filter(video=video).count(),
+                         DetectionResult.objects.filter(video=single_video).count())
+        bucket_rows = lambda v: sorted(DetectionBucket.objects.filter(video=v).values_list(
+            'resolution_seconds', 'bucket_index', 'vehicle_class', 'count'))
+        self.assertEqual(bucket_rows(video), bucket_rows(single_video))
+        track_rows = lambda v: list(TrackSummary.objects.filter(video=v).values_list('vehicle_class', 'first_frame', 'last_frame'))
+        self.assertEqual(track_rows(video), track_rows(single_video))
+        # Every chunk adds its core frames to the same progress row.
+        self.assertEqual((video.progress.frames_done, video.progress.total_frames), (160, 160))
+        # The per-chunk archives are joined, with the merged video-wide track IDs
+        from .detection_archive import load_detections
+        archived = load_detections(video.detection_archive.path, columns=['frame', 'track_id'])
+        expected = load_detections(single_video.detection_archive.path, columns=['frame', 'track_id'])
+        self.assertEqual(archived['frame'].tolist(), expected['frame'].tolist())
+        self.assertEqual(set(archived['track_id'].tolist()), set(TrackSummary.objects.filter(video=video).values_list('track_id', flat=True)))
+        self.assertFalse([name for name in os.listdir(os.path.dirname(video.detection_archive.path)) if '_part' in name])
+
+
+class ModelRegistryTest(TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp_dir = tempfile.mkdtemp()
+        self.loads = []
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _weights(self, name):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'weights')
+        return path
+
+    def _loader(self, path):
+        self.loads.append(path)
+        model = MagicMock()
+        model.predictor.trackers = [MagicMock()]
+        return model
+
+    def test_models_are_loaded_once_and_tracking_is_reset(self):
+        registry = ModelRegistry(2, loader=self._loader)
+        path = self._weights('best.pt')
+        model, stats = registry.get(path)
+        self.assertFalse(stats['cache_hit'])
+        again, stats = registry.get(path)
+        self.assertIs(again, model)
+        self.assertTrue(stats['cache_hit'])
+        self.assertEqual(len(self.loads), 1)
+        model.predictor.trackers[0].reset.assert_called_once_with()
+        self.assertEqual((registry.hits, registry.misses), (1, 1))
+
+    def test_changed_weights_are_reloaded(self):
+        registry = ModelRegistry(2, loader=self._loader)
+        path = self._weights('best.pt')
+        old_model, _ = registry.get(path)
+        os.utime(path, (0, 0))
+        new_model, stats = registry.get(path)
+        self.assertIsNot(new_model, old_model)
+        self.assertFalse(stats['cache_hit'])
+        self.assertEqual(len(registry), 1)
+
+    def test_least_recently_used_model_is_evicted(self):
+        registry = ModelRegistry(2, loader=self._loader)
+        v1, v2, v3 = self._weights('v1.pt'), self._weights('v2.pt'), self._weights('v3.pt')
+        registry.get(v1)
+        registry.get(v2)
+        registry.get(v1)
+        registry.get(v3)
+        self.assertIn(v1, registry)
+        self.assertNotIn(v2, registry)
+        self.assertIn(v3, registry)
+
+    def test_up_to_date_export_is_loaded_instead_of_the_weights(self):
+        from .inference_backend import resolve_model_path
+        registry = ModelRegistry(2, loader=self._loader, resolve=lambda path: resolve_model_path(path, 'onnx'))
+        weights = self._weights('best.pt')
+        _, stats = registry.get(weights)
+        self.assertEqual(stats['loaded_path'], weights)  # Not exported yet
+
+        exported = self._weights('best.onnx')
+        os.utime(exported, (os.path.getmtime(weights) + 10,) * 2)
+        _, stats = registry.get(weights)
+        self.assertFalse(stats['cache_hit'])
+        self.assertEqual(self.loads, [weights, exported])
+
+        os.utime(weights, (os.path.getmtime(exported) + 10,) * 2)  # New weights: the export is stale
+        _, stats = registry.get(weights)
+        self.assertEqual(stats['loaded_path'], weights)
+
+    def test_int8_export_keeps_the_fp32_export(self):
+        from .inference_backend import export_model
+        weights = self._weights('best.pt')
+
+        class ExportingModel:
+            def export(self, format, quantize=None, **options):
+                path = os.path.join(os.path.dirname(weights), 'best.onnx')  # ultralytics' name for both
+                with open(path, 'w') as f:
+                    f.write('int8' if quantize == 8 else 'fp32')
+                return path
+
+        self.assertEqual(export_model(ExportingModel(), weights, 'onnx'), os.path.join(self.tmp_dir, 'best.onnx'))
+        int8_path = export_model(ExportingModel(), weights, 'onnx', int8=True, calibration_data='calibration.yaml')
+        self.assertEqual(int8_path, os.path.join(self.tmp_dir, 'best_int8.onnx'))
+        with open(int8_path) as f:
+            self.assertEqual(f.read(), 'int8')
+        with open(os.path.join(self.tmp_dir, 'best.onnx')) as f:
+            self.assertEqual(f.read(), 'fp32')
+
+    def test_detections_are_compared_by_class_and_iou(self):
+        import numpy as np
+        from .inference_backend import compare_detections, summarize_parity
+        reference = (np.array([[0, 0, 10, 10], [20, 20, 40, 40], [50, 50, 60, 60]], dtype=float),
+                     np.array([0, 2, 0]), np.array([0.9, 0.8, 0.4]))
+        candidate = (np.array([[21, 20, 41, 40], [0, 0, 10, 11], [50, 50, 60, 60]], dtype=float),
+                     np.array([2, 0, 6]), np.array([0.75, 0.9, 0.4]))
+        comparison = compare_detections(reference, candidate)
+        self.assertEqual(comparison['matched'], 2)  # The third box changed class
+        self.assertAlmostEqual(comparison['max_confidence_difference'], 0.05)
+        parity = summarize_parity([comparison, compare_detections(reference, reference)])
+        self.assertAlmostEqual(parity['recall'], 5 / 6)
+        self.assertAlmostEqual(parity['precision'], 5 / 6)
+
+
+class TimeBucketTest(SyntheticVideoTestCase):
+    def test_accumulator_sums_counts_per_bucket(self):
+        buckets = TimeBucketAccumulator()
+        for timestamp, vehicle_class, count in [(0.2, 'car', 1), (0.9, 'car', 2), (1.0, 'car', 1), (12.5, 'van', 3)]:
+            buckets.add(timestamp, vehicle_class, count)
+        self.assertEqual(buckets.counts[(1, 0, 'car')], 3)
+        self.assertEqual(buckets.counts[(1, 1, 'car')], 1)
+        self.assertEqual(buckets.counts[(10, 0, 'car')], 4)
+        self.assertEqual(buckets.counts[(10, 1, 'van')], 3)
+        self.assertEqual(buckets.counts[(60, 0, 'van')], 3)
+
+    def test_timeline_api_reads_buckets_at_requested_resolution(self):
+        video, _, _ = self._process()
+        total = sum(DetectionResult.objects.filter(video=video).values_list('count', flat=True))
+        # Car from 0.4 s to 2.4 s, truck from 3.6 s to 6 s: one row per class and second.
+        self.assertEqual(DetectionBucket.objects.filter(video=video, resolution_seconds=1).count(), 6)
+
+        data = self.client.get(reverse('api_chart_data'), {'resolution': 1}).json()['timeline_chart']
+        self.assertEqual(data['labels'], ['0s', '1s', '2s', '3s', '4s', '5s'])
+        self.assertEqual(data['data'][-1], total)
+
+        data = self.client.get(reverse('api_chart_data'), {'resolution': 10}).json()['timeline_chart']
+        self.assertEqual(data, {'labels': ['0s'], 'data': [total]})
+
+
+class ChartDataCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.video = VideoUpload.objects.create(video_file='videos/cached.mp4', status='completed', processed_at=timezone.now())
+        AggregatedData.objects.create(video=self.video, time_period_start=self.video.uploaded_at, vehicle_class='car', count=3)
+        DetectionBucket.objects.create(video=self.video, resolution_seconds=1, bucket_index=0, vehicle_class='car', count=5)
+        self.url = reverse('api_chart_data')
+
+    def test_response_is_cached_and_revalidated(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+
+        # Served from the cache: the stored rows are no longer read.
+        AggregatedData.objects.filter(video=self.video).update(count=99)
+        self.assertEqual(self.client.get(self.url).json(), first.json())
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_completed_video_invalidates_cache(self):
+        from .chart_cache import invalidate_chart_data
+        first = self.client.get(self.url)
+        invalidate_chart_data()
+        AggregatedData.objects.filter(video=self.video).update(count=7)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.json()['distribution_chart']['data'], [7.0])
+
+
+class StreamVideoRangeTest(TestCase):
+    def setUp(self):
+        import tempfile
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = self.settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        os.makedirs(os.path.join(self.media_root, 'processed_videos'))
+        self.content = bytes(range(256)) * 40
+        with open(os.path.join(self.media_root, 'processed_videos', 'clip.mp4'), 'wb') as f:
+            f.write(self.content)
+        video = VideoUpload.objects.create(video_file='videos/clip.mp4', status='completed',
+                                           processed_video_file='processed_videos/clip.mp4')
+        self.url = reverse('stream_video', args=[video.id])
+
+    def tearDown(self):
+        import shutil
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_full_file_advertises_ranges(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_byte_ranges_return_partial_content(self):
+        size = len(self.content)
+        for range_header, first, last in [('bytes=100-199', 100, 199), ('bytes=10000-', 10000, size - 1),
+                                          ('bytes=-50', size - 50, size - 1), ('bytes=9000-99999', 9000, size - 1)]:
+            response = self.client.get(self.url, HTTP_RANGE=range_header)
+            self.assertEqual(response.status_code, 206, range_header)
+            self.assertEqual(response['Content-Range'], f'bytes {first}-{last}/{size}')
+            self.assertEqual(response['Content-Length'], str(last - first + 1))
+            self.assertEqual(b''.join(response.streaming_content), self.content[first:last + 1])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_x_accel_redirect(self):
+        with self.settings(VIDEO_X_ACCEL_REDIRECT_PREFIX='/protected-media/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/processed_videos/clip.mp4')
+
+
+class FaststartTest(TestCase):
+    def test_moov_is_moved_before_mdat_without_changing_frames(self):
+        import shutil
+        import tempfile
+        import cv2
+        import numpy as np
+        from .mp4_faststart import faststart, needs_faststart
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        original, moved = os.path.join(tmp_dir, 'original.mp4'), os.path.join(tmp_dir, 'moved.mp4')
+        writer = cv2.VideoWriter(original, cv2.VideoWriter_fourcc(*'mp4v'), 25, (64, 48))
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            writer.write(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+        writer.release()
+        shutil.copy(original, moved)
+
+        self.assertTrue(needs_faststart(original))
+        self.assertTrue(faststart(moved))
+        self.assertFalse(needs_faststart(moved))
+        self.assertFalse(faststart(moved))
+        self.assertEqual(os.path.getsize(moved), os.path.getsize(original))
+
+        def read_frames(path):
+            cap, frames = cv2.VideoCapture(path), []
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    return frames
+                frames.append(frame)
+
+        original_frames, moved_frames = read_frames(original), read_frames(moved)
+        self.assertEqual(len(moved_frames), 20)
+        for a, b in zip(original_frames, moved_frames):
+            self.assertTrue((a == b).all())
+
+
+class CountingEngineTest(TestCase):
+    def test_segment_crossings_report_direction(self):
+        import numpy as np
+        from .counting import segment_crossings
+        line_a, line_b = np.array([[0.0, 50.0]]), np.array([[100.0, 50.0]])  # Drawn left to right
+        starts = np.array([[10, 40], [20, 60], [30, 40], [150, 40], [40, 40], [40, 50]], dtype=float)
+        ends = np.array([[10, 60], [20, 40], [35, 45], [150, 60], [40, 50], [40, 60]], dtype=float)
+        crossings = segment_crossings(starts, ends, line_a, line_b)[:, 0].tolist()
+        # Down = 'in', up = 'out', no crossing, past the end of the line, ending on it, leaving it.
+        self.assertEqual(crossings, [1, -1, 0, 0, 1, 0])
+
+    def test_zone_counts_entries_but_not_vehicles_already_inside(self):
+        import numpy as np
+        from .counting import CountingEngine
+        zone = CountingRegion(id=1, kind=CountingRegion.KIND_ZONE, points=[[0.5, 0], [1, 0], [1, 1], [0.5, 1]])
+        engine = CountingEngine([zone], (100, 100))
+        boxes = lambda *xs: np.array([[x - 5, 45, x + 5, 55] for x in xs], dtype=float)
+        engine.update(1, 0.0, np.array([1, 2]), boxes(30, 80))  # Track 2 is parked inside the zone
+        engine.update(2, 0.1, np.array([1, 2]), boxes(60, 80))
+        engine.update(3, 0.2, np.array([1, 2]), boxes(40, 80))
+        engine.update(4, 0.3, np.array([1, 2]), boxes(70, 80))
+        self.assertEqual([event[:3] for event in engine.events], [(1, 1, 'in'), (1, 1, 'out')])
+
+
+class CountingRegionProcessingTest(SyntheticVideoTestCase):
+    def test_line_and_zone_counts_per_direction_and_period(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+        camera = Camera.objects.create(name='Test camera', count_period_seconds=4)
+        line = CountingRegion.objects.create(camera=camera, name='Middle', points=[[0.5, 1.0], [0.5, 0.0]])
+        zone = CountingRegion.objects.create(camera=camera, name='Right half', kind=CountingRegion.KIND_ZONE,
+                                             points=[[0.6, 0.0], [1.0, 0.0], [1.0, 1.0], [0.6, 1.0]])
+        recorded_at = datetime(2026, 5, 4, 8, 0, tzinfo=dt_timezone.utc)
+        video, _, _ = self._process(video_fields={'camera': camera, 'recorded_at': recorded_at})
+
+        rows = set(AggregatedData.objects.filter(video=video, region__isnull=False).values_list(
+            'region', 'direction', 'time_period_start', 'vehicle_class', 'count'))
+        second_period = recorded_at + timedelta(seconds=4)
+        self.assertEqual(rows, {
+            (line.id, 'in', recorded_at, 'car', 1),  # The car crosses the middle at ~1.4 s
+            (zone.id, 'in', recorded_at, 'car', 1),
+            (line.id, 'in', second_period, 'truck 2-axle', 1),  # The truck at ~4.8 s
+            (zone.id, 'in', second_period, 'truck 2-axle', 1),
+        })
+        # Whole-video unique counts are still stored, without a region.
+        self.assertEqual(AggregatedData.objects.filter(video=video, region__isnull=True).count(), 2)
+
+        distribution = self.client.get(reverse('api_chart_data')).json()['distribution_chart']
+        self.assertEqual(dict(zip(distribution['labels'], distribution['data'])), {'car': 2.0, 'truck 2-axle': 2.0})
+
+
+class StreamReaderTest(SyntheticVideoTestCase):
+    def test_slow_consumer_drops_old_frames_and_keeps_latency_bounded(self):
+        import time
+        path = os.path.join(self.media_root, 'videos', 'camera.mp4')
+        reader = StreamReader(path, buffer_frames=2, max_reconnects=0,
+                              opener=lambda source: ReplayCapture(source, speed=4))  # 100 fps
+        reader.start()
+        received, latencies = [], []
+        while not reader.finished:
+            decoded = reader.get(timeout=1.0)
+            if decoded is not None:
+                latencies.append(time.time() - decoded.timestamp)
+                received.append(decoded.index)
+                time.sleep(0.03)  # A model at ~33 fps
+        reader.join()
+
+        self.assertEqual(reader.frames_read, 160)
+        self.assertGreater(reader.frames_dropped, 50)
+        self.assertEqual(len(received) + reader.frames_dropped, 160)
+        self.assertEqual(received, sorted(received))
+        # Never more than the two buffered frames behind the stream.
+        self.assertLess(max(latencies), 0.03 * 2 + 0.05)
+
+    def test_reconnects_with_exponential_backoff(self):
+        def refuse(source):
+            raise IOError("connection refused")
+        attempts = iter([refuse, lambda source: FakeCapture(0), lambda source: FakeCapture(3),
+                         lambda source: FakeCapture(0), refuse, lambda source: FakeCapture(0)])
+        delays = []
+        reader = StreamReader('rtsp://camera/stream', max_reconnects=3, reconnect_initial_seconds=1,
+                              reconnect_max_seconds=3, opener=lambda source: next(attempts)(source), sleep=delays.append)
+        reader.start()
+        reader.join(timeout=5)
+
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(reader.frames_read, 3)
+        # Doubling while the stream is down, back to the initial delay after frames arrived.
+        self.assertEqual(delays, [1, 2, 1, 2, 3])
+        self.assertEqual(reader.reconnects, 5)
+        self.assertEqual([reader.get(timeout=0).image for _ in range(2)], ['frame-2', 'frame-3'])
+
+    def test_unreleased_pooled_frames_are_freed(self):
+        caps = []
+        def open_pooled(source):
+            caps.append(PooledCapture(200))
+            return caps[-1]
+        reader = StreamReader('rtsp://camera/stream', buffer_frames=2, max_reconnects=0, opener=open_pooled)
+        reader.start()
+        received = 0
+        while not reader.finished:
+            decoded = reader.get(timeout=1.0)
+            if decoded is not None:
+                received += 1
+                self.assertTrue((decoded.image == decoded.index).all())
+        reader.join()
+        del decoded
+        # Live streams never release frames: the pool must not keep them alive
+        self.assertEqual(reader.frames_read, 200)
+        self.assertGreater(received, 0)
+        self.assertEqual(caps[0].buffer_pool.allocated, 200)
+        self.assertEqual(caps[0].buffer_pool.in_use, 0)
+
+
+class LiveAggregatorTest(TestCase):
+    def _frame(self, index, timestamp):
+        import numpy as np
+        from .video_pipeline import DecodedFrame
+        return DecodedFrame(index, timestamp, np.zeros((100, 100, 3), dtype=np.uint8))
+
+    def test_tracks_are_counted_once_idle_and_added_to_existing_periods(self):
+        import numpy as np
+        from datetime import datetime, timezone as dt_timezone
+        stream = LiveStream.objects.create(name='Gate', source='rtsp://gate')
+        aggregator = LiveAggregator(stream, YOLO_CLASS_NAMES, period_seconds=60, track_idle_seconds=5)
+        minute = datetime(2026, 5, 4, 8, 0, tzinfo=dt_timezone.utc).timestamp()
+        box = np.array([[10, 10, 20, 20]], dtype=np.float32)
+        aggregator.update(self._frame(1, minute + 10), np.array([1]), np.array([0]), np.array([0.9]), box)
+        aggregator.update(self._frame(2, minute + 20), np.array([2]), np.array([0]), np.array([0.9]), box)
+
+        self.assertEqual(aggregator.flush(now=minute + 22), 1)  # Track 2 may still be on screen
+        self.assertEqual(aggregator.flush(), 1)
+        rows = list(StreamAggregate.objects.filter(stream=stream).values_list('time_period_start', 'vehicle_class', 'count'))
+        self.assertEqual(rows, [(datetime(2026, 5, 4, 8, 0, tzinfo=dt_timezone.utc), 'car', 2)])
+
+
+class LiveStreamIngestionTest(SyntheticVideoTestCase):
+    def test_replayed_stream_is_counted_per_period(self):
+        from unittest.mock import patch
+        camera = Camera.objects.create(name='Live camera')
+        line = CountingRegion.objects.create(camera=camera, name='Middle', points=[[0.5, 1.0], [0.5, 0.0]])
+        stream = LiveStream.objects.create(name='Replay', source=os.path.join(self.media_root, 'videos', 'camera.mp4'),
+                                           camera=camera)
+        clear_model_cache()
+        with self.settings(LIVE_STREAM_BUFFER_FRAMES=8, LIVE_STREAM_FLUSH_SECONDS=0.2, LIVE_STREAM_TRACK_IDLE_SECONDS=0.3), \
+                patch('traffic_monitor.model_registry.YOLO', return_value=BlobTrackingModel()):
+            process_live_stream(stream.id, 'best.pt', YOLO_CLASS_NAMES, max_reconnects=0,
+                                opener=lambda source: ReplayCapture(source, speed=4))
+
+        stream.refresh_from_db()
+        self.assertEqual(stream.status, 'stopped')
+        self.assertEqual(stream.frames_processed + stream.frames_dropped, 160)
+        totals = {}
+        for vehicle_class, region_id, direction, count in StreamAggregate.objects.filter(stream=stream).values_list(
+                'vehicle_class', 'region', 'direction', 'count'):
+            key = (vehicle_class, region_id, direction)
+            totals[key] = totals.get(key, 0) + count  # The replay may straddle a minute boundary
+        self.assertEqual(totals, {
+            ('car', None, ''): 1, ('truck 2-axle', None, ''): 1,
+            ('car', line.id, 'in'): 1, ('truck 2-axle', line.id, 'in'): 1,
+        })
+
+
+class WorkerKilled(BaseException):
+    """Stands in for the worker process dying: the processor's error handling does not catch it."""
+
+
+class DyingBlobTrackingModel(BlobTrackingModel):
+    def __init__(self, die_at_call):
+        super().__init__()
+        self.die_at_call = die_at_call
+    def track(self, image, **kwargs):
+        if self.calls + 1 == self.die_at_call:
+            raise WorkerKilled()
+        return super().track(image, **kwargs)
+
+
+class ResumableProcessingTest(SyntheticVideoTestCase):
+    def setUp(self):
+        super().setUp()
+        RecordingVideoWriter.instances = []
+        self.settings_checkpoints = self.settings(VIDEO_CHECKPOINT_INTERVAL_FRAMES=40, VIDEO_CHECKPOINT_OVERLAP_FRAMES=10)
+        self.settings_checkpoints.enable()
+        camera = Camera.objects.create(name='Resume camera', count_period_seconds=4)
+        CountingRegion.objects.create(camera=camera, name='Middle', points=[[0.5, 1.0], [0.5, 0.0]])
+        self.video_fields = {'camera': camera, 'recorded_at': timezone.now()}
+
+    def tearDown(self):
+        self.settings_checkpoints.disable()
+        super().tearDown()
+
+    def _results(self, video):
+        return {
+            'detections': list(DetectionResult.objects.filter(video=video).order_by('timestamp_in_video', 'vehicle_class')
+                               .values_list('timestamp_in_video', 'vehicle_class', 'count')),
+            'buckets': list(DetectionBucket.objects.filter(video=video).values_list('resolution_seconds', 'bucket_index', 'vehicle_class', 'count')),
+            'tracks': sorted(TrackSummary.objects.filter(video=video).values_list('vehicle_class', 'first_frame', 'last_frame', 'frames_seen')),
+            # Whole-video rows are stamped with the processing time, region rows with recorded_at + period.
+            'counts': [(region, direction, vehicle_class, start if region else None, count)
+                       for region, direction, vehicle_class, start, count in
+                       AggregatedData.objects.filter(video=video).order_by('region', 'direction', 'vehicle_class', 'time_period_start')
+                       .values_list('region', 'direction', 'vehicle_class', 'time_period_start', 'count')],
+        }
+
+    def test_run_killed_midway_resumes_to_the_same_results(self):
+        from unittest.mock import patch
+        full_video, _, _ = self._process(video_fields=self.video_fields)
+        expected = self._results(full_video)
+        self.assertFalse(ProcessingCheckpoint.objects.exists())
+
+        video = VideoUpload.objects.create(video_file='videos/camera.mp4', **self.video_fields)
+        RecordingVideoWriter.instances = []
+        clear_model_cache()
+        # Dies on frame 131, with the truck on screen and about to cross the line.
+        with patch('traffic_monitor.model_registry.YOLO', return_value=DyingBlobTrackingModel(131)), \
+                patch('traffic_monitor.yolo_processor.cv2.VideoWriter', RecordingVideoWriter):
+            with self.assertRaises(WorkerKilled):
+                process_video_with_yolo(video.id, 'best.pt', YOLO_CLASS_NAMES)
+        video.refresh_from_db()
+        self.assertEqual(video.status, 'processing')
+        self.assertEqual(video.checkpoint.frame_number, 120)
+        # Rows of frames after the checkpoint were written too; the retry must not duplicate them.
+        self.assertTrue(DetectionResult.objects.filter(video=video, timestamp_in_video__gt=video.checkpoint.timestamp_in_video).exists())
+        segment_frames = [len(writer.frames) for writer in RecordingVideoWriter.instances]
+        self.assertEqual(segment_frames[:3], [40, 40, 40])  # The fourth one was cut off by the crash
+
+        RecordingVideoWriter.instances = []
+        clear_model_cache()
+        model = BlobTrackingModel()
+        with patch('traffic_monitor.model_registry.YOLO', return_value=model), \
+                patch('traffic_monitor.yolo_processor.cv2.VideoWriter', RecordingVideoWriter):
+            process_video_with_yolo(video.id, 'best.pt', YOLO_CLASS_NAMES)
+        video.refresh_from_db()
+
+        self.assertEqual(video.status, 'completed')
+        self.assertEqual(model.calls, 160 - 110)  # Seeks to the checkpoint, minus the warm-up overlap
+        self.assertEqual(self._results(video), expected)
+        self.assertEqual(video.frame_count, 160)
+        # The archive keeps the rows up to the checkpoint and drops the ones after it the crash left behind
+        from .detection_archive import load_detections
+        archived, expected_archive = load_detections(video.detection_archive.path), load_detections(full_video.detection_archive.path)
+        for column in ('frame', 'track_id', 'class_id'):
+            self.assertEqual(archived[column].tolist(), expected_archive[column].tolist())
+        self.assertFalse(ProcessingCheckpoint.objects.filter(video=video).exists())
+        # The last segment is rewritten; the three finished before the crash are kept.
+        self.assertEqual([(os.path.basename(writer.path), len(writer.frames)) for writer in RecordingVideoWriter.instances],
+                         [('camera_annotated_part003.mp4', 40)])
+
+
+    def test_resume_with_run_length_storage(self):
+        from unittest.mock import patch
+        from .detection_writer import detection_timeline
+        fields = dict(self.video_fields, render_mode=VideoUpload.RENDER_COUNTS_ONLY)
+        with self.settings(DETECTION_STORAGE='runs'):
+            full_video, _, _ = self._process(video_fields=fields)
+            video = VideoUpload.objects.create(video_file='videos/camera.mp4', **fields)
+            clear_model_cache()
+            with patch('traffic_monitor.model_registry.YOLO', return_value=DyingBlobTrackingModel(131)):
+                with self.assertRaises(WorkerKilled):
+                    process_video_with_yolo(video.id, 'best.pt', YOLO_CLASS_NAMES)
+            clear_model_cache()
+            with patch('traffic_monitor.model_registry.YOLO', return_value=BlobTrackingModel()):
+                process_video_with_yolo(video.id, 'best.pt', YOLO_CLASS_NAMES)
+        self.assertFalse(DetectionResult.objects.exists())
+        self.assertEqual(detection_timeline(video), detection_timeline(full_video))
+
+class ProgressReportingTest(SyntheticVideoTestCase):
+    def test_reporter_writes_throttled_increments(self):
+        from .progress import ProgressReporter, start_progress
+        video = VideoUpload.objects.create(video_file='videos/camera.mp4', status='processing')
+        start_progress(video, total_frames=100)
+        clock = FakeClock()
+        reporter = ProgressReporter(video.id, update_seconds=2.0, clock=clock)
+        with self.assertNumQueries(0):
+            for _ in range(30):
+                clock.now += 0.05
+                reporter.frame_done()
+        clock.now += 0.5
+        with self.assertNumQueries(1):
+            reporter.frame_done()  # 2 s since the last update
+        with reporter.timer.measure('infer'):
+            pass
+
+        progress = ProcessingProgress.objects.get(video=video)
+        self.assertEqual(progress.frames_done, 31)
+        self.assertAlmostEqual(progress.current_fps, 15.5)
+        reporter.flush()
+        self.assertGreater(ProcessingProgress.objects.get(video=video).infer_seconds, 0)
+
+    def test_processing_reports_frames_and_stage_times_through_the_api(self):
+        video, _, _ = self._process()
+        self.assertEqual((video.progress.frames_done, video.progress.total_frames), (160, 160))
+
+        data = self.client.get(reverse('api_video_progress', args=[video.id])).json()
+        self.assertEqual(data['status'], 'completed')
+        self.assertEqual(data['percent'], 100.0)
+        self.assertIsNone(data['eta_seconds'])
+        self.assertEqual(set(data['stage_seconds']), {'decode', 'infer', 'track', 'plot', 'encode', 'db'})
+        self.assertGreater(data['stage_seconds']['infer'], 0)
+        self.assertGreater(data['stage_seconds']['decode'], 0)
+
+        pending = VideoUpload.objects.create(video_file='videos/camera.mp4')
+        pending_data = self.client.get(reverse('api_video_progress', args=[pending.id])).json()
+        self.assertEqual(pending_data['status'], 'pending')
+        self.assertNotIn('frames_done', pending_data)
+        self.assertContains(self.client.get(reverse('main_dashboard')),
+                            reverse('api_video_progress', args=[pending.id]))
+
+
+class PipelineBenchmarkTest(SyntheticVideoTestCase):
+    def test_instrumentation_keeps_every_measurement(self):
+        from .instrumentation import Instrumentation
+        instrumentation = Instrumentation()
+        for seconds in (0.010, 0.020, 0.030):
+            instrumentation.add('infer', seconds)
+        summary = instrumentation.summary(frames=3)
+        self.assertEqual(summary['infer']['calls'], 3)
+        self.assertAlmostEqual(summary['infer']['ms_per_frame'], 20.0)
+        self.assertAlmostEqual(summary['infer']['p50_ms'], 20.0)
+        self.assertEqual(summary['plot']['calls'], 0)
+        self.assertIsNone(summary['plot']['p95_ms'])
+        self.assertAlmostEqual(instrumentation.take()['infer'], 0.06)
+        self.assertEqual(instrumentation.summary(frames=3)['infer']['calls'], 3)  # take() only resets the totals
+
+    def test_command_writes_report_and_flags_regressions(self):
+        import json
+        import tempfile
+        from unittest.mock import patch
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(__import__('shutil').rmtree, output_dir, True)
+        model_path = os.path.join(output_dir, 'weights.pt')
+        open(model_path, 'wb').close()
+        report_path = os.path.join(output_dir, 'report.json')
+        options = {'video': os.path.join(self.media_root, 'videos', 'camera.mp4'), 'model': model_path,
+                   'runs': 2, 'warmup_runs': 0, 'stdout': __import__('io').StringIO()}
+        from django.core.cache import cache
+        from .chart_cache import _GENERATION_KEY
+        cache.set(_GENERATION_KEY, 5, None)
+        clear_model_cache()
+        with patch('traffic_monitor.model_registry.YOLO', return_value=BlobTrackingModel()):
+            call_command('benchmark_pipeline', output=report_path, profile=True, **options)
+            # Runs on a scratch database and chart cache: the site's are left alone.
+            self.assertEqual(cache.get(_GENERATION_KEY), 5)
+            self.assertEqual(VideoUpload.objects.filter(status='completed').count(), 0)
+            with open(report_path) as f:
+                report = json.load(f)
+            self.assertEqual([run['frames'] for run in report['runs']], [160, 160])
+            self.assertGreater(report['summary']['fps'], 0)
+            self.assertGreater(report['runs'][0]['stages']['infer']['calls'], 0)
+            self.assertGreater(report['runs'][0]['stages']['decode']['p95_ms'], 0)
+            self.assertTrue(os.path.exists(report['profile']['profile_path']))
+            self.assertGreater(report['profile']['peak_memory_bytes'], 0)
+            self.assertTrue(report['profile']['top_functions'])
+            self.assertFalse(VideoUpload.objects.exists())
+
+            report['summary']['fps'] *= 10
+            baseline_path = os.path.join(output_dir, 'baseline.json')
+            with open(baseline_path, 'w') as f:
+                json.dump(report, f)
+            with self.assertRaisesMessage(CommandError, 'fps'):
+                call_command('benchmark_pipeline', output=os.path.join(output_dir, 'new.json'),
+                             baseline=baseline_path, fail_on_regression=True, **options)
+        with open(os.path.join(output_dir, 'new.json')) as f:
+            comparison = json.load(f)['comparison']
+        self.assertIn('fps', comparison['regressions'])
+        self.assertLess(comparison['changes']['fps']['change'], -0.5)
+
+
+class RecordingBlobTrackingModel(BlobTrackingModel):
+    """BlobTrackingModel that remembers the image shapes and options it was called with."""
+    def __init__(self):
+        super().__init__()
+        self.shapes = set()
+        self.options = []
+    def track(self, image, **kwargs):
+        self.shapes.add(image.shape[:2])
+        self.options.append(kwargs)
+        return super().track(image, **kwargs)
+
+
+class RegionOfInterestTest(SyntheticVideoTestCase):
+    TRUCK_LANE = [[0.25, 0.5], [1.0, 0.5], [1.0, 0.85], [0.25, 0.85]]  # 80..320 x 120..204 px
+
+    def _decoded_frames(self):
+        import cv2
+        from .video_pipeline import DecodedFrame
+        cap = cv2.VideoCapture(os.path.join(self.media_root, 'videos', 'camera.mp4'))
+        frames = []
+        while True:
+            ret, image = cap.read()
+            if not ret:
+                break
+            frames.append(DecodedFrame(len(frames) + 1, len(frames) / 25, image))
+        cap.release()
+        return frames
+
+    def test_cropper_blanks_outside_the_polygon(self):
+        import numpy as np
+        from .roi import FILL_VALUE, RoiCropper, make_roi_cropper
+        cropper = RoiCropper([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0]], (100, 50))  # Upper-left triangle
+        crop = cropper.crop(np.zeros((50, 100, 3), dtype=np.uint8))
+        self.assertEqual(crop.shape, (50, 100, 3))
+        self.assertEqual(crop[45, 95].tolist(), [FILL_VALUE] * 3)
+        self.assertEqual(crop[2, 2].tolist(), [0, 0, 0])
+        whole_frame = Camera(name='Whole', roi_points=[[0, 0], [1, 0], [1, 1], [0, 1]])
+        self.assertIsNone(make_roi_cropper(whole_frame, (100, 50)))
+        self.assertAlmostEqual(RoiCropper(self.TRUCK_LANE, (320, 240)).pixel_fraction, 0.75 * 84 / 240)
+
+    def test_boxes_are_mapped_back_to_the_full_frame(self):
+        from .roi import RoiCropper
+        frames = self._decoded_frames()
+        cropper = RoiCropper(self.TRUCK_LANE, (320, 240))
+        full = {frame.index: result for frame, result in _track_frames(BlobTrackingModel(), frames)}
+        model = RecordingBlobTrackingModel()
+        cropped = {frame.index: result for frame, result in _track_frames(model, frames, roi=cropper, imgsz=960)}
+
+        self.assertEqual(model.shapes, {(84, 240)})
+        self.assertEqual(model.options[0]['imgsz'], 960)
+        self.assertEqual(len(cropped[40].boxes), 0)  # The car's lane is outside the ROI
+        self.assertEqual(cropped[131].orig_img.shape, (240, 320, 3))
+        self.assertEqual(cropped[131].boxes.xyxy.tolist(), full[131].boxes.xyxy[-1:].tolist())
+
+    def test_processing_counts_only_vehicles_inside_the_roi(self):
+        from unittest.mock import patch
+        camera = Camera.objects.create(name='Truck lane', roi_points=self.TRUCK_LANE, inference_imgsz=960)
+        line = CountingRegion.objects.create(camera=camera, name='Middle', points=[[0.5, 1.0], [0.5, 0.0]])
+        video = VideoUpload.objects.create(video_file='videos/camera.mp4', camera=camera)
+        clear_model_cache()
+        model = RecordingBlobTrackingModel()
+        with patch('traffic_monitor.model_registry.YOLO', return_value=model):
+            process_video_with_yolo(video.id, 'best.pt', YOLO_CLASS_NAMES)
+
+        self.assertEqual(model.shapes, {(84, 240)})
+        self.assertEqual(set(AggregatedData.objects.filter(video=video, region__isnull=True).values_list('vehicle_class', 'count')),
+                         {('truck 2-axle', 1)})
+        self.assertEqual(list(AggregatedData.objects.filter(video=video, region=line).values_list('direction', 'vehicle_class')),
+                         [('in', 'truck 2-axle')])
+
+
+class FrameSourceTest(SyntheticVideoTestCase):
+    def test_buffers_are_reused_only_once_released(self):
+        from .frame_sources import FrameBufferPool
+        pool = FrameBufferPool(max_buffers=1)
+        first = pool.get((4, 4, 3))
+        second = pool.get((4, 4, 3))
+        self.assertIsNot(first, second)
+        del second  # Dropping a buffer does not return it
+        pool.release(first[1:3])  # Neither does releasing a view of it
+        self.assertEqual(pool.allocated, 2)
+        pool.get((4, 4, 3))
+        self.assertEqual(pool.allocated, 3)
+        self.assertEqual(pool.in_use, 1)  # The dropped buffers were freed, not kept by the pool
+        pool.release(first)
+        pool.release(first)  # A second release must not hand it out twice
+        self.assertEqual(pool.in_use, 0)
+        self.assertIs(pool.get((2, 2, 3)).base, None)  # Other shapes get their own buffer
+        self.assertIs(pool.get((4, 4, 3)), first)
+        self.assertIsNot(pool.get((4, 4, 3)), first)
+        self.assertEqual(pool.allocated, 5)
+
+    def test_pyav_backend_falls_back_to_opencv(self):
+        import sys
+        import cv2
+        from unittest.mock import patch
+        from .frame_sources import open_video_capture
+        path = os.path.join(self.media_root, 'videos', 'camera.mp4')
+        with patch.dict(sys.modules, {'av': None}):  # As if PyAV were not installed
+            cap = open_video_capture(path, backend='pyav')
+        self.assertIsInstance(cap, cv2.VideoCapture)
+        self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 160)
+        cap.release()
+        with self.assertRaises(ValueError):
+            open_video_capture(path, backend='gstreamer')
+
+        with patch.dict(sys.modules, {'av': None}), self.settings(VIDEO_DECODE_BACKEND='pyav'):
+            _, _, counts = self._process()
+        self.assertEqual(counts, {'car': 1, 'truck 2-axle': 1})
+
+    def test_pyav_capture_matches_opencv(self):
+        import importlib.util
+        import cv2
+        import numpy as np
+        from .frame_sources import PyAVCapture
+        if importlib.util.find_spec('av') is None:
+            self.skipTest("PyAV is not installed")
+        path = os.path.join(self.media_root, 'videos', 'camera.mp4')
+        reference, cap = cv2.VideoCapture(path), PyAVCapture(path, threads=2)
+        self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 160)
+        reference.set(cv2.CAP_PROP_POS_FRAMES, 100)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 100)
+        for _ in range(5):
+            (_, expected), (ret, image) = reference.read(), cap.read()
+            self.assertTrue(ret)
+            self.assertLess(np.abs(expected.astype(int) - image.astype(int)).mean(), 2.0)
+        self.assertEqual(cap.get(cv2.CAP_PROP_POS_FRAMES), 105)
+        reference.release()
+        cap.release()
+        self.assertEqual(PyAVCapture(path, scale=0.5).read()[1].shape, (120, 160, 3))
+
+
+class LazyImportTest(TestCase):
+    def test_web_process_does_not_load_the_inference_stack(self):
+        # A fresh interpreter: this test process has loaded torch and cv2 long ago.
+        import subprocess
+        import sys
+        from django.conf import settings
+        script = (
+            "import django, sys; django.setup(); "
+            "import traffic_project.urls, traffic_monitor.views, traffic_monitor.tasks, traffic_monitor.admin; "
+            "print([name for name in ('torch', 'ultralytics', 'cv2') if name in sys.modules])"
+        )
+        output = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                                env=dict(os.environ, DJANGO_SETTINGS_MODULE='traffic_project.settings'))
+        self.assertEqual(output.returncode, 0, output.stderr)
+        self.assertEqual(output.stdout.strip().splitlines()[-1], '[]',
+                         "The web process imports the inference stack; import it inside the worker code instead.")
+
+
+class QueryIndexTest(TestCase):
+    def test_dashboard_and_processing_queries_use_the_indexes(self):
+        from django.db.models import Sum
+        video = VideoUpload.objects.create(video_file='videos/indexed.mp4', status='completed', processed_at=timezone.now())
+        DetectionResult.objects.bulk_create([DetectionResult(video=video, timestamp_in_video=i / 25, vehicle_class='car', count=1)
+                                             for i in range(100)])
+        plans = {
+            'video_status_processed_idx': VideoUpload.objects.filter(status='completed').order_by('-processed_at')[:1],
+            'detection_video_time_idx': DetectionResult.objects.filter(video=video, timestamp_in_video__gt=2.0),
+            'detection_video_class_idx': DetectionResult.objects.filter(video=video).values('vehicle_class')
+                                                            .annotate(total=Sum('count')).order_by('vehicle_class'),
+        }
+        for index_name, queryset in plans.items():
+            self.assertIn(index_name, queryset.explain())
+
+
+class DetectionRunStorageTest(SyntheticVideoTestCase):
+    def test_writer_ends_runs_when_counts_change(self):
+        from .detection_writer import RunLengthDetectionWriter
+        from .models import DetectionRun
+        video = VideoUpload.objects.create(video_file='videos/camera.mp4')
+        frames = [{'car': 1}, {'car': 1, 'van': 1}, {'car': 2, 'van': 1}, {'van': 1}, {}, {'van': 1}]
+        with RunLengthDetectionWriter(batch_size=100, flush_interval=None) as writer:
+            for index, frame_detections in enumerate(frames[:4]):
+                writer.add_frame(video, index * 0.04, frame_detections)
+            writer.checkpoint()  # Splits the van's run
+            for index, frame_detections in enumerate(frames[4:], start=4):
+                writer.add_frame(video, index * 0.04, frame_detections)
+        self.assertEqual(
+            sorted(DetectionRun.objects.values_list('vehicle_class', 'count', 'frame_count', 'start_time')),
+            [('car', 1, 2, 0.0), ('car', 2, 1, 0.08), ('van', 1, 1, 0.2), ('van', 1, 3, 0.04)],
+        )
+
+    def test_runs_expand_to_the_per_frame_timeline(self):
+        from .detection_writer import detection_timeline
+        from .models import DetectionRun
+        frames_video, _, frames_counts = self._process()
+        with self.settings(DETECTION_STORAGE='runs'):
+            runs_video, _, runs_counts = self._process()
+
+        self.assertEqual(runs_counts, frames_counts)
+        self.assertFalse(DetectionResult.objects.filter(video=runs_video).exists())
+        expected, timeline = detection_timeline(frames_video), detection_timeline(runs_video)
+        self.assertEqual(len(timeline), len(expected))
+        for (timestamp, vehicle_class, count), (expected_timestamp, expected_class, expected_count) in zip(timeline, expected):
+            self.assertAlmostEqual(timestamp, expected_timestamp, places=6)
+            self.assertEqual((vehicle_class, count), (expected_class, expected_count))
+        buckets = DetectionBucket.objects.order_by('resolution_seconds', 'bucket_index', 'vehicle_class')
+        self.assertEqual(list(buckets.filter(video=runs_video).values_list('resolution_seconds', 'bucket_index', 'vehicle_class', 'count')),
+                         list(buckets.filter(video=frames_video).values_list('resolution_seconds', 'bucket_index', 'vehicle_class', 'count')))
+        # One vehicle at a time on screen: a few runs instead of a row per frame
+        self.assertLess(DetectionRun.objects.filter(video=runs_video).count() * 10, len(expected))
+
+
+class DetectionArchiveTest(SyntheticVideoTestCase):
+    def _frames(self, frames):
+        import numpy as np
+        return [(frame, frame / 25, np.array([0, 6]), np.array([frame, frame + 100]), np.array([0.9, 0.8]),
+                 np.array([[frame, 0, frame + 10, 10], [0, frame, 10, frame + 10]])) for frame in frames]
+
+    def test_chunks_round_trip_and_resume_keeps_rows_up_to_the_checkpoint(self):
+        from .detection_archive import DetectionArchiveWriter, load_detections
+        path = os.path.join(self.media_root, 'detections', 'archive.npz')
+        with DetectionArchiveWriter(path, chunk_rows=5) as writer:
+            for frame in self._frames(range(1, 11)):
+                writer.add(*frame)
+            writer.add(11, 0.44, [], None, [], [])  # Frames without boxes add no rows
+        self.assertEqual(writer.rows_written, 20)
+        data = load_detections(path)
+        self.assertEqual(data['frame'].tolist(), [frame for frame in range(1, 11) for _ in range(2)])
+        self.assertEqual(data['x1'][:4].tolist(), [1.0, 0.0, 2.0, 0.0])
+        self.assertEqual(set(load_detections(path, columns=['class_id', 'confidence'])), {'class_id', 'confidence'})
+
+        with DetectionArchiveWriter(path, chunk_rows=5, keep_through_frame=6) as writer:
+            for frame in self._frames(range(7, 9)):
+                writer.add(*frame)
+        self.assertEqual(load_detections(path, columns=['frame'])['frame'].tolist(),
+                         [frame for frame in range(1, 9) for _ in range(2)])
+        with self.assertRaises(ValueError):
+            load_detections(path, columns=['frame', 'speed'])
+
+    def test_processing_archives_every_tracked_box(self):
+        import numpy as np
+        from .detection_archive import load_detections
+        video, _, _ = self._process()
+        self.assertTrue(video.detection_archive.name.endswith('.npz'))
+        data = load_detections(video.detection_archive.path)
+
+        # The per-frame class counts the DetectionResult rows hold, recomputed from the archive
+        keys, counts = np.unique(np.stack([data['frame'], data['class_id']], axis=1), axis=0, return_counts=True)
+        timestamps = dict(zip(data['frame'].tolist(), data['timestamp'].tolist()))
+        self.assertEqual(sorted((round(timestamps[frame], 6), YOLO_CLASS_NAMES[class_id], count)
+                                for (frame, class_id), count in zip(keys.tolist(), counts.tolist())),
+                         sorted((round(timestamp, 6), vehicle_class, count) for timestamp, vehicle_class, count in
+                                DetectionResult.objects.filter(video=video).values_list('timestamp_in_video', 'vehicle_class', 'count')))
+        self.assertEqual(set(data['track_id'].tolist()), set(TrackSummary.objects.filter(video=video).values_list('track_id', flat=True)))
+
+    def test_archiving_can_be_turned_off(self):
+        with self.settings(DETECTION_ARCHIVE_FORMAT=None):
+            video, _, _ = self._process()
+        self.assertFalse(video.detection_archive)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'detections')))
+
+
+class RecountTest(SyntheticVideoTestCase):
+    def setUp(self):
+        super().setUp()
+        camera = Camera.objects.create(name='Recount camera', count_period_seconds=4)
+        CountingRegion.objects.create(camera=camera, name='Middle', points=[[0.5, 1.0], [0.5, 0.0]])
+        self.video_fields = {'camera': camera, 'recorded_at': timezone.now(), 'render_mode': VideoUpload.RENDER_COUNTS_ONLY}
+
+    def _results(self, video):
+        return {
+            'detections': list(DetectionResult.objects.filter(video=video).order_by('timestamp_in_video', 'vehicle_class')
+                               .values_list('timestamp_in_video', 'vehicle_class', 'count')),
+            'buckets': sorted(DetectionBucket.objects.filter(video=video).values_list('resolution_seconds', 'bucket_index', 'vehicle_class', 'count')),
+            'tracks': sorted(TrackSummary.objects.filter(video=video).values_list('track_id', 'vehicle_class', 'first_frame', 'last_frame', 'frames_seen')),
+            'counts': sorted(AggregatedData.objects.filter(video=video).values_list('region', 'direction', 'vehicle_class', 'time_period_start', 'count'),
+                             key=str),
+        }
+
+    def test_recount_rebuilds_the_same_results_without_inference(self):
+        from unittest.mock import patch
+        from .yolo_processor import recount_video
+        video, _, _ = self._process(video_fields=self.video_fields)
+        expected = self._results(video)
+        self.assertTrue(AggregatedData.objects.filter(video=video, region__isnull=False).exists())
+
+        with patch('traffic_monitor.model_registry.YOLO') as yolo:
+            boxes = recount_video(video.id, YOLO_CLASS_NAMES)
+        yolo.assert_not_called()
+        self.assertEqual(boxes, sum(count for _, _, count in expected['detections']))
+        self.assertEqual(self._results(video), expected)
+
+    def test_recount_changes_the_chart_etag(self):
+        from unittest.mock import patch
+        from django.core.cache import cache
+        from .yolo_processor import recount_video
+        cache.clear()
+        video, _, _ = self._process(video_fields=self.video_fields)
+        first = self.client.get(reverse('api_chart_data'))
+
+        # The web process's cache is not invalidated by a recount in a worker.
+        with patch('traffic_monitor.yolo_processor.invalidate_chart_data'):
+            recount_video(video.id, {**YOLO_CLASS_NAMES, 6: 'car'})
+        response = self.client.get(reverse('api_chart_data'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.json()['distribution_chart']['labels'], ['car'])
+
+    def test_recount_applies_a_new_class_mapping_and_confidence_threshold(self):
+        from .yolo_processor import recount_video
+        video, _, counts = self._process(video_fields=self.video_fields)
+        self.assertEqual(set(counts), {'car', 'truck 2-axle'})
+
+        recount_video(video.id, {**YOLO_CLASS_NAMES, 6: 'car'})
+        counts = dict(AggregatedData.objects.filter(video=video, region__isnull=True).values_list('vehicle_class', 'count'))
+        self.assertEqual(list(counts), ['car'])
+        self.assertEqual(set(TrackSummary.objects.filter(video=video).values_list('vehicle_class', flat=True)), {'car'})
+        self.assertEqual(set(DetectionBucket.objects.filter(video=video).values_list('vehicle_class', flat=True)), {'car'})
+
+        recount_video(video.id, YOLO_CLASS_NAMES, min_confidence=0.95)  # BlobTrackingModel scores every box 0.9
+        self.assertFalse(DetectionResult.objects.filter(video=video).exists())
+        self.assertFalse(AggregatedData.objects.filter(video=video).exists())
+
+    def test_recount_task_can_rerun_tracking(self):
+        from .tasks import recount_video_task
+        video, _, counts = self._process(video_fields=self.video_fields)
+        region_counts = sorted(AggregatedData.objects.filter(video=video, region__isnull=False).values_list('direction', 'vehicle_class', 'count'))
+
+        # ByteTrack with looser matching, so it keeps the truck as its box shrinks at the frame edge
+        tracker_config = os.path.join(self.media_root, 'tuned_bytetrack.yaml')
+        with open(tracker_config, 'w') as f:
+            f.write("tracker_type: bytetrack\ntrack_high_thresh: 0.25\ntrack_low_thresh: 0.1\nnew_track_thresh: 0.25\n"
+                    "track_buffer: 30\nmatch_thresh: 0.99\nfuse_score: True\n")
+        recount_video_task(video.id, retrack=True, tracker_config=tracker_config)
+        self.assertEqual(dict(AggregatedData.objects.filter(video=video, region__isnull=True).values_list('vehicle_class', 'count')), counts)
+        self.assertEqual(sorted(AggregatedData.objects.filter(video=video, region__isnull=False).values_list('direction', 'vehicle_class', 'count')),
+                         region_counts)
+
+    def test_recount_without_archive_fails_and_keeps_the_results(self):
+        from .tasks import recount_video_task
+        with self.settings(DETECTION_ARCHIVE_FORMAT=None):
+            video, _, counts = self._process(video_fields=self.video_fields)
+        with self.assertRaises(Exception):
+            recount_video_task(video.id)
+        self.assertEqual(dict(AggregatedData.objects.filter(video=video, region__isnull=True).values_list('vehicle_class', 'count')), counts)
+
+    def test_admin_actions_queue_recounts_for_archived_videos(self):
+        from unittest.mock import patch
+        from django.contrib.auth.models import User
+        archived = VideoUpload.objects.create(video_file='videos/camera.mp4', detection_archive='detections/camera_1_detections.npz')
+        not_archived = VideoUpload.objects.create(video_file='videos/camera.mp4')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        with patch('traffic_monitor.admin.recount_video_task') as task:
+            response = self.client.post(reverse('admin:traffic_monitor_videoupload_changelist'), {
+                'action': 'retrack_and_recount_from_detections', '_selected_action': [archived.id, not_archived.id],
+            }, follow=True)
+        task.delay.assert_called_once_with(archived.id, retrack=True)
+        self.assertContains(response, '1 video(s) have no detection archive')
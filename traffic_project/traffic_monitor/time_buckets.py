@@ -0,0 +1,80 @@
+import math
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import DetectionBucket
+
+# Bucket sizes, in seconds, written for every processed video.
+TIMELINE_RESOLUTIONS = (1, 10, 60)
+# Defaults used when the settings module does not override them.
+DEFAULT_TIMELINE_RESOLUTION = 1
+
+
+class TimeBucketAccumulator:
+    """
+    Sums per-frame detection counts into DetectionBucket rows while a video is
+    processed. Memory grows with video length / 1 s, not with the frame count.
+    """
+
+    def __init__(self, resolutions=TIMELINE_RESOLUTIONS):
+        self.resolutions = resolutions
+        self.counts = {}  # (resolution_seconds, bucket_index, vehicle_class) -> count
+
+    def add(self, timestamp_in_video, vehicle_class, count):
+        for resolution in self.resolutions:
+            key = (resolution, int(math.floor(timestamp_in_video / resolution)), vehicle_class)
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def rows(self):
+        """JSON-serialisable [resolution_seconds, bucket_index, vehicle_class, count] rows."""
+        return [[resolution, bucket_index, vehicle_class, count]
+                for (resolution, bucket_index, vehicle_class), count in self.counts.items()]
+
+    def update(self, rows):
+        """Adds rows() of another accumulator, e.g. one per video chunk."""
+        for resolution, bucket_index, vehicle_class, count in rows:
+            key = (resolution, bucket_index, vehicle_class)
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def save(self, video):
+        """Replaces the video's buckets with the accumulated ones."""
+        with transaction.atomic():
+            DetectionBucket.objects.filter(video=video).delete()
+            DetectionBucket.objects.bulk_create([
+                DetectionBucket(video=video, resolution_seconds=resolution, bucket_index=bucket_index,
+                                vehicle_class=vehicle_class, count=count)
+                for (resolution, bucket_index, vehicle_class), count in sorted(self.counts.items())
+            ], batch_size=1000)
+
+
+def parse_resolution(value, default=None):
+    """Resolution requested by a view (`?resolution=10`), falling back to `default`."""
+    if default is None:
+        from django.conf import settings
+        default = getattr(settings, 'TIMELINE_DEFAULT_RESOLUTION', DEFAULT_TIMELINE_RESOLUTION)
+    try:
+        resolution = int(value)
+    except (TypeError, ValueError):
+        return default
+    return resolution if resolution in TIMELINE_RESOLUTIONS else default
+
+
+def bucket_totals(video, resolution):
+    """[(bucket_start_seconds, total_count)] over all classes, in time order."""
+    totals = DetectionBucket.objects.filter(video=video, resolution_seconds=resolution) \
+                                    .values('bucket_index') \
+                                    .annotate(total=Sum('count')) \
+                                    .order_by('bucket_index')
+    return [(item['bucket_index'] * resolution, item['total']) for item in totals]
+
+
+def cumulative_timeline(video, resolution):
+    """Labels and running totals for the "Traffic Over Time" chart."""
+    labels, data = [], []
+    running_total = 0
+    for bucket_start, total in bucket_totals(video, resolution):
+        running_total += total
+        labels.append(f"{bucket_start}s")
+        data.append(running_total)
+    return labels, data
@@ -0,0 +1,161 @@
+import numpy as np
+
+# Defaults used when the settings module does not override them.
+DEFAULT_TRACK_STORE_MAX_IDLE_FRAMES = 750
+# Finished tracks are looked for every this many frames.
+EVICT_INTERVAL_FRAMES = 250
+_INITIAL_CAPACITY = 256
+
+
+def majority_class(class_votes):
+    """Class id with the most votes; ties go to the lower class id."""
+    return min(class_votes, key=lambda class_id: (-class_votes[class_id], class_id))
+
+
+def combine_track_records(records):
+    """
+    Merges records of the same vehicle (e.g. one per video chunk) into one:
+    frame/time ranges are widened, votes and frame counts summed.
+    """
+    class_votes = {}
+    for record in records:
+        for class_id, votes in record['class_votes'].items():
+            class_votes[int(class_id)] = class_votes.get(int(class_id), 0) + votes
+    first = min(records, key=lambda record: record['first_frame'])
+    last = max(records, key=lambda record: record['last_frame'])
+    return {
+        'track_id': first['track_id'],
+        'first_frame': first['first_frame'],
+        'last_frame': last['last_frame'],
+        'first_seen': first['first_seen'],
+        'last_seen': last['last_seen'],
+        'frames_seen': sum(record['frames_seen'] for record in records),
+        'max_confidence': max(record['max_confidence'] for record in records),
+        'class_votes': class_votes,
+        'class_id': majority_class(class_votes),
+    }
+
+
+class TrackStore:
+    """
+    Per-track table kept in NumPy columns, one row per tracker ID: first/last
+    frame and timestamp, frames seen, max confidence and a class-vote histogram.
+    The final class of a track is the majority vote, so a label that flickers
+    between classes on a few frames still counts the vehicle once.
+
+    Memory grows with the number of tracks alive, not with the video length:
+    with `sink` set, tracks not seen for `max_idle_frames` are removed from the
+    table and handed to `sink(records)` (e.g. to be saved) every
+    EVICT_INTERVAL_FRAMES frames.
+    """
+
+    def __init__(self, num_classes, max_idle_frames=DEFAULT_TRACK_STORE_MAX_IDLE_FRAMES, sink=None):
+        self.num_classes = num_classes
+        self.max_idle_frames = max_idle_frames
+        self.sink = sink
+        self.size = 0
+        self._rows = {}  # track_id -> row
+        self._next_evict_frame = EVICT_INTERVAL_FRAMES
+        self._allocate(_INITIAL_CAPACITY)
+
+    def _allocate(self, capacity):
+        def grow(column, shape, dtype):
+            new = np.zeros(shape, dtype=dtype)
+            if column is not None:
+                new[:self.size] = column[:self.size]
+            return new
+        get = lambda name: getattr(self, name, None)
+        self.track_ids = grow(get('track_ids'), capacity, np.int64)
+        self.first_frames = grow(get('first_frames'), capacity, np.int64)
+        self.last_frames = grow(get('last_frames'), capacity, np.int64)
+        self.first_seen = grow(get('first_seen'), capacity, np.float64)
+        self.last_seen = grow(get('last_seen'), capacity, np.float64)
+        self.frames_seen = grow(get('frames_seen'), capacity, np.int32)
+        self.max_confidence = grow(get('max_confidence'), capacity, np.float32)
+        self.class_votes = grow(get('class_votes'), (capacity, self.num_classes), np.int32)
+
+    def __len__(self):
+        return self.size
+
+    def update(self, frame_index, timestamp, track_ids, class_ids, confidences):
+        """Adds one frame's tracked boxes (NumPy arrays, one entry per box)."""
+        if len(track_ids):
+            rows = np.empty(len(track_ids), dtype=np.int64)
+            for i, track_id in enumerate(track_ids.tolist()):
+                row = self._rows.get(track_id)
+                if row is None:
+                    row = self._add_track(track_id, frame_index, timestamp)
+                rows[i] = row
+            self.last_frames[rows] = frame_index
+            self.last_seen[rows] = timestamp
+            np.add.at(self.frames_seen, rows, 1)
+            np.maximum.at(self.max_confidence, rows, confidences)
+            valid = (class_ids >= 0) & (class_ids < self.num_classes)
+            np.add.at(self.class_votes, (rows[valid], class_ids[valid]), 1)
+
+        if self.sink is not None and frame_index >= self._next_evict_frame:
+            self._next_evict_frame = frame_index + EVICT_INTERVAL_FRAMES
+            finished = self.pop(self.last_frames[:self.size] < frame_index - self.max_idle_frames)
+            if finished:
+                self.sink(finished)
+
+    def _add_track(self, track_id, frame_index, timestamp):
+        if self.size == len(self.track_ids):
+            self._allocate(2 * len(self.track_ids))
+        row = self.size
+        self.size += 1
+        self._rows[track_id] = row
+        self.track_ids[row] = track_id
+        self.first_frames[row] = frame_index
+        self.first_seen[row] = timestamp
+        self.frames_seen[row] = 0
+        self.max_confidence[row] = 0
+        self.class_votes[row] = 0
+        return row
+
+    def load(self, records):
+        """Adds records() of another table, e.g. the open tracks saved in a checkpoint."""
+        for record in records:
+            row = self._add_track(record['track_id'], record['first_frame'], record['first_seen'])
+            self.last_frames[row] = record['last_frame']
+            self.last_seen[row] = record['last_seen']
+            self.frames_seen[row] = record['frames_seen']
+            self.max_confidence[row] = record['max_confidence']
+            for class_id, votes in record['class_votes'].items():
+                if 0 <= int(class_id) < self.num_classes:
+                    self.class_votes[row, int(class_id)] = votes
+
+    def records(self, mask=None):
+        """Rows as JSON-serialisable dicts (class_votes maps class id -> votes)."""
+        rows = np.arange(self.size) if mask is None else np.flatnonzero(mask)
+        records = []
+        for row in rows.tolist():
+            votes = self.class_votes[row]
+            class_votes = {class_id: int(votes[class_id]) for class_id in np.flatnonzero(votes).tolist()}
+            records.append({
+                'track_id': int(self.track_ids[row]),
+                'first_frame': int(self.first_frames[row]),
+                'last_frame': int(self.last_frames[row]),
+                'first_seen': float(self.first_seen[row]),
+                'last_seen': float(self.last_seen[row]),
+                'frames_seen': int(self.frames_seen[row]),
+                'max_confidence': float(self.max_confidence[row]),
+                'class_votes': class_votes,
+                'class_id': int(np.argmax(votes)),
+            })
+        return records
+
+    def pop(self, mask=None):
+        """Returns records() for the masked rows (all by default) and drops them from the table."""
+        records = self.records(mask)
+        keep = np.ones(self.size, dtype=bool) if mask is not None else np.zeros(self.size, dtype=bool)
+        if mask is not None:
+            keep[np.flatnonzero(mask)] = False
+        kept_rows = np.flatnonzero(keep)
+        for name in ('track_ids', 'first_frames', 'last_frames', 'first_seen', 'last_seen', 'frames_seen',
+                     'max_confidence', 'class_votes'):
+            column = getattr(self, name)
+            column[:len(kept_rows)] = column[kept_rows]
+        self.size = len(kept_rows)
+        self._rows = {int(track_id): row for row, track_id in enumerate(self.track_ids[:self.size].tolist())}
+        return records
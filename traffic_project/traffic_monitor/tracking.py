@@ -0,0 +1,62 @@
+import numpy as np
+import torch
+from ultralytics.engine.results import Boxes
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import YAML, IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+
+TRACKER_CONFIG = 'bytetrack.yaml'
+# model.track() lowers the detector confidence to this value so the tracker
+# also sees low-score boxes; batched detection has to do the same to match it.
+TRACKER_DETECTION_CONF = 0.1
+
+
+class FrameTracker:
+    """
+    Runs an Ultralytics tracker (ByteTrack by default) over detector results
+    one frame at a time.
+
+    `update()` applies the same post-processing as `model.track(persist=True)`
+    does for a single frame, so detections produced by a batched `model.predict`
+    call get the same track IDs as the frame-by-frame path.
+    """
+
+    def __init__(self, tracker_config=TRACKER_CONFIG):
+        cfg = IterableSimpleNamespace(**YAML.load(check_yaml(tracker_config)))
+        if cfg.tracker_type not in TRACKER_MAP:
+            raise ValueError(f"Unsupported tracker_type '{cfg.tracker_type}' in {tracker_config}")
+        self.tracker = TRACKER_MAP[cfg.tracker_type](args=cfg)
+
+    def update(self, yolo_results_frame):
+        """Returns the frame's results reduced to tracked boxes, with IDs attached."""
+        det = yolo_results_frame.boxes.cpu().numpy()
+        tracks = self.tracker.update(det, yolo_results_frame.orig_img)
+        if len(tracks) == 0:
+            # Mirrors Ultralytics: hide new, still unconfirmed tracks.
+            if any(not t.is_activated for t in self.tracker.tracked_stracks):
+                return yolo_results_frame[:0]
+            return yolo_results_frame
+        tracked = yolo_results_frame[tracks[:, -1].astype(int)]
+        tracked.update(boxes=torch.as_tensor(tracks[:, :-1], device=yolo_results_frame.boxes.data.device))
+        return tracked
+
+    def update_boxes(self, boxes, frame_size):
+        """
+        Tracks one frame of boxes that were detected earlier, e.g. read back from
+        a detection archive. `boxes` holds [x1, y1, x2, y2, confidence, class_id]
+        rows; returns [x1, y1, x2, y2, track_id, confidence, class_id] rows the
+        way update() reduces a frame, with track_id -1 on frames the tracker
+        leaves untracked. No image is passed on, so trackers that need the
+        frame (camera motion compensation, ReID) do not work here.
+        """
+        width, height = frame_size
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        tracks = self.tracker.update(Boxes(boxes, (height, width)), None)
+        if len(tracks) == 0:
+            if any(not t.is_activated for t in self.tracker.tracked_stracks):
+                return np.empty((0, 7), dtype=np.float32)
+            return np.insert(boxes, 4, -1, axis=1)
+        return tracks[:, :7].astype(np.float32)
+
+    def reset(self):
+        self.tracker.reset()
@@ -8,4 +8,5 @@ urlpatterns = [
     path('stream/<int:video_id>/', views.stream_video_view, name='stream_video'),
     path('video/<int:video_id>/', views.video_detail_view, name='video_detail'),
     path('api/chart-data/', views.ChartDataAPIView.as_view(), name='api_chart_data'),
+    path('api/videos/<int:video_id>/progress/', views.VideoProgressAPIView.as_view(), name='api_video_progress'),
 ]
@@ -0,0 +1,260 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+
+# One decoded frame: 1-based frame index, position in the video in seconds and the BGR image.
+DecodedFrame = namedtuple('DecodedFrame', ['index', 'timestamp', 'image'])
+
+# Defaults used when the settings module does not override them.
+DEFAULT_QUEUE_SIZE = 8
+
+_END_OF_STREAM = object()
+_POLL_SECONDS = 0.1
+
+
+class StageTimer:
+    """
+    Wall time spent per processing stage (decode, infer, track, plot, encode,
+    db), summed across the pipeline threads. take() returns the totals since
+    the previous call, for reporting progress in increments. Subclasses that
+    want every measurement (see instrumentation.py) override add().
+    """
+    STAGES = ('decode', 'infer', 'track', 'plot', 'encode', 'db')
+
+    def __init__(self):
+        self._seconds = dict.fromkeys(self.STAGES, 0.0)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._seconds[stage] += seconds
+
+    def take(self):
+        with self._lock:
+            seconds, self._seconds = self._seconds, dict.fromkeys(self.STAGES, 0.0)
+        return seconds
+
+
+def measure(timer, stage):
+    """timer.measure(stage), or a no-op context when there is no timer."""
+    return timer.measure(stage) if timer is not None else nullcontext()
+
+
+class _Stage(threading.Thread):
+    """
+    Worker thread connected to the rest of the pipeline through a bounded queue.
+    `stop()` makes blocked puts give up, so a failing consumer never leaves the
+    thread hanging on a full queue.
+    """
+
+    def __init__(self, name, maxsize):
+        super().__init__(name=name, daemon=True)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+class FrameDecoder(_Stage):
+    """
+    Reads frames from an opened cv2.VideoCapture ahead of the consumer.
+    With `start_frame` / `end_frame` only that (0-based, half-open) range is
+    read; frame indexes stay absolute positions in the video.
+    """
+
+    def __init__(self, cap, maxsize=DEFAULT_QUEUE_SIZE, start_frame=0, end_frame=None, timer=None):
+        super().__init__('frame-decoder', maxsize)
+        self.cap = cap
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.timer = timer
+
+    def run(self):
+        import cv2  # Not at module level: progress.py, and with it the web views, import StageTimer from here
+        frame_index = self.start_frame
+        try:
+            if self.start_frame:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+            while not self._stop_event.is_set():
+                if self.end_frame is not None and frame_index >= self.end_frame:
+                    break
+                with measure(self.timer, 'decode'):
+                    ret, frame = self.cap.read()
+                if not ret:
+                    break
+                frame_index += 1
+                timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                if not self._put(DecodedFrame(frame_index, timestamp, frame)):
+                    return
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(_END_OF_STREAM)
+
+    def __iter__(self):
+        """Yields DecodedFrame objects in decode order; re-raises decoder errors."""
+        while True:
+            item = self.queue.get()
+            if item is _END_OF_STREAM:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+
+class FrameEncoder(_Stage):
+    """
+    Renders and writes annotated frames in submission order.
+    `render(decoded_frame, result)` returns the image handed to `writer.write`;
+    `release(decoded_frame)` is called once a frame is written or dropped.
+    """
+
+    def __init__(self, writer, render, maxsize=DEFAULT_QUEUE_SIZE, timer=None, release=None):
+        super().__init__('frame-encoder', maxsize)
+        self.writer = writer
+        self.render = render
+        self.timer = timer
+        self.release = release
+        self.frames_written = 0
+        self._cancelled = False
+
+    def submit(self, decoded_frame, result):
+        if self.error is not None:
+            raise self.error
+        self._put((decoded_frame, result))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is _END_OF_STREAM:
+                return
+            decoded_frame, result = item
+            try:
+                if self.error is not None or self._cancelled:
+                    continue  # Keep draining so submit() never blocks after a failure.
+                with measure(self.timer, 'plot'):
+                    image = self.render(decoded_frame, result)
+                with measure(self.timer, 'encode'):
+                    self.writer.write(image)
+                self.frames_written += 1
+            except Exception as e:
+                self.error = e
+            finally:
+                if self.release is not None:
+                    self.release(decoded_frame)
+                self.queue.task_done()
+
+    def replace_writer(self, writer):
+        """
+        Waits until every submitted frame is written, then sends the following
+        frames to `writer`. Returns the previous writer, to be released.
+        """
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+        previous, self.writer = self.writer, writer
+        return previous
+
+    def close(self):
+        """Waits until every submitted frame is written and re-raises encoder errors."""
+        self._put(_END_OF_STREAM)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def cancel(self):
+        """Drops frames that are still queued and waits for the thread to exit."""
+        self._cancelled = True
+        self._put(_END_OF_STREAM)
+        self.join()
+
+
+class VideoPipeline:
+    """
+    Three-stage video pipeline: a decoder thread, inference in the calling thread
+    and an annotation/encoder thread, joined by bounded queues.
+
+    Inference stays on a single thread and sees frames strictly in decode order,
+    so tracker state evolves exactly as in a serial read/track/write loop:
+
+        with VideoPipeline(cap, out_writer, render) as pipeline:
+            for decoded in pipeline.frames():
+                results = model.track(decoded.image, persist=True)
+                pipeline.submit(decoded, results[0])
+
+    Leaving the block waits for the encoder to drain. On error both threads are
+    stopped and joined, so the caller can release `cap` and `out_writer` safely.
+
+    With `writer=None` no encoder thread is started and `submit()` only
+    releases the frame, for runs that only collect counts.
+
+    When `cap` decodes into a FrameBufferPool (its `buffer_pool`, see
+    frame_sources.py) every frame must go either to `submit()`, which hands it
+    to the encoder, or to `release()` once the caller is done with it, so its
+    buffer can be reused. Frames are only recycled after that, never while
+    still queued. With a StageTimer as `timer` the decoder
+    and encoder threads add their decode, plot and encode times to it.
+    """
+
+    def __init__(self, cap, writer, render, queue_size=DEFAULT_QUEUE_SIZE, start_frame=0, end_frame=None, timer=None):
+        self.decoder = FrameDecoder(cap, queue_size, start_frame, end_frame, timer)
+        self.buffer_pool = getattr(cap, 'buffer_pool', None)
+        self.encoder = FrameEncoder(writer, render, queue_size, timer, self.release) if writer is not None else None
+
+    def frames(self):
+        return iter(self.decoder)
+
+    def submit(self, decoded_frame, result):
+        if self.encoder is not None:
+            self.encoder.submit(decoded_frame, result)
+        else:
+            self.release(decoded_frame)
+
+    def release(self, decoded_frame):
+        """Gives the frame's buffer back to the capture's pool; the frame must not be used afterwards."""
+        if self.buffer_pool is not None:
+            self.buffer_pool.release(decoded_frame.image)
+
+    def replace_writer(self, writer):
+        """Switches the encoder to `writer` once the frames submitted so far are written; returns the old writer."""
+        return self.encoder.replace_writer(writer)
+
+    def __enter__(self):
+        self.decoder.start()
+        if self.encoder is not None:
+            self.encoder.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.decoder.stop()
+        try:
+            if self.encoder is None:
+                pass
+            elif exc_type is None:
+                self.encoder.close()
+            else:
+                self.encoder.cancel()
+        finally:
+            self.decoder.join()
+        return False
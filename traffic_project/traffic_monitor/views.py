@@ -1,11 +1,29 @@
+import os
+import re
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import StreamingHttpResponse, Http404
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse, Http404
 from .forms import VideoUploadForm
-from .models import VideoUpload, AggregatedData, DetectionResult
+from .models import VideoUpload, AggregatedData
 from .tasks import process_video_task
+from .time_buckets import cumulative_timeline, bucket_totals, parse_resolution
 from django.db.models import Sum, F, FloatField
 # from django.db.models.functions import Cast # Not used in the current implementation of graph_data_query
 
+def _vehicle_counts(video):
+    """
+    Vehicles per class for a video: line/zone crossings (all regions, directions
+    and periods) when the video's camera has counting regions, otherwise the
+    unique tracks of the whole video.
+    """
+    counts = AggregatedData.objects.filter(video=video)
+    if counts.filter(region__isnull=False).exists():
+        counts = counts.filter(region__isnull=False)
+    else:
+        counts = counts.filter(region__isnull=True)
+    per_class = counts.values('vehicle_class').annotate(total_count=Sum('count')).order_by('vehicle_class')
+    return [{'vehicle_class': item['vehicle_class'], 'count': item['total_count']} for item in per_class]
+
 def main_dashboard_view(request):
     latest_processed_video = VideoUpload.objects.filter(status='completed').order_by('-processed_at').first()
     overall_stats = {'total_vehicles': 0} # Default
@@ -13,12 +31,11 @@ def main_dashboard_view(request):
 
     if latest_processed_video:
         # Updated overall_stats to fetch unique car count
-        car_data = AggregatedData.objects.filter(video_id=latest_processed_video).aggregate(Sum('count'))['count__sum']
+        vehicle_breakdown = _vehicle_counts(latest_processed_video)
+        car_data = sum(item['count'] for item in vehicle_breakdown)
         if car_data:
             overall_stats['total_vehicles'] = car_data
 
-        vehicle_breakdown = AggregatedData.objects.filter(video=latest_processed_video).order_by('vehicle_class')
-
     # Initialize context with new timeline structure
     context = {
         'latest_video': latest_processed_video,
@@ -31,31 +48,22 @@ def main_dashboard_view(request):
     }
 
     if latest_processed_video and vehicle_breakdown:
-        context['distribution_labels'] = [item.vehicle_class for item in vehicle_breakdown]
-        context['distribution_data'] = [item.count for item in vehicle_breakdown]
+        context['distribution_labels'] = [item['vehicle_class'] for item in vehicle_breakdown]
+        context['distribution_data'] = [item['count'] for item in vehicle_breakdown]
 
-    # New "Traffic Over Time" chart data logic for the latest_processed_video
+    # "Traffic Over Time" chart: running total of detections, read from the
+    # pre-aggregated time buckets at the requested resolution (?resolution=1|10|60).
+    resolution = parse_resolution(request.GET.get('resolution'))
     new_timeline_labels = []
     new_timeline_data = []
     if latest_processed_video:
-        detections_over_time = DetectionResult.objects.filter(video=latest_processed_video).order_by('timestamp_in_video')
-
-        # Placeholder logic (cumulative sum of objects detected per timestamp):
-        # This is NOT "unique cumulative" but sums DetectionResult.count over time for the video.
-        temp_timeline_data = {} # timestamp: count_at_timestamp
-        for dr in detections_over_time:
-            ts = dr.timestamp_in_video
-            temp_timeline_data[ts] = temp_timeline_data.get(ts, 0) + dr.count # Sum counts if multiple classes at same ts
-
-        sorted_timestamps = sorted(temp_timeline_data.keys())
-        running_total = 0
-        for ts in sorted_timestamps:
-            running_total += temp_timeline_data[ts]
-            new_timeline_labels.append(f"{ts:.2f}s") # Format timestamp
-            new_timeline_data.append(running_total)
+        new_timeline_labels, new_timeline_data = cumulative_timeline(latest_processed_video, resolution)
 
     context['timeline_labels'] = new_timeline_labels
     context['timeline_data'] = new_timeline_data
+    context['timeline_resolution'] = resolution
+    # Jobs still running; the dashboard polls their progress from api_video_progress.
+    context['active_videos'] = VideoUpload.objects.filter(status__in=['pending', 'processing']).order_by('-uploaded_at')[:5]
     
     return render(request, 'traffic_monitor/index.html', context)
 
@@ -73,31 +81,83 @@ def upload_video_view(request):
         form = VideoUploadForm()
     return render(request, 'traffic_monitor/upload_video.html', {'form': form})
 
+# Defaults used when the settings module does not override them.
+DEFAULT_VIDEO_STREAM_CHUNK_SIZE = 1024 * 1024
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def _parse_range_header(range_header, file_size):
+    """
+    Returns the inclusive (first, last) byte positions of a single-range
+    `Range: bytes=...` header, or None when the whole file should be sent
+    (no header, a multi-range or otherwise unsupported header). Raises
+    ValueError for a range outside the file (416).
+    """
+    match = _RANGE_RE.match(range_header.strip()) if range_header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':  # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            raise ValueError(range_header)
+        return max(0, file_size - length), file_size - 1
+    first = int(first)
+    last = min(int(last), file_size - 1) if last else file_size - 1
+    if first >= file_size or last < first:
+        raise ValueError(range_header)
+    return first, last
+
+def _file_range_iterator(file_path, first, length, chunk_size):
+    with open(file_path, 'rb') as f:
+        f.seek(first)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
 def stream_video_view(request, video_id):
     video_upload = get_object_or_404(VideoUpload, id=video_id, status='completed')
+    if video_upload.render_mode == VideoUpload.RENDER_COUNTS_ONLY:
+        raise Http404("This video was processed in counts-only mode; no annotated video was rendered.")
     if not video_upload.processed_video_file:
         raise Http404("Processed video file not found.")
 
+    # Ensure the file path is correct and accessible
+    file_path = video_upload.processed_video_file.path
+    if not os.path.exists(file_path):
+        raise Http404("Processed video file not found on disk.")
+
+    # Behind nginx, hand the file over to the web server (sendfile, ranges, caching)
+    # via an internal location, e.g. VIDEO_X_ACCEL_REDIRECT_PREFIX = '/protected-media/'.
+    accel_prefix = getattr(settings, 'VIDEO_X_ACCEL_REDIRECT_PREFIX', None)
+    if accel_prefix:
+        response = HttpResponse(content_type='video/mp4')
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + video_upload.processed_video_file.name
+        return response
+
+    file_size = os.path.getsize(file_path)
     try:
-        # Ensure the file path is correct and accessible
-        file_path = video_upload.processed_video_file.path
-        
-        def file_iterator(file_path, chunk_size=8192):
-            with open(file_path, 'rb') as f:
-                while True:
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    yield chunk
-        
-        response = StreamingHttpResponse(file_iterator(file_path), content_type='video/mp4')
-        # response['Content-Disposition'] = f'inline; filename="{os.path.basename(file_path)}"' # Optional
+        byte_range = _parse_range_header(request.headers.get('Range'), file_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{file_size}'
         return response
-    except FileNotFoundError:
-        raise Http404("Processed video file not found on disk.")
-    except Exception as e:
-        # Log error e
-        raise Http404(f"Error streaming video: {e}")
+
+    if byte_range is None:
+        # FileResponse lets the WSGI server use sendfile (wsgi.file_wrapper) and sets Content-Length.
+        response = FileResponse(open(file_path, 'rb'), content_type='video/mp4')
+    else:
+        first, last = byte_range
+        chunk_size = getattr(settings, 'VIDEO_STREAM_CHUNK_SIZE', DEFAULT_VIDEO_STREAM_CHUNK_SIZE)
+        response = StreamingHttpResponse(_file_range_iterator(file_path, first, last - first + 1, chunk_size),
+                                         status=206, content_type='video/mp4')
+        response['Content-Range'] = f'bytes {first}-{last}/{file_size}'
+        response['Content-Length'] = str(last - first + 1)
+    response['Accept-Ranges'] = 'bytes'
+    # response['Content-Disposition'] = f'inline; filename="{os.path.basename(file_path)}"' # Optional
+    return response
 
 # The old main_view is now main_dashboard_view
 # def main_view(request):
@@ -107,7 +167,11 @@ def stream_video_view(request, video_id):
 # API Views
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .serializers import CombinedChartDataSerializer
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .serializers import CombinedChartDataSerializer, ProcessingProgressSerializer
+from .progress import progress_data
+from .chart_cache import chart_data_etag, chart_data_key, get_chart_data, set_chart_data
 # Note: Models VideoUpload, AggregatedData, and Sum are already imported at the top of the file.
 # from django.utils import timezone # Not strictly needed for current implementation
 # from datetime import timedelta # Not strictly needed for current implementation
@@ -117,14 +181,11 @@ def video_detail_view(request, video_id):
     video = get_object_or_404(VideoUpload, id=video_id, status='completed')
     unique_cars = video.unique_car_count # Assumes unique_car_count field exists and is populated
 
-    # Prepare data for the vehicle count over time graph
-    graph_data_query = DetectionResult.objects.filter(video=video) \
-                                           .values('timestamp_in_video') \
-                                           .annotate(total_vehicles=Sum('count')) \
-                                           .order_by('timestamp_in_video')
+    # Prepare data for the vehicle count over time graph: detections per time bucket.
+    graph_data = bucket_totals(video, parse_resolution(request.GET.get('resolution')))
 
-    timestamps = [item['timestamp_in_video'] for item in graph_data_query]
-    vehicle_counts = [item['total_vehicles'] for item in graph_data_query]
+    timestamps = [bucket_start for bucket_start, _ in graph_data]
+    vehicle_counts = [total for _, total in graph_data]
 
     context = {
         'video': video,
@@ -137,40 +198,59 @@ def video_detail_view(request, video_id):
 
 class ChartDataAPIView(APIView):
     def get(self, request, *args, **kwargs):
+        # A completed video's chart data never changes, so responses are cached per
+        # video/processed_at/resolution and revalidated with ETag / Last-Modified.
+        latest_video = VideoUpload.objects.filter(status='completed').order_by('-processed_at').only('id', 'processed_at').first()
+        resolution = parse_resolution(request.query_params.get('resolution'))
+        if latest_video is None or latest_video.processed_at is None:
+            return Response(self._chart_data(latest_video, resolution))
+
+        cache_key = chart_data_key(latest_video, resolution)
+        etag = chart_data_etag(cache_key)
+        last_modified = int(latest_video.processed_at.timestamp())  # HTTP dates have whole seconds.
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = get_chart_data(cache_key)
+        if data is None:
+            data = self._chart_data(latest_video, resolution)
+            set_chart_data(cache_key, data)
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'no-cache'  # Clients may store it but must revalidate.
+        return response
+
+    @staticmethod
+    def _chart_data(latest_video, resolution):
         distribution_labels = []
         distribution_data = []
-        # timeline_labels = [] # Will be new_api_timeline_labels
-        # timeline_data = [] # Will be new_api_timeline_data
 
-        latest_video = VideoUpload.objects.filter(status='completed').order_by('-processed_at').first()
         if latest_video:
             # Distribution chart logic (should be fine as AggregatedData now stores unique counts)
-            distribution_qs = AggregatedData.objects.filter(video=latest_video).values('vehicle_class').annotate(total_count=Sum('count')).order_by('vehicle_class')
-            for item in distribution_qs:
+            for item in _vehicle_counts(latest_video):
                 distribution_labels.append(item['vehicle_class'])
-                distribution_data.append(item['total_count'])
+                distribution_data.append(item['count'])
         
-        # New timeline chart logic for API, similar to main_dashboard_view
+        # Timeline chart from the pre-aggregated time buckets, same as main_dashboard_view.
         new_api_timeline_labels = []
         new_api_timeline_data = []
         if latest_video:
-            detections_over_time_api = DetectionResult.objects.filter(video=latest_video).order_by('timestamp_in_video')
-
-            temp_api_timeline_data = {} # timestamp: count_at_timestamp
-            for dr in detections_over_time_api:
-                ts = dr.timestamp_in_video
-                temp_api_timeline_data[ts] = temp_api_timeline_data.get(ts, 0) + dr.count # Sum counts
-
-            sorted_api_timestamps = sorted(temp_api_timeline_data.keys())
-            running_api_total = 0
-            for ts in sorted_api_timestamps:
-                running_api_total += temp_api_timeline_data[ts]
-                new_api_timeline_labels.append(f"{ts:.2f}s")
-                new_api_timeline_data.append(running_api_total)
+            new_api_timeline_labels, new_api_timeline_data = cumulative_timeline(latest_video, resolution)
 
         combined_data = {
             'distribution_chart': {'labels': distribution_labels, 'data': distribution_data},
             'timeline_chart': {'labels': new_api_timeline_labels, 'data': new_api_timeline_data}
         }
         serializer = CombinedChartDataSerializer(combined_data)
-        return Response(serializer.data)
+        return serializer.data
+
+
+class VideoProgressAPIView(APIView):
+    """Frames done, fps, ETA and per-stage times of a video's processing job."""
+    def get(self, request, video_id, *args, **kwargs):
+        video = get_object_or_404(VideoUpload.objects.only('id', 'status'), id=video_id)
+        response = Response(ProcessingProgressSerializer(progress_data(video)).data)
+        response['Cache-Control'] = 'no-store'  # Changes every few seconds while the job runs.
+        return response
@@ -1,9 +1,51 @@
+import copy
 import cv2
+import numpy as np
 import os
-from ultralytics import YOLO
+import time
 from django.conf import settings
 from django.utils import timezone
-from .models import DetectionResult, VideoUpload
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Q
+from .models import AggregatedData, DetectionResult, DetectionRun, LiveStream, ProcessingCheckpoint, TrackSummary, VideoChunk, VideoUpload
+from .detection_writer import make_detection_writer
+from .detection_archive import (
+    DetectionArchiveWriter,
+    archive_filename,
+    concatenate_archives,
+    load_detections,
+    DEFAULT_DETECTION_ARCHIVE_CHUNK_ROWS,
+    DEFAULT_DETECTION_ARCHIVE_FORMAT,
+)
+from .video_pipeline import VideoPipeline, DEFAULT_QUEUE_SIZE, measure
+from .tracking import FrameTracker, TRACKER_CONFIG, TRACKER_DETECTION_CONF
+from .frame_gating import FrameGate, DEFAULT_MOTION_MAX_SKIPPED_FRAMES
+from .annotation import FrameAnnotator, output_frame_size
+from .model_registry import get_model
+from .chart_cache import invalidate_chart_data
+from .mp4_faststart import FaststartError, faststart
+from .time_buckets import TimeBucketAccumulator
+from .track_store import TrackStore, DEFAULT_TRACK_STORE_MAX_IDLE_FRAMES
+from .counting import CountingEngine, DEFAULT_COUNTING_MAX_IDLE_FRAMES, period_counts
+from .roi import make_roi_cropper
+from .frame_sources import open_video_capture, DEFAULT_VIDEO_DECODE_BACKEND, DEFAULT_VIDEO_DECODE_THREADS
+from .chunking import ChunkTrackRecorder, merge_chunk_tracks, plan_chunks
+from .progress import ProgressReporter, start_progress, DEFAULT_PROGRESS_UPDATE_SECONDS
+from .checkpoints import CheckpointRecorder, DEFAULT_CHECKPOINT_INTERVAL_FRAMES, DEFAULT_CHECKPOINT_OVERLAP_FRAMES
+from .live_stream import (
+    LiveAggregator,
+    StreamReader,
+    DEFAULT_LIVE_STREAM_BUFFER_FRAMES,
+    DEFAULT_LIVE_STREAM_FLUSH_SECONDS,
+    DEFAULT_LIVE_STREAM_PERIOD_SECONDS,
+    DEFAULT_LIVE_STREAM_RECONNECT_INITIAL_SECONDS,
+    DEFAULT_LIVE_STREAM_RECONNECT_MAX_SECONDS,
+    DEFAULT_LIVE_STREAM_TRACK_IDLE_SECONDS,
+)
+
+# Defaults used when the settings module does not override them.
+DEFAULT_CHUNK_PROGRESS_INTERVAL_FRAMES = 250
 
 YOLO_CLASS_NAMES = {
     0: 'car', 1: 'van', 2: '3-axle bus', 3: '2-axle bus', 4: 'car 1-axle trailer',
@@ -13,125 +55,565 @@ YOLO_CLASS_NAMES = {
     16: '6-axle saddle truck', 17: 'trader', 18: 'trolleybus'
 }
 
+def _frame_arrays(yolo_results_frame):
+    """
+    Returns (class_ids, track_ids, confidences, xyxy) of a frame's boxes as NumPy
+    arrays, read from boxes.data with a single device-to-host copy. track_ids is
+    None when the tracker assigned no IDs on this frame.
+    """
+    boxes = yolo_results_frame.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.empty(0, dtype=np.int64), None, np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.float32)
+    data = boxes.data.cpu().numpy()  # [x1, y1, x2, y2, (track_id), conf, cls] per box
+    class_ids = data[:, -1].astype(np.int64)
+    confidences = data[:, -2]
+    track_ids = data[:, -3].astype(np.int64) if boxes.is_track else None
+    return class_ids, track_ids, confidences, data[:, :4]
+
+def _class_counts(class_ids):
+    """{class_id: box_count} for an array of class ids."""
+    if len(class_ids) == 0:
+        return {}
+    counts = np.bincount(class_ids)
+    return {class_id: int(counts[class_id]) for class_id in np.flatnonzero(counts).tolist()}
+
+def _frame_detections(class_ids, class_names_dict):
+    """{vehicle_class: count} of a frame's boxes; classes missing from class_names_dict are left out."""
+    frame_detections = {}
+    for class_id, count in _class_counts(class_ids).items():
+        vehicle_class_name = class_names_dict.get(class_id, "unknown") # Use .get for safety
+        if vehicle_class_name != "unknown":
+            frame_detections[vehicle_class_name] = frame_detections.get(vehicle_class_name, 0) + count
+    return frame_detections
+
+def _extract_frame_detections(yolo_results_frame):
+    """
+    Vectorized per-frame extraction. Returns ({class_id: box_count},
+    {class_id: set_of_tracker_ids}) for a single frame's YOLO results.
+    """
+    class_ids, track_ids, _, _ = _frame_arrays(yolo_results_frame)
+    class_counts = _class_counts(class_ids)
+
+    ids_by_class = {}
+    if track_ids is not None:
+        for class_id, track_id in np.unique(np.stack([class_ids, track_ids], axis=1), axis=0).tolist():
+            ids_by_class.setdefault(class_id, set()).add(track_id)
+    return class_counts, ids_by_class
+
 def _get_unique_ids_from_frame_results(yolo_results_frame):
     """
     Extracts unique tracker IDs from a single frame's YOLO results,
     grouped by class_id.
     Assumes yolo_results_frame is equivalent to results[0] from model.track().
     """
-    current_frame_ids_by_class = {}
-    if yolo_results_frame.boxes and hasattr(yolo_results_frame.boxes, 'id') and yolo_results_frame.boxes.id is not None:
-        for box in yolo_results_frame.boxes:
-            try:
-                if box.id is not None:  # Ensure the box has a tracker ID
-                    class_id = int(box.cls[0].item())
-                    tracker_id = box.id.item()
-
-                    current_frame_ids_by_class.setdefault(class_id, set()).add(tracker_id)
-            except Exception as e:
-                # Log error if a specific box causes issues, but continue processing
-                print(f"Error processing box for unique ID tracking in helper: {e}")
-    return current_frame_ids_by_class
-
-def process_video_with_yolo(video_upload_instance_id, model_path_str, class_names_dict):
+    return _extract_frame_detections(yolo_results_frame)[1]
+
+def _batched(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _carry_over(yolo_results_frame, decoded_frame):
+    """Reuses the last tracked boxes (and IDs) for a frame that skipped inference."""
+    carried = copy.copy(yolo_results_frame)
+    carried.orig_img = decoded_frame.image
+    return carried
+
+def _detect_and_track(model, tracker, decoded_frames, timer=None, roi=None, imgsz=None):
+    # `roi` (a RoiCropper) crops what the detector sees; results are mapped back to
+    # the full frame. `imgsz` overrides the size YOLO resizes its input to.
+    options = {'imgsz': imgsz} if imgsz else {}
+    images = [roi.crop(decoded_frame.image) if roi is not None else decoded_frame.image for decoded_frame in decoded_frames]
+    if tracker is None:
+        for decoded_frame, image in zip(decoded_frames, images):
+            with measure(timer, 'infer'):
+                results = model.track(image, persist=True, tracker=TRACKER_CONFIG, **options)
+            if roi is not None:
+                roi.restore(results[0], decoded_frame.image)
+            yield results[0]
+        return
+    if not decoded_frames:
+        return
+    with measure(timer, 'infer'):
+        results = model.predict(images, conf=TRACKER_DETECTION_CONF, batch=len(decoded_frames), verbose=False, **options)
+    for decoded_frame, yolo_results_frame in zip(decoded_frames, results):
+        with measure(timer, 'track'):
+            tracked = tracker.update(yolo_results_frame)
+        if roi is not None:
+            roi.restore(tracked, decoded_frame.image)
+        yield tracked
+
+def _track_frames(model, decoded_frames, batch_size=1, frame_gate=None, timer=None, roi=None, imgsz=None):
+    """
+    Yields (decoded_frame, results[0]) pairs in decode order.
+
+    With batch_size 1 every inferred frame goes through model.track(). Larger batch
+    sizes run detection on batch_size frames per model.predict() call and then feed
+    the detections to a FrameTracker one frame at a time, so track IDs are assigned
+    exactly as on the single-frame path.
+
+    Frames rejected by `frame_gate` (stride / motion gate) skip inference and carry
+    over the tracks of the last inferred frame. Detector time goes to `timer` (a
+    StageTimer) as 'infer' and FrameTracker time as 'track'; model.track() does
+    both in one call, which is all counted as 'infer'.
+
+    With `roi` (a RoiCropper) only the camera's region of interest is passed to
+    the detector, resized to `imgsz` when given; the yielded results are in
+    full-frame coordinates either way.
+    """
+    tracker = FrameTracker(TRACKER_CONFIG) if batch_size > 1 else None
+    last_result = None
+    pending = []  # (decoded_frame, infer) in decode order, waiting for the next detector call
+    pending_inferred = 0
+
+    def flush():
+        nonlocal last_result
+        results = _detect_and_track(model, tracker, [decoded_frame for decoded_frame, infer in pending if infer],
+                                    timer, roi, imgsz)
+        for decoded_frame, infer in pending:
+            if infer:
+                last_result = next(results)
+                yield decoded_frame, last_result
+            else:
+                yield decoded_frame, _carry_over(last_result, decoded_frame)
+
+    for decoded_frame in decoded_frames:
+        infer = frame_gate is None or frame_gate.should_infer(decoded_frame.image)
+        pending.append((decoded_frame, infer))
+        pending_inferred += infer
+        # A skipped frame only has to wait while inferred frames before it are pending.
+        if pending_inferred == batch_size or pending_inferred == 0:
+            yield from flush()
+            pending, pending_inferred = [], 0
+    if pending:
+        yield from flush()
+
+def _load_model(model_path_str):
+    """Gets the model from this worker's registry and logs the cold-start cost paid or saved."""
+    model, stats = get_model(model_path_str)
+    if stats['cache_hit']:
+        print(f"Model {model_path_str}: cache hit, saved {stats['saved_seconds']:.2f}s cold start")
+    else:
+        print(f"Model {model_path_str}: loaded {stats['loaded_path']} in {stats['load_seconds']:.2f}s")
+    return model
+
+def _annotated_filename(video_upload_instance, suffix=''):
+    original_filename = os.path.basename(video_upload_instance.video_file.path)
+    return f"{os.path.splitext(original_filename)[0]}_annotated{suffix}.mp4"
+
+def _detection_archive_name(video_upload_instance, suffix=''):
+    """Storage name of the video's detection archive, None when DETECTION_ARCHIVE_FORMAT is None."""
+    archive_format = getattr(settings, 'DETECTION_ARCHIVE_FORMAT', DEFAULT_DETECTION_ARCHIVE_FORMAT)
+    if not archive_format:
+        return None
+    # The video's id is part of the name: uploads of the same file must not share a cache.
+    stem = os.path.splitext(os.path.basename(video_upload_instance.video_file.name))[0]
+    return os.path.join('detections', archive_filename(f"{stem}_{video_upload_instance.id}_detections{suffix}", archive_format))
+
+def _open_detection_archive(video_upload_instance, suffix='', keep_through_frame=None):
+    """DetectionArchiveWriter for the video's archive in MEDIA_ROOT/detections, or None when archiving is off."""
+    archive_name = _detection_archive_name(video_upload_instance, suffix)
+    if archive_name is None:
+        return None
+    return DetectionArchiveWriter(
+        os.path.join(settings.MEDIA_ROOT, archive_name),
+        getattr(settings, 'DETECTION_ARCHIVE_FORMAT', DEFAULT_DETECTION_ARCHIVE_FORMAT),
+        chunk_rows=getattr(settings, 'DETECTION_ARCHIVE_CHUNK_ROWS', DEFAULT_DETECTION_ARCHIVE_CHUNK_ROWS),
+        keep_through_frame=keep_through_frame,
+    )
+
+def _open_annotated_writer(video_upload_instance, cap, annotated_filename):
+    """
+    Opens the cv2.VideoWriter for the annotated output in MEDIA_ROOT/processed_videos.
+    Returns (out_writer, output_size, output_frame_step): every output_frame_step-th
+    frame goes into the annotated video.
+    """
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    output_size = output_frame_size(width, height, video_upload_instance.output_scale)
+
+    processed_videos_dir = os.path.join(settings.MEDIA_ROOT, 'processed_videos')
+    if not os.path.exists(processed_videos_dir):
+        os.makedirs(processed_videos_dir)
+
+    output_video_path = os.path.join(processed_videos_dir, annotated_filename)
+
+    output_frame_step = 1
+    output_fps = video_upload_instance.output_fps
+    if output_fps and fps and output_fps < fps:
+        output_frame_step = max(1, round(fps / output_fps))
+    fourcc = cv2.VideoWriter_fourcc(*'avc1')
+    out_writer = cv2.VideoWriter(output_video_path, fourcc, fps / output_frame_step, output_size)
+    return out_writer, output_size, output_frame_step
+
+def _make_faststart(video_path):
+    """Moves the MP4 index to the front so browsers can start playing before the download ends."""
+    try:
+        faststart(video_path)
+    except (FaststartError, OSError) as e:
+        print(f"Could not apply faststart to {video_path}: {e}") # The video still plays, just not progressively
+
+def _inference_options(camera, cap):
+    """(RoiCropper or None, imgsz or None) for frames of `cap` from `camera`."""
+    if camera is None:
+        return None, None
+    frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    return make_roi_cropper(camera, frame_size), camera.inference_imgsz
+
+def _open_video(source):
+    """Capture for a video file or stream with the VIDEO_DECODE_BACKEND decoder (see frame_sources.py)."""
+    return open_video_capture(
+        source,
+        backend=getattr(settings, 'VIDEO_DECODE_BACKEND', DEFAULT_VIDEO_DECODE_BACKEND),
+        threads=getattr(settings, 'VIDEO_DECODE_THREADS', DEFAULT_VIDEO_DECODE_THREADS),
+    )
+
+def _make_frame_gate(frame_stride, motion_threshold):
+    return FrameGate(
+        stride=frame_stride,
+        motion_threshold=motion_threshold,
+        max_skipped_frames=getattr(settings, 'YOLO_MOTION_MAX_SKIPPED_FRAMES', DEFAULT_MOTION_MAX_SKIPPED_FRAMES),
+    )
+
+def _process_frames(video_upload_instance, model, cap, class_names_dict, out_writer=None, output_size=None,
+                    output_frame_step=1, batch_size=1, frame_gate=None, start_frame=0, end_frame=None,
+                    record_from_frame=None, frame_observer=None, time_buckets=None, track_store=None,
+                    counting=None, checkpoints=None, save_checkpoint=None, progress=None, archive=None):
+    """
+    Tracks frames [start_frame, end_frame) of `cap`, writes their DetectionResult rows
+    and annotated frames, adds the tracked boxes to `track_store` (a TrackStore) and
+    returns the last frame number.
+
+    Frames before `record_from_frame` (0-based) only warm up the tracker: they are not
+    annotated, stored or counted. `frame_observer(frame_number, results_frame)` is
+    called for every tracked frame, warm-up included. Recorded counts are also
+    added to `time_buckets` (a TimeBucketAccumulator) when given, and track
+    positions to `counting` (a CountingEngine), warm-up frames included.
+
+    With `checkpoints` (a CheckpointRecorder) track IDs go through its mapping
+    onto an interrupted run's IDs, and `save_checkpoint(frame_number, timestamp,
+    pipeline)` is called on every frame it says a checkpoint is due, after the
+    detection rows up to that frame are written.
+
+    `archive` (a DetectionArchiveWriter) receives every recorded frame's boxes,
+    with the same track IDs as `track_store`.
+
+    `progress` (a ProgressReporter) is told about every recorded frame and
+    collects the decode/infer/track/plot/encode/db stage times.
+    """
+    record_from_index = (record_from_frame if record_from_frame is not None else start_frame) + 1
+    frame_number = start_frame
+    queue_size = getattr(settings, 'VIDEO_PIPELINE_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+    annotator = FrameAnnotator(class_names_dict, output_size)
+    timer = progress.timer if progress is not None else None
+    roi, imgsz = _inference_options(video_upload_instance.camera, cap)
+    # Decoding and annotation/encoding run on their own threads; tracking stays
+    # in this thread so frames reach the tracker strictly in order.
+    # Rows buffered so far are flushed on exit, including when the loop raises.
+    with make_detection_writer() as detection_writer, \
+            VideoPipeline(cap, out_writer, annotator, queue_size, start_frame, end_frame, timer) as pipeline:
+        # Process frames with YOLO, batch_size frames per detector call
+        gate = frame_gate if frame_gate is not None and frame_gate.enabled else None
+        for decoded_frame, yolo_results_frame in _track_frames(model, pipeline.frames(), batch_size, gate, timer,
+                                                               roi, imgsz):
+            frame_number = decoded_frame.index
+            if frame_observer is not None:
+                frame_observer(frame_number, yolo_results_frame)
+            # Per-class box counts and tracker IDs, read from the boxes' tensors in one pass
+            class_ids, track_ids, confidences, xyxy = _frame_arrays(yolo_results_frame)
+            recording = frame_number >= record_from_index
+            with measure(timer, 'track'):
+                if checkpoints is not None and track_ids is not None:
+                    track_ids, matched_now = checkpoints.track_ids(frame_number, track_ids, xyxy, recording)
+                    if matched_now and counting is not None:
+                        counting.rename_tracks(checkpoints.map_track_id)
+                if counting is not None and track_ids is not None:
+                    counting.update(frame_number, decoded_frame.timestamp, track_ids, xyxy, record=recording)
+            if not recording:
+                pipeline.release(decoded_frame)
+                continue
+            # The image is not read past this point: the encoder or the pool owns it now.
+            if (frame_number - record_from_index) % output_frame_step == 0:
+                pipeline.submit(decoded_frame, yolo_results_frame)
+            else:
+                pipeline.release(decoded_frame)
+
+            # Data extraction
+            # current_time_seconds is the timestamp of the current frame in seconds from the start of the video.
+            current_time_seconds = decoded_frame.timestamp
+
+            # Unique vehicles: per-track first/last seen, confidence and class votes
+            if track_store is not None and track_ids is not None:
+                track_store.update(frame_number, current_time_seconds, track_ids, class_ids, confidences)
+
+            frame_detections = _frame_detections(class_ids, class_names_dict) # Counts of each class in the current frame
+
+            # Queue the frame's DetectionResult rows (or extend its DetectionRuns,
+            # see DETECTION_STORAGE); the writer flushes them in batches with bulk_create.
+            with measure(timer, 'db'):
+                detection_writer.add_frame(video_upload_instance, current_time_seconds, frame_detections)
+                if archive is not None:
+                    archive.add(frame_number, current_time_seconds, class_ids, track_ids, confidences, xyxy)
+                if time_buckets is not None:
+                    for vehicle_class, count in frame_detections.items():
+                        time_buckets.add(current_time_seconds, vehicle_class, count)
+
+                if save_checkpoint is not None and checkpoints.due(frame_number):
+                    detection_writer.checkpoint()
+                    if archive is not None:
+                        archive.flush()
+                    save_checkpoint(frame_number, current_time_seconds, pipeline)
+
+            if progress is not None:
+                progress.frame_done()
+
+    return frame_number
+
+def _make_progress_reporter(video_upload_instance, timer=None):
+    return ProgressReporter(video_upload_instance.id,
+                            getattr(settings, 'PROGRESS_UPDATE_SECONDS', DEFAULT_PROGRESS_UPDATE_SECONDS), timer=timer)
+
+def _discard_uncommitted_results(video_upload_instance, checkpoint):
+    """
+    Deletes the DetectionResult / DetectionRun and TrackSummary rows an interrupted run wrote
+    after its last checkpoint (all of them without one), so a retry never
+    writes them twice. Tracks still open at the checkpoint are restored from it
+    and saved again when they finish.
+    """
+    detections = DetectionResult.objects.filter(video=video_upload_instance)
+    runs = DetectionRun.objects.filter(video=video_upload_instance)
+    tracks = TrackSummary.objects.filter(video=video_upload_instance)
+    if checkpoint is not None:
+        detections = detections.filter(timestamp_in_video__gt=checkpoint.timestamp_in_video)
+        runs = runs.filter(start_time__gt=checkpoint.timestamp_in_video)  # Runs are closed at every checkpoint
+        open_track_ids = [record['track_id'] for record in checkpoint.state['open_tracks']]
+        tracks = tracks.filter(Q(first_frame__gt=checkpoint.frame_number) | Q(track_id__in=open_track_ids))
+    detections.delete()
+    runs.delete()
+    tracks.delete()
+
+def _join_segments(segment_filenames, annotated_filename):
+    """Turns the annotated segments written between checkpoints into the final annotated video."""
+    processed_videos_dir = os.path.join(settings.MEDIA_ROOT, 'processed_videos')
+    segment_paths = [os.path.join(processed_videos_dir, filename) for filename in segment_filenames]
+    segment_paths = [path for path in segment_paths if os.path.exists(path)]  # The writer may have failed to open
+    output_path = os.path.join(processed_videos_dir, annotated_filename)
+    if not segment_paths:
+        return
+    if len(segment_paths) == 1:
+        os.replace(segment_paths[0], output_path)
+    else:
+        _concatenate_segments(segment_paths, output_path)
+
+def _save_track_summaries(video_upload_instance, records, class_names_dict):
+    """Stores TrackStore records as TrackSummary rows, classed by majority vote."""
+    TrackSummary.objects.bulk_create([
+        TrackSummary(
+            video=video_upload_instance,
+            track_id=record['track_id'],
+            vehicle_class=class_names_dict.get(record['class_id'], "unknown"),
+            first_frame=record['first_frame'],
+            last_frame=record['last_frame'],
+            first_seen=record['first_seen'],
+            last_seen=record['last_seen'],
+            frames_seen=record['frames_seen'],
+            max_confidence=record['max_confidence'],
+            class_votes={class_names_dict.get(int(class_id), str(class_id)): votes
+                         for class_id, votes in record['class_votes'].items()},
+        )
+        for record in records
+    ], batch_size=1000)
+
+def _unique_counts_from_tracks(video_upload_instance):
+    """{vehicle_class: number_of_tracks} from the video's TrackSummary rows."""
+    tracks_per_class = TrackSummary.objects.filter(video=video_upload_instance) \
+                                           .exclude(vehicle_class="unknown") \
+                                           .values('vehicle_class') \
+                                           .annotate(track_count=Count('id'))
+    return {item['vehicle_class']: item['track_count'] for item in tracks_per_class}
+
+def _make_counting_engine(video_upload_instance, cap):
+    """CountingEngine for the camera's active lines and zones, or None when it has none."""
+    if video_upload_instance.camera is None:
+        return None
+    regions = list(video_upload_instance.camera.regions.filter(is_active=True))
+    if not regions:
+        return None
+    frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    return CountingEngine(
+        regions, frame_size,
+        max_idle_frames=getattr(settings, 'COUNTING_MAX_IDLE_FRAMES', DEFAULT_COUNTING_MAX_IDLE_FRAMES),
+    )
+
+def _region_counts(video_upload_instance, counting, track_classes):
+    return period_counts(counting.events, track_classes, video_upload_instance.camera.count_period_seconds)
+
+def _save_region_counts(video_upload_instance, region_counts):
+    """
+    Replaces the video's line/zone counts with `region_counts`
+    ({(region_id, direction, period_index, vehicle_class): count}). Each period
+    starts at recorded_at (or the upload time) plus period_index counting periods.
+    """
+    video_start = video_upload_instance.recorded_at or video_upload_instance.uploaded_at
+    period = timedelta(seconds=video_upload_instance.camera.count_period_seconds)
+    with transaction.atomic():
+        AggregatedData.objects.filter(video=video_upload_instance, region__isnull=False).delete()
+        AggregatedData.objects.bulk_create([
+            AggregatedData(
+                video=video_upload_instance,
+                region_id=region_id,
+                direction=direction,
+                time_period_start=video_start + period_index * period,
+                vehicle_class=vehicle_class,
+                count=count,
+            )
+            for (region_id, direction, period_index, vehicle_class), count in sorted(region_counts.items())
+        ])
+
+def _save_aggregated_counts(video_upload_instance, unique_counts_per_class):
+    # AggregatedData saving logic based on unique counts per class
+    for vehicle_class, count in unique_counts_per_class.items():
+        AggregatedData.objects.update_or_create(
+            video=video_upload_instance,
+            vehicle_class=vehicle_class,
+            time_period_start=video_upload_instance.uploaded_at,  # Assuming this represents the video itself
+            region=None,
+            direction='',
+            defaults={'count': count}
+        )
+
+def process_video_with_yolo(video_upload_instance_id, model_path_str, class_names_dict, batch_size=1,
+                            frame_stride=1, motion_threshold=None, instrumentation=None):
+    # `instrumentation` (a StageTimer, e.g. an Instrumentation) receives the
+    # per-stage timings in addition to the video's ProcessingProgress row.
     try:
         video_upload_instance = VideoUpload.objects.get(id=video_upload_instance_id)
         video_upload_instance.status = 'processing'
         video_upload_instance.save()
 
-        model = YOLO(model_path_str)
+        model = _load_model(model_path_str)
 
         input_video_path = video_upload_instance.video_file.path
-        cap = cv2.VideoCapture(input_video_path)
+        cap = _open_video(input_video_path)
 
         if not cap.isOpened():
             raise Exception(f"Error opening video file: {input_video_path}")
 
-        # Output video setup
-        original_filename = os.path.basename(input_video_path)
-        annotated_filename = f"{os.path.splitext(original_filename)[0]}_annotated.mp4"
-        
-        processed_videos_dir = os.path.join(settings.MEDIA_ROOT, 'processed_videos')
-        if not os.path.exists(processed_videos_dir):
-            os.makedirs(processed_videos_dir)
-        
-        output_video_path = os.path.join(processed_videos_dir, annotated_filename)
-
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        out_writer = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
-
-        collected_unique_ids_per_class_for_video = {} # Stores {class_name: set_of_ids}
-        frame_number = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        # A retry of a run that died continues from its last checkpoint; results
+        # written after it are discarded first.
+        checkpoint_interval = getattr(settings, 'VIDEO_CHECKPOINT_INTERVAL_FRAMES', DEFAULT_CHECKPOINT_INTERVAL_FRAMES)
+        resume = ProcessingCheckpoint.objects.filter(video=video_upload_instance).first() if checkpoint_interval else None
+        _discard_uncommitted_results(video_upload_instance, resume)
+        checkpoints = None
+        resume_frame, start_frame = 0, 0
+        if checkpoint_interval:
+            overlap_frames = getattr(settings, 'VIDEO_CHECKPOINT_OVERLAP_FRAMES', DEFAULT_CHECKPOINT_OVERLAP_FRAMES)
+            checkpoints = CheckpointRecorder(checkpoint_interval, overlap_frames, resume.state if resume else None)
+            if resume is not None:
+                resume_frame = resume.frame_number
+                start_frame = max(0, resume_frame - overlap_frames)
+                print(f"Resuming video {video_upload_instance_id} from frame {resume_frame}")
 
-            frame_number += 1
-            # Process frame with YOLO
-            results = model.track(frame, persist=True, tracker='bytetrack.yaml') # No resizing for now
-            # results[0].plot() is a utility from Ultralytics that draws the detected boxes and labels onto the frame.
-            annotated_frame = results[0].plot()
-            out_writer.write(annotated_frame)
+        # Output video setup. Counts-only uploads skip annotation and encoding entirely.
+        # With checkpoints the annotated video is written in one segment per checkpoint
+        # interval, so a retry keeps the segments finished before the crash.
+        out_writer, output_size, output_frame_step = None, None, 1
+        annotated_filename = segment_filename = None
+        if video_upload_instance.render_mode == VideoUpload.RENDER_ANNOTATED:
+            annotated_filename = _annotated_filename(video_upload_instance)
+            if checkpoints is not None:
+                segment_filename = _annotated_filename(video_upload_instance, f'_part{len(checkpoints.segments):03d}')
+            out_writer, output_size, output_frame_step = _open_annotated_writer(video_upload_instance, cap, segment_filename or annotated_filename)
 
-            # New unique ID tracking logic
-            current_frame_ids_by_class = _get_unique_ids_from_frame_results(results[0])
-            for class_id, current_frame_ids_for_class_set in current_frame_ids_by_class.items():
-                vehicle_class_name = class_names_dict.get(class_id)
-                if vehicle_class_name and vehicle_class_name != "unknown":
-                    collected_unique_ids_per_class_for_video.setdefault(vehicle_class_name, set()).update(current_frame_ids_for_class_set)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        start_progress(video_upload_instance, total_frames, frames_done=resume_frame)
+        progress = _make_progress_reporter(video_upload_instance, timer=instrumentation)
 
-            # Data extraction
-            # current_time_seconds is the timestamp of the current frame in seconds from the start of the video.
-            current_time_seconds = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
-            
-            frame_detections = {} # To store counts of each class in the current frame
-
-            for box in results[0].boxes:
-                try:
-                    class_id = int(box.cls[0].item())
-                    vehicle_class_name = class_names_dict.get(class_id, "unknown") # Use .get for safety
-                    
-                    if vehicle_class_name != "unknown":
-                        frame_detections[vehicle_class_name] = frame_detections.get(vehicle_class_name, 0) + 1
-                except Exception as e:
-                    print(f"Error processing detection: {e}") # Log error and continue
-
-            # Save DetectionResult for each detected class in the frame
-            for vehicle_class, count in frame_detections.items():
-                DetectionResult.objects.create(
-                    video=video_upload_instance,
-                    timestamp_in_video=current_time_seconds,
-                    vehicle_class=vehicle_class,
-                    count=count
-                )
-        
-        cap.release()
-        out_writer.release()
+        frame_gate = _make_frame_gate(frame_stride, motion_threshold)
+        time_buckets = TimeBucketAccumulator()
+        # A resumed run keeps the archived rows up to its checkpoint and appends after them.
+        archive = _open_detection_archive(video_upload_instance, keep_through_frame=resume_frame if resume else None)
+
+        def save_finished_tracks(records):
+            with measure(progress.timer, 'db'):
+                _save_track_summaries(video_upload_instance, records, class_names_dict)
+
+        # Tracks that ended long ago are written out while processing runs, so the
+        # in-memory table only holds tracks that may still be on screen.
+        track_store = TrackStore(
+            len(class_names_dict),
+            max_idle_frames=getattr(settings, 'TRACK_STORE_MAX_IDLE_FRAMES', DEFAULT_TRACK_STORE_MAX_IDLE_FRAMES),
+            sink=save_finished_tracks,
+        )
+        counting = _make_counting_engine(video_upload_instance, cap)
+        if resume is not None:
+            track_store.load(resume.state['open_tracks'])
+            time_buckets.update(resume.state['buckets'])
+            if counting is not None:
+                counting.restore_events(resume.state['events'])
+            frame_gate.frames_skipped = resume.state['frames_skipped']
+
+        def save_checkpoint(frame_number, timestamp, pipeline):
+            nonlocal out_writer, segment_filename
+            if frame_number >= total_frames:
+                return  # Nothing left to resume
+            if out_writer is not None:
+                checkpoints.segments.append(segment_filename)
+                segment_filename = _annotated_filename(video_upload_instance, f'_part{len(checkpoints.segments):03d}')
+                out_writer, _, _ = _open_annotated_writer(video_upload_instance, cap, segment_filename)
+                pipeline.replace_writer(out_writer).release()
+            ProcessingCheckpoint.objects.update_or_create(video=video_upload_instance, defaults={
+                'frame_number': frame_number,
+                'timestamp_in_video': timestamp,
+                'state': checkpoints.state(track_store, time_buckets, counting, frame_gate.frames_skipped),
+            })
+
+        frame_number = _process_frames(
+            video_upload_instance, model, cap, class_names_dict,
+            out_writer=out_writer, output_size=output_size, output_frame_step=output_frame_step,
+            batch_size=batch_size, frame_gate=frame_gate, start_frame=start_frame, record_from_frame=resume_frame,
+            time_buckets=time_buckets, track_store=track_store, counting=counting,
+            checkpoints=checkpoints, save_checkpoint=save_checkpoint if checkpoints is not None else None,
+            progress=progress, archive=archive,
+        )
+        progress.flush()
 
         cap.release()
-        out_writer.release()
+        if out_writer is not None:
+            out_writer.release()
+        if archive is not None:
+            archive.close()
+            video_upload_instance.detection_archive.name = _detection_archive_name(video_upload_instance)
 
-        # New AggregatedData saving logic based on unique counts per class
-        from .models import AggregatedData
-        for vehicle_class, unique_ids_set in collected_unique_ids_per_class_for_video.items():
-            AggregatedData.objects.update_or_create(
-                video=video_upload_instance,
-                vehicle_class=vehicle_class,
-                time_period_start=video_upload_instance.uploaded_at,  # Assuming this represents the video itself
-                defaults={'count': len(unique_ids_set)}
-            )
+        _save_track_summaries(video_upload_instance, track_store.pop(), class_names_dict)
+        _save_aggregated_counts(video_upload_instance, _unique_counts_from_tracks(video_upload_instance))
+        if counting is not None:
+            track_classes = dict(TrackSummary.objects.filter(video=video_upload_instance).values_list('track_id', 'vehicle_class'))
+            _save_region_counts(video_upload_instance, _region_counts(video_upload_instance, counting, track_classes))
+        time_buckets.save(video_upload_instance)
 
-        video_upload_instance.processed_video_file.name = os.path.join('processed_videos', annotated_filename)
+        if annotated_filename:
+            if segment_filename:
+                _join_segments(checkpoints.segments + [segment_filename], annotated_filename)
+            _make_faststart(os.path.join(settings.MEDIA_ROOT, 'processed_videos', annotated_filename))
+            video_upload_instance.processed_video_file.name = os.path.join('processed_videos', annotated_filename)
 
         # video_upload_instance.unique_car_count = len(collected_unique_car_ids_for_video) # Removed as per instructions
 
+        video_upload_instance.frame_count = frame_number
+        video_upload_instance.skipped_frame_count = frame_gate.frames_skipped
+
         video_upload_instance.status = 'completed'
         video_upload_instance.processed_at = timezone.now()
         video_upload_instance.save()
+        ProcessingCheckpoint.objects.filter(video=video_upload_instance).delete()
+        invalidate_chart_data()
 
     except VideoUpload.DoesNotExist:
         print(f"VideoUpload instance with id {video_upload_instance_id} not found.")
@@ -144,5 +626,391 @@ def process_video_with_yolo(video_upload_instance_id, model_path_str, class_name
     finally:
         if 'cap' in locals() and cap.isOpened():
             cap.release()
-        if 'out_writer' in locals():
+        if 'out_writer' in locals() and out_writer is not None:
             out_writer.release()
+        if 'archive' in locals() and archive is not None:
+            archive.close()  # Rows up to the failure stay for a resumed run
+
+def create_video_chunks(video_upload_instance, chunk_seconds, overlap_seconds):
+    """
+    Plans and stores the VideoChunk rows for a video. Returns an empty list when the
+    video fits into a single chunk, in which case it is processed in one pass.
+    """
+    cap = _open_video(video_upload_instance.video_file.path)
+    try:
+        if not cap.isOpened():
+            raise Exception(f"Error opening video file: {video_upload_instance.video_file.path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+    chunk_frames = max(1, int(round(chunk_seconds * fps)))
+    overlap_frames = int(round(overlap_seconds * fps))
+    plans = plan_chunks(total_frames, chunk_frames, overlap_frames)
+    if len(plans) <= 1:
+        return []
+
+    video_upload_instance.chunks.all().delete()
+    start_progress(video_upload_instance, total_frames)
+    return VideoChunk.objects.bulk_create([
+        VideoChunk(
+            video=video_upload_instance,
+            index=plan.index,
+            process_start_frame=plan.process_start_frame,
+            start_frame=plan.start_frame,
+            end_frame=plan.end_frame,
+            overlap_frames=plan.start_frame - plan.process_start_frame,
+        )
+        for plan in plans
+    ])
+
+def process_video_chunk_with_yolo(chunk_id, model_path_str, class_names_dict, batch_size=1,
+                                  frame_stride=1, motion_threshold=None):
+    """
+    Processes one VideoChunk: DetectionResult rows and annotated frames for its core
+    frames, plus the track summary and time buckets merge_video_chunks needs. Returns them.
+    Errors mark the chunk and its video as failed and are re-raised so the Celery
+    chord does not run the merge.
+    """
+    chunk = VideoChunk.objects.select_related('video').get(id=chunk_id)
+    video_upload_instance = chunk.video
+    progress_interval = getattr(settings, 'VIDEO_CHUNK_PROGRESS_INTERVAL_FRAMES', DEFAULT_CHUNK_PROGRESS_INTERVAL_FRAMES)
+    cap = out_writer = archive = None
+    try:
+        chunk.status = 'processing'
+        chunk.save(update_fields=['status', 'updated_at'])
+
+        model = _load_model(model_path_str)
+        cap = _open_video(video_upload_instance.video_file.path)
+        if not cap.isOpened():
+            raise Exception(f"Error opening video file: {video_upload_instance.video_file.path}")
+
+        out_writer, output_size, output_frame_step = None, None, 1
+        if video_upload_instance.render_mode == VideoUpload.RENDER_ANNOTATED:
+            out_writer, output_size, output_frame_step = _open_annotated_writer(
+                video_upload_instance, cap, _annotated_filename(video_upload_instance, f"_part{chunk.index:03d}"))
+
+        next_chunk = VideoChunk.objects.filter(video=video_upload_instance, index=chunk.index + 1).first()
+        next_overlap = next_chunk.overlap_frames if next_chunk is not None else 0
+        recorder = ChunkTrackRecorder(chunk.start_frame, chunk.end_frame, chunk.overlap_frames, next_overlap)
+
+        def observe(frame_number, yolo_results_frame):
+            recorder.observe(frame_number, yolo_results_frame)
+            frames_done = frame_number - chunk.process_start_frame
+            if frames_done % progress_interval == 0:
+                VideoChunk.objects.filter(id=chunk.id).update(frames_processed=frames_done)
+
+        frame_gate = _make_frame_gate(frame_stride, motion_threshold)
+        time_buckets = TimeBucketAccumulator()
+        # Adds this chunk's core frames to the video's progress row.
+        progress = _make_progress_reporter(video_upload_instance)
+        # Bounded by the chunk length; all tracks go to the merge task.
+        track_store = TrackStore(len(class_names_dict))
+        counting = _make_counting_engine(video_upload_instance, cap)
+        # Archived with the chunk's own track IDs; merge_video_chunks renumbers them.
+        archive = _open_detection_archive(video_upload_instance, f"_part{chunk.index:03d}")
+        _process_frames(
+            video_upload_instance, model, cap, class_names_dict,
+            out_writer=out_writer, output_size=output_size, output_frame_step=output_frame_step,
+            batch_size=batch_size, frame_gate=frame_gate,
+            start_frame=chunk.process_start_frame, end_frame=chunk.end_frame,
+            record_from_frame=chunk.start_frame, frame_observer=observe, time_buckets=time_buckets,
+            track_store=track_store, counting=counting, progress=progress, archive=archive,
+        )
+        progress.flush()
+        if archive is not None:
+            archive.close()
+
+        chunk.status = 'completed'
+        chunk.frames_processed = chunk.total_frames
+        chunk.skipped_frame_count = frame_gate.frames_skipped
+        chunk.save()
+        tracks = track_store.pop()
+        region_counts = []
+        if counting is not None:
+            # Crossings happen on this chunk's own frames only, so chunks never count one twice.
+            track_classes = {record['track_id']: class_names_dict.get(record['class_id'], "unknown") for record in tracks}
+            region_counts = [list(key) + [count] for key, count in
+                             _region_counts(video_upload_instance, counting, track_classes).items()]
+        return dict(recorder.summary(), tracks=tracks, buckets=time_buckets.rows(), region_counts=region_counts)
+    except Exception as e:
+        print(f"Error processing chunk {chunk.index} of video {video_upload_instance.id}: {e}")
+        VideoChunk.objects.filter(id=chunk.id).update(status='failed')
+        VideoUpload.objects.filter(id=video_upload_instance.id).update(status='failed')
+        raise
+    finally:
+        if cap is not None:
+            cap.release()
+        if out_writer is not None:
+            out_writer.release()
+        if archive is not None:
+            archive.close()
+
+def _concatenate_segments(segment_paths, output_path):
+    """Joins the per-chunk annotated segments into one video (decode + encode, no inference)."""
+    out_writer = None
+    try:
+        for segment_path in segment_paths:
+            cap = cv2.VideoCapture(segment_path)
+            if out_writer is None and cap.isOpened():
+                size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+                out_writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'avc1'), cap.get(cv2.CAP_PROP_FPS), size)
+            while cap.isOpened():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                out_writer.write(frame)
+            cap.release()
+            os.remove(segment_path)
+    finally:
+        if out_writer is not None:
+            out_writer.release()
+
+def merge_video_chunks(video_upload_instance_id, chunk_summaries, class_names_dict):
+    """
+    Chord callback: merges tracks across chunk boundaries, writes TrackSummary and
+    AggregatedData once for the whole video, joins the annotated segments and completes the video.
+    `chunk_summaries` are in chunk order, as returned by process_video_chunk_with_yolo.
+    """
+    video_upload_instance = VideoUpload.objects.get(id=video_upload_instance_id)
+    try:
+        TrackSummary.objects.filter(video=video_upload_instance).delete()
+        track_id_maps = []
+        _save_track_summaries(video_upload_instance, merge_chunk_tracks(chunk_summaries, track_id_maps=track_id_maps),
+                              class_names_dict)
+        _save_aggregated_counts(video_upload_instance, _unique_counts_from_tracks(video_upload_instance))
+        if video_upload_instance.camera is not None:
+            region_counts = {}
+            for summary in chunk_summaries:
+                for region_id, direction, period_index, vehicle_class, count in summary['region_counts']:
+                    key = (region_id, direction, period_index, vehicle_class)
+                    region_counts[key] = region_counts.get(key, 0) + count
+            _save_region_counts(video_upload_instance, region_counts)
+
+        time_buckets = TimeBucketAccumulator()
+        for summary in chunk_summaries:
+            time_buckets.update(summary['buckets'])
+        time_buckets.save(video_upload_instance)
+
+        chunks = list(video_upload_instance.chunks.all())
+        archive_name = _detection_archive_name(video_upload_instance)
+        if archive_name is not None:
+            part_paths = [os.path.join(settings.MEDIA_ROOT, _detection_archive_name(video_upload_instance, f"_part{chunk.index:03d}"))
+                          for chunk in chunks]
+            concatenate_archives(part_paths, os.path.join(settings.MEDIA_ROOT, archive_name), track_id_maps,
+                                 chunk_rows=getattr(settings, 'DETECTION_ARCHIVE_CHUNK_ROWS', DEFAULT_DETECTION_ARCHIVE_CHUNK_ROWS))
+            video_upload_instance.detection_archive.name = archive_name
+
+        if video_upload_instance.render_mode == VideoUpload.RENDER_ANNOTATED:
+            annotated_filename = _annotated_filename(video_upload_instance)
+            processed_videos_dir = os.path.join(settings.MEDIA_ROOT, 'processed_videos')
+            segment_paths = [
+                os.path.join(processed_videos_dir, _annotated_filename(video_upload_instance, f"_part{chunk.index:03d}"))
+                for chunk in chunks
+            ]
+            _concatenate_segments(segment_paths, os.path.join(processed_videos_dir, annotated_filename))
+            _make_faststart(os.path.join(processed_videos_dir, annotated_filename))
+            video_upload_instance.processed_video_file.name = os.path.join('processed_videos', annotated_filename)
+
+        video_upload_instance.frame_count = chunks[-1].end_frame if chunks else 0
+        video_upload_instance.skipped_frame_count = sum(chunk.skipped_frame_count for chunk in chunks)
+        video_upload_instance.status = 'completed'
+        video_upload_instance.processed_at = timezone.now()
+        video_upload_instance.save()
+        invalidate_chart_data()
+    except Exception as e:
+        print(f"Error merging chunks of video {video_upload_instance_id}: {e}")
+        video_upload_instance.status = 'failed'
+        video_upload_instance.save()
+        raise
+
+def _archived_frames(data):
+    """Yields (frame_number, {column: array}) for each frame in archive columns, in frame order."""
+    frames = data['frame']
+    if not len(frames):
+        return
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(frames)) + 1, [len(frames)]]).tolist()
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield int(frames[start]), {name: values[start:end] for name, values in data.items()}
+
+def recount_video(video_upload_instance_id, class_names_dict, min_confidence=None, tracker_config=None):
+    """
+    Rebuilds a processed video's detection rows, time buckets, TrackSummary rows
+    and AggregatedData (whole-video and line/zone counts) from its detection
+    archive, without decoding the video or running the detector. The current
+    `class_names_dict`, counting regions and DETECTION_STORAGE apply; boxes below
+    `min_confidence` are dropped.
+
+    With `tracker_config` (a tracker YAML such as TRACKER_CONFIG) the archived
+    boxes are tracked again instead of keeping their track IDs. The archive
+    only holds the boxes the original run's tracker reported, so a re-run can
+    drop or regroup boxes but never recover detections that tracker discarded.
+
+    The archive itself is left as it is; processed_at is set to the recount
+    time. Returns the number of boxes used.
+    """
+    video_upload_instance = VideoUpload.objects.get(id=video_upload_instance_id)
+    archive = video_upload_instance.detection_archive
+    if not archive or not os.path.exists(archive.path):
+        raise Exception(f"Video {video_upload_instance_id} has no detection archive, it has to be processed again")
+    data = load_detections(archive.path)
+    if min_confidence is not None:
+        keep = data['confidence'] >= min_confidence
+        data = {name: values[keep] for name, values in data.items()}
+
+    # The video is only opened for its frame size (counting regions are relative to it).
+    cap = _open_video(video_upload_instance.video_file.path)
+    try:
+        if not cap.isOpened():
+            raise Exception(f"Error opening video file: {video_upload_instance.video_file.path}")
+        frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        counting = _make_counting_engine(video_upload_instance, cap)
+    finally:
+        cap.release()
+
+    tracker = FrameTracker(tracker_config) if tracker_config else None
+    # Class IDs the current mapping no longer names still need a vote column.
+    num_classes = len(class_names_dict)
+    if len(data['class_id']):
+        num_classes = max(num_classes, int(data['class_id'].max()) + 1)
+    track_store = TrackStore(num_classes)
+    time_buckets = TimeBucketAccumulator()
+    with transaction.atomic():
+        DetectionResult.objects.filter(video=video_upload_instance).delete()
+        DetectionRun.objects.filter(video=video_upload_instance).delete()
+        TrackSummary.objects.filter(video=video_upload_instance).delete()
+        AggregatedData.objects.filter(video=video_upload_instance, region__isnull=True).delete()
+        with make_detection_writer() as detection_writer:
+            previous_frame = None
+            for frame_number, frame in _archived_frames(data):
+                timestamp = float(frame['timestamp'][0])
+                if previous_frame is not None and frame_number > previous_frame + 1:
+                    # Frames without boxes are not archived; one ends the open runs.
+                    detection_writer.add_frame(video_upload_instance, timestamp, {})
+                    if tracker is not None:
+                        for _ in range(frame_number - previous_frame - 1):
+                            tracker.update_boxes(np.empty((0, 6)), frame_size)
+                previous_frame = frame_number
+
+                class_ids = frame['class_id'].astype(np.int64)
+                track_ids = frame['track_id'].astype(np.int64)
+                confidences = frame['confidence']
+                xyxy = np.column_stack([frame['x1'], frame['y1'], frame['x2'], frame['y2']])
+                if tracker is not None:
+                    tracked = tracker.update_boxes(np.column_stack([xyxy, confidences, class_ids]), frame_size)
+                    xyxy, confidences = tracked[:, :4], tracked[:, 5]
+                    track_ids, class_ids = tracked[:, 4].astype(np.int64), tracked[:, 6].astype(np.int64)
+
+                has_track = track_ids >= 0
+                track_store.update(frame_number, timestamp, track_ids[has_track], class_ids[has_track], confidences[has_track])
+                if counting is not None:
+                    counting.update(frame_number, timestamp, track_ids[has_track], xyxy[has_track])
+                frame_detections = _frame_detections(class_ids, class_names_dict)
+                detection_writer.add_frame(video_upload_instance, timestamp, frame_detections)
+                for vehicle_class, count in frame_detections.items():
+                    time_buckets.add(timestamp, vehicle_class, count)
+
+        _save_track_summaries(video_upload_instance, track_store.pop(), class_names_dict)
+        _save_aggregated_counts(video_upload_instance, _unique_counts_from_tracks(video_upload_instance))
+        if counting is not None:
+            track_classes = dict(TrackSummary.objects.filter(video=video_upload_instance).values_list('track_id', 'vehicle_class'))
+            _save_region_counts(video_upload_instance, _region_counts(video_upload_instance, counting, track_classes))
+        else:
+            AggregatedData.objects.filter(video=video_upload_instance, region__isnull=False).delete()
+        time_buckets.save(video_upload_instance)
+        # processed_at is part of the chart cache key and ETag: web processes whose
+        # cache invalidate_chart_data() does not reach must still see new data.
+        video_upload_instance.processed_at = timezone.now()
+        video_upload_instance.save(update_fields=['processed_at'])
+    invalidate_chart_data()
+    return len(data['frame'])
+
+def _make_stream_reader(live_stream, opener=None, max_reconnects=None):
+    options = {
+        'buffer_frames': getattr(settings, 'LIVE_STREAM_BUFFER_FRAMES', DEFAULT_LIVE_STREAM_BUFFER_FRAMES),
+        'reconnect_initial_seconds': getattr(settings, 'LIVE_STREAM_RECONNECT_INITIAL_SECONDS', DEFAULT_LIVE_STREAM_RECONNECT_INITIAL_SECONDS),
+        'reconnect_max_seconds': getattr(settings, 'LIVE_STREAM_RECONNECT_MAX_SECONDS', DEFAULT_LIVE_STREAM_RECONNECT_MAX_SECONDS),
+        'max_reconnects': max_reconnects,
+    }
+    options['opener'] = opener if opener is not None else _open_video
+    return StreamReader(live_stream.source, **options)
+
+def _save_stream_stats(live_stream, reader, latency_seconds, status=None):
+    live_stream.status = status or ('running' if reader.connected else 'reconnecting')
+    live_stream.frames_dropped = reader.frames_dropped
+    live_stream.reconnect_count = reader.reconnects
+    live_stream.latency_seconds = latency_seconds
+    live_stream.save(update_fields=['status', 'last_frame_at', 'frames_processed', 'frames_dropped',
+                                    'reconnect_count', 'latency_seconds'])
+
+def process_live_stream(live_stream_id, model_path_str, class_names_dict, opener=None, max_reconnects=None,
+                        max_seconds=None, stop_event=None):
+    """
+    Ingests a LiveStream until it is stopped: the reader gives up after
+    `max_reconnects` reconnects without a frame (None: keeps retrying),
+    `max_seconds` have passed, `stop_event` is set or the process is
+    interrupted. Every frame goes through model.track() as for uploads; counts
+    are flushed to StreamAggregate every LIVE_STREAM_FLUSH_SECONDS and once
+    more, for all remaining tracks, on the way out.
+
+    `opener` replaces the VIDEO_DECODE_BACKEND capture, e.g. with a ReplayCapture to replay a
+    recording at camera speed.
+    """
+    try:
+        live_stream = LiveStream.objects.select_related('camera').get(id=live_stream_id)
+    except LiveStream.DoesNotExist:
+        print(f"LiveStream instance with id {live_stream_id} not found.")
+        return
+
+    model = _load_model(model_path_str)
+    regions = live_stream.camera.regions.filter(is_active=True) if live_stream.camera else []
+    aggregator = LiveAggregator(
+        live_stream, class_names_dict, regions,
+        period_seconds=getattr(settings, 'LIVE_STREAM_PERIOD_SECONDS', DEFAULT_LIVE_STREAM_PERIOD_SECONDS),
+        track_idle_seconds=getattr(settings, 'LIVE_STREAM_TRACK_IDLE_SECONDS', DEFAULT_LIVE_STREAM_TRACK_IDLE_SECONDS),
+    )
+    flush_seconds = getattr(settings, 'LIVE_STREAM_FLUSH_SECONDS', DEFAULT_LIVE_STREAM_FLUSH_SECONDS)
+    reader = _make_stream_reader(live_stream, opener, max_reconnects)
+    imgsz = live_stream.camera.inference_imgsz if live_stream.camera else None
+    roi, roi_ready = None, live_stream.camera is None  # The ROI needs the stream's frame size
+
+    live_stream.started_at = timezone.now()
+    live_stream.status = 'running'
+    live_stream.save(update_fields=['started_at', 'status'])
+    status = 'stopped'
+    started = time.time()
+    next_flush = started + flush_seconds
+    latency_seconds = None
+    reader.start()
+    try:
+        while not reader.finished and not (stop_event is not None and stop_event.is_set()):
+            if max_seconds is not None and time.time() - started >= max_seconds:
+                break
+            decoded_frame = reader.get(timeout=min(flush_seconds, 1.0))
+            if decoded_frame is not None:
+                if not roi_ready:
+                    height, width = decoded_frame.image.shape[:2]
+                    roi, roi_ready = make_roi_cropper(live_stream.camera, (width, height)), True
+                yolo_results_frame = next(_detect_and_track(model, None, [decoded_frame], roi=roi, imgsz=imgsz))
+                class_ids, track_ids, confidences, xyxy = _frame_arrays(yolo_results_frame)
+                if track_ids is not None:
+                    aggregator.update(decoded_frame, track_ids, class_ids, confidences, xyxy)
+                latency_seconds = max(latency_seconds or 0.0, time.time() - decoded_frame.timestamp)
+                live_stream.frames_processed += 1
+                live_stream.last_frame_at = timezone.now()
+            now = time.time()
+            if now >= next_flush:
+                aggregator.flush(now)
+                _save_stream_stats(live_stream, reader, latency_seconds)
+                next_flush, latency_seconds = now + flush_seconds, None
+    except Exception as e:
+        print(f"Error ingesting stream {live_stream.name}: {e}")
+        status = 'failed'
+        raise
+    finally:
+        reader.stop()
+        reader.join()
+        aggregator.flush()
+        _save_stream_stats(live_stream, reader, latency_seconds, status=status)
+
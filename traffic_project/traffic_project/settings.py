@@ -83,6 +83,20 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process: the chart API cache key already changes when a
+# newer video completes, but use a shared backend (e.g. Redis) in production so
+# invalidation from the Celery worker reaches every web process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'traffic-monitor',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -135,3 +149,108 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC' # Or your project's timezone
+
+# Video processing
+# DetectionResult rows are buffered and written with bulk_create once either
+# limit is reached (see traffic_monitor/detection_writer.py).
+DETECTION_WRITE_BATCH_SIZE = 500
+DETECTION_WRITE_FLUSH_SECONDS = 5.0
+# 'frames' writes a DetectionResult row per frame and class; 'runs' writes one
+# DetectionRun row per run of frames in which a class keeps the same count,
+# which is far fewer rows for fixed cameras. Timelines read DetectionBucket
+# rows either way; detection_writer.detection_timeline() reads both.
+DETECTION_STORAGE = 'frames'
+# Capacity of the decode -> inference -> encode queues (traffic_monitor/video_pipeline.py).
+VIDEO_PIPELINE_QUEUE_SIZE = 8
+# Frames per YOLO detection call. 1 keeps frame-by-frame model.track(); larger
+# values batch detection and run ByteTrack per frame afterwards. Can be
+# overridden per task: process_video_task.delay(video_id, batch_size=8).
+YOLO_INFERENCE_BATCH_SIZE = 1
+# Frame skipping for fixed cameras. Run YOLO on every YOLO_FRAME_STRIDE-th frame
+# and, when YOLO_MOTION_THRESHOLD is set (fraction of changed pixels, e.g. 0.002),
+# only when the scene changed since the last inferred frame. Skipped frames reuse
+# the previous tracks; at most YOLO_MOTION_MAX_SKIPPED_FRAMES are gated in a row.
+YOLO_FRAME_STRIDE = 1
+YOLO_MOTION_THRESHOLD = None
+YOLO_MOTION_MAX_SKIPPED_FRAMES = 25
+# Chunked processing of long videos. With VIDEO_CHUNK_SECONDS set, videos longer
+# than one chunk are split into chunks processed in parallel by Celery workers.
+# Every chunk re-decodes VIDEO_CHUNK_OVERLAP_SECONDS of the previous one to warm
+# up its tracker and to match track IDs across the boundary.
+VIDEO_CHUNK_SECONDS = None
+VIDEO_CHUNK_OVERLAP_SECONDS = 2.0
+VIDEO_CHUNK_PROGRESS_INTERVAL_FRAMES = 250
+# Every Celery worker process keeps up to YOLO_MODEL_CACHE_SIZE loaded models
+# (keyed by path and mtime, least recently used evicted first) and, with
+# YOLO_PRELOAD_MODEL, loads and warms up best.pt when the process starts.
+YOLO_MODEL_CACHE_SIZE = 2
+YOLO_PRELOAD_MODEL = True
+# Timeline charts read DetectionBucket rows (1, 10 or 60 second buckets written
+# by the processor). Views take ?resolution=; this is the default.
+TIMELINE_DEFAULT_RESOLUTION = 1
+# /api/chart-data/ responses are cached in this cache alias for
+# CHART_DATA_CACHE_SECONDS and revalidated with ETag / Last-Modified.
+CHART_DATA_CACHE_ALIAS = 'default'
+CHART_DATA_CACHE_SECONDS = 60 * 60
+# stream_video_view serves byte ranges (206) in chunks of VIDEO_STREAM_CHUNK_SIZE.
+# Behind nginx, set VIDEO_X_ACCEL_REDIRECT_PREFIX to an `internal` location
+# aliased to MEDIA_ROOT so nginx sends the file itself.
+VIDEO_STREAM_CHUNK_SIZE = 1024 * 1024
+VIDEO_X_ACCEL_REDIRECT_PREFIX = None
+# Tracks not seen for this many frames are written to TrackSummary and dropped
+# from the in-memory track table while the video is still being processed.
+TRACK_STORE_MAX_IDLE_FRAMES = 750
+# Counting lines/zones forget a track's last position after this many frames
+# without it (traffic_monitor/counting.py).
+COUNTING_MAX_IDLE_FRAMES = 750
+# Live stream ingestion (`manage.py ingest_stream`). Only the newest
+# LIVE_STREAM_BUFFER_FRAMES decoded frames are kept, so a slow model drops
+# frames instead of lagging; lost connections are retried with exponential
+# backoff between the two RECONNECT values. Counts are per
+# LIVE_STREAM_PERIOD_SECONDS period and written every LIVE_STREAM_FLUSH_SECONDS;
+# a vehicle is counted once it has not been seen for LIVE_STREAM_TRACK_IDLE_SECONDS.
+LIVE_STREAM_BUFFER_FRAMES = 2
+LIVE_STREAM_RECONNECT_INITIAL_SECONDS = 1.0
+LIVE_STREAM_RECONNECT_MAX_SECONDS = 60.0
+LIVE_STREAM_PERIOD_SECONDS = 60
+LIVE_STREAM_FLUSH_SECONDS = 10.0
+LIVE_STREAM_TRACK_IDLE_SECONDS = 30.0
+# Single-pass processing saves a checkpoint every VIDEO_CHECKPOINT_INTERVAL_FRAMES
+# frames; a retry after a crash resumes there, re-tracking the
+# VIDEO_CHECKPOINT_OVERLAP_FRAMES frames before it to match track IDs. Annotated
+# videos are written in one segment per interval and joined at the end.
+# None disables checkpoints.
+VIDEO_CHECKPOINT_INTERVAL_FRAMES = 1000
+VIDEO_CHECKPOINT_OVERLAP_FRAMES = 25
+# Processing jobs write frames done, fps and per-stage times to their
+# ProcessingProgress row at most every PROGRESS_UPDATE_SECONDS
+# (/api/videos/<id>/progress/).
+PROGRESS_UPDATE_SECONDS = 2.0
+# With PROCESSING_PROFILE_DIR set, every processing job runs under cProfile and
+# tracemalloc and writes video-<id>.prof / chunk-<id>.prof plus a memory report
+# there (traffic_monitor/instrumentation.py). Off by default: profiling slows
+# the job down. `manage.py benchmark_pipeline` is the benchmark harness.
+PROCESSING_PROFILE_DIR = None
+# CPU inference backend: 'pytorch', 'onnx' (ONNX Runtime) or 'openvino'. Export
+# the weights once with `manage.py export_model` (--int8 for the
+# YOLO_INFERENCE_INT8 variant); workers load the export when it exists and is
+# newer than best.pt, PyTorch otherwise. YOLO_INFERENCE_THREADS limits the
+# inference threads per worker process (None: library default), e.g. cores
+# divided by the Celery concurrency.
+YOLO_INFERENCE_BACKEND = 'pytorch'
+YOLO_INFERENCE_INT8 = False
+YOLO_INFERENCE_THREADS = None
+# Video decoding: 'opencv' (cv2.VideoCapture, single-threaded H.264) or 'pyav'
+# (PyAV with VIDEO_DECODE_THREADS FFmpeg threads, 0: FFmpeg's choice; needs
+# `pip install av`, falls back to OpenCV without it).
+# `python -m benchmarks.bench_decode` compares both on a sample file.
+VIDEO_DECODE_BACKEND = 'opencv'
+VIDEO_DECODE_THREADS = 0
+# Every processed video's raw tracked boxes (frame, timestamp, track ID, class,
+# confidence, box) are also streamed into a columnar archive in
+# MEDIA_ROOT/detections (VideoUpload.detection_archive): 'npz' (NumPy only) or
+# 'parquet' (needs `pip install pyarrow`); None turns it off. Rows are written
+# DETECTION_ARCHIVE_CHUNK_ROWS at a time and at every checkpoint.
+# `python -m benchmarks.bench_detection_archive` compares formats and reload times.
+DETECTION_ARCHIVE_FORMAT = 'npz'
+DETECTION_ARCHIVE_CHUNK_ROWS = 65536